@@ -0,0 +1,150 @@
+"""
+Ограничение числа одновременных запросов на хосте (api_v1.admission).
+Слот - файл в ADMISSION_DIR, занятый блокировкой flock, поэтому лимиты
+общие для всех процессов хоста, а слоты упавшего процесса освобождаются
+системой.
+- ADMISSION_LIMITS: лимиты для тяжелых действий ("orders-create=2,...").
+- ADMISSION_CAPACITY: общее число слотов хоста, 0 - без общего лимита.
+  Последние ADMISSION_RESERVED из них доступны только легким действиям
+  (всем, кроме перечисленных в ADMISSION_LIMITS), например
+  /orders/complete.
+Запрос сверх лимита сразу получает 429 с заголовком Retry-After.
+Список "data" длиннее MAX_BATCH_ITEMS получает 413 (BatchTooLarge) с тем
+же заголовком: запрос можно повторить частями.
+"""
+import fcntl
+import os
+import threading
+from pathlib import Path
+from django.conf import settings
+from django.http import HttpResponse
+from .compression import PayloadTooLarge
+from .renderers import ORJSONRenderer
+from .utils import AsyncCapableMiddleware, request_action
+
+# Долгий опрос и метрики не занимают слоты
+EXEMPT = ('couriers-orders', 'metrics')
+
+
+class BatchTooLarge(PayloadTooLarge):
+    default_code = 'too_many_items'
+
+    def __init__(self, detail=None, code=None):
+        super().__init__(detail, code)
+        # По атрибуту wait DRF ставит заголовок Retry-After
+        self.wait = settings.ADMISSION_RETRY_AFTER
+
+
+class Slot:
+    """
+    Слот на файловой блокировке. Потоки одного процесса разделяют
+    дескриптор, поэтому между ними слот делится обычной блокировкой
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.fd = None
+        self.pid = None
+
+    def acquire(self):
+        if not self.lock.acquire(blocking=False):
+            return False
+        try:
+            if self.pid != os.getpid():
+                # Дескриптор, унаследованный после fork, не используем
+                self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                self.pid = os.getpid()
+            fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.lock.release()
+            return False
+        except BaseException:
+            self.lock.release()
+            raise
+        return True
+
+    def release(self):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self.lock.release()
+
+
+class SlotPool:
+    def __init__(self, directory, name, size):
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        self.slots = [
+            Slot(os.path.join(directory, f'{name}.{index}'))
+            for index in range(size)
+        ]
+
+    def acquire(self, indexes):
+        for index in indexes:
+            slot = self.slots[index]
+            if slot.acquire():
+                return slot
+        return None
+
+
+class AdmissionMiddleware(AsyncCapableMiddleware):
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        directory = settings.ADMISSION_DIR
+        self.limits = {
+            name: SlotPool(directory, name, limit)
+            for name, limit in settings.ADMISSION_LIMITS.items()
+        }
+        capacity = settings.ADMISSION_CAPACITY
+        self.shared = SlotPool(directory, 'shared', capacity)
+        # Тяжелые действия берут слоты только вне резерва, легкие -
+        # сначала из резерва
+        self.heavy_indexes = range(capacity - settings.ADMISSION_RESERVED)
+        self.light_indexes = range(capacity - 1, -1, -1)
+
+    def call(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            self.release(request)
+
+    async def __acall__(self, request):
+        try:
+            return await self.get_response(request)
+        finally:
+            self.release(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        name = request_action(request, with_basename=True)
+        if name in EXEMPT:
+            return None
+        acquired = []
+        request._admission_slots = acquired
+        pool = self.limits.get(name)
+        if pool is not None:
+            slot = pool.acquire(range(len(pool.slots)))
+            if slot is None:
+                return self.reject(name)
+            acquired.append(slot)
+        if self.shared.slots:
+            indexes = (
+                self.heavy_indexes if pool is not None else self.light_indexes
+            )
+            slot = self.shared.acquire(indexes)
+            if slot is None:
+                return self.reject(name)
+            acquired.append(slot)
+        return None
+
+    def release(self, request):
+        for slot in getattr(request, '_admission_slots', ()):
+            slot.release()
+        request._admission_slots = []
+
+    def reject(self, name):
+        response = HttpResponse(
+            ORJSONRenderer().render(
+                {'detail': f'Too many concurrent requests to {name}.'}
+            ),
+            status=429,
+            content_type='application/json'
+        )
+        response['Retry-After'] = str(settings.ADMISSION_RETRY_AFTER)
+        return response
@@ -0,0 +1,90 @@
+"""
+Хранение районов курьера массивом в строке курьера
+(режим REGION_STORAGE = 'array') вместо M2M-связи с Region.
+На PostgreSQL поле имеет тип integer[] с GIN-индексом, поиск курьеров по
+району - оператор @>. На остальных СУБД массив упакован в строку
+",1,12,22," и проверяется функцией int_array_contains, регистрируемой
+в SQLite при подключении.
+"""
+from django.conf import settings
+from django.db import models
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def region_array_storage():
+    return settings.REGION_STORAGE == 'array'
+
+
+def pack_ints(values):
+    if not values:
+        return ''
+    return ',' + ','.join(str(value) for value in values) + ','
+
+
+def unpack_ints(value):
+    return [int(number) for number in value.split(',') if number]
+
+
+def int_array_contains(packed, packed_items):
+    values = set(unpack_ints(packed or ''))
+    return all(item in values for item in unpack_ints(packed_items or ''))
+
+
+class IntegerArrayField(models.Field):
+    """
+    Отсортированный список целых чисел без повторов
+    """
+    description = 'Array of integers'
+
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            return 'integer[]'
+        return 'text'
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return []
+        if connection.vendor == 'postgresql':
+            return value
+        return unpack_ints(value)
+
+    def to_python(self, value):
+        if isinstance(value, str):
+            return unpack_ints(value)
+        return sorted({int(item) for item in value or []})
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        value = self.to_python(value)
+        if connection.vendor == 'postgresql':
+            return value
+        return pack_ints(value)
+
+
+@IntegerArrayField.register_lookup
+class Contains(models.Lookup):
+    """
+    field__contains=[1, 2]: массив содержит все заданные числа
+    """
+    lookup_name = 'contains'
+
+    def get_db_prep_lookup(self, value, connection):
+        return '%s', [self.lhs.output_field.get_db_prep_value(
+            value, connection
+        )]
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        params = lhs_params + rhs_params
+        if connection.vendor == 'postgresql':
+            return f'{lhs} @> {rhs}::integer[]', params
+        return f'int_array_contains({lhs}, {rhs})', params
+
+
+@receiver(connection_created)
+def register_sqlite_functions(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function(
+            'int_array_contains', 2, int_array_contains, deterministic=True
+        )
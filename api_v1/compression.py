@@ -0,0 +1,93 @@
+"""
+Распаковка тела запроса с заголовком Content-Encoding: gzip или zstd
+(zstd - если установлен пакет zstandard). Размер распакованного тела
+ограничен REQUEST_MAX_DECOMPRESSED_BYTES, чтобы маленький сжатый запрос
+не занял всю память. Ответы сжимает django.middleware.gzip.GZipMiddleware.
+"""
+import io
+import zlib
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException, ParseError, UnsupportedMediaType,
+)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNK_SIZE = 64 * 1024
+TOO_LARGE = 'Decompressed request body is too large.'
+
+
+class PayloadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Request body is too large.'
+    default_code = 'payload_too_large'
+
+
+def _gunzip(stream, limit):
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    body = io.BytesIO()
+    size = 0
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+        while chunk:
+            # Распаковываем не больше, чем осталось до предела
+            data = decompressor.decompress(chunk, limit + 1 - size)
+            size += len(data)
+            if size > limit:
+                raise PayloadTooLarge(TOO_LARGE)
+            body.write(data)
+            chunk = decompressor.unconsumed_tail
+    if not decompressor.eof:
+        raise zlib.error('incomplete gzip stream')
+    return body
+
+
+def _unzstd(stream, limit):
+    body = io.BytesIO()
+    size = 0
+    with zstandard.ZstdDecompressor().stream_reader(stream) as reader:
+        for chunk in iter(lambda: reader.read(CHUNK_SIZE), b''):
+            size += len(chunk)
+            if size > limit:
+                raise PayloadTooLarge(TOO_LARGE)
+            body.write(chunk)
+    return body
+
+
+DECODERS = {'gzip': _gunzip, 'x-gzip': _gunzip}
+if zstandard is not None:
+    DECODERS['zstd'] = _unzstd
+
+
+def decode_stream(stream, parser_context):
+    """
+    Поток с распакованным телом запроса или исходный поток, если тело
+    не сжато
+    """
+    request = (parser_context or {}).get('request')
+    encoding = (
+        request.META.get('HTTP_CONTENT_ENCODING', '') if request else ''
+    ).strip().lower()
+    if encoding in ('', 'identity'):
+        return stream
+    decoder = DECODERS.get(encoding)
+    if decoder is None:
+        raise UnsupportedMediaType(
+            f'Content-Encoding "{encoding}"',
+            detail=f'Unsupported Content-Encoding "{encoding}".'
+        )
+    try:
+        body = decoder(stream, settings.REQUEST_MAX_DECOMPRESSED_BYTES)
+    except PayloadTooLarge:
+        raise
+    except (zlib.error, EOFError, ValueError) as exc:
+        raise ParseError(f'Cannot decompress request body: {exc}')
+    except Exception as exc:
+        if zstandard is not None and isinstance(exc, zstandard.ZstdError):
+            raise ParseError(f'Cannot decompress request body: {exc}')
+        raise
+    body.seek(0)
+    return body
@@ -0,0 +1,137 @@
+"""
+Маршрутизация запросов между базами: шарды заказов и реплики.
+ShardRouter направляет модели заказов в текущий шард (api_v1.sharding).
+Чтение в безопасных (GET, HEAD, OPTIONS) запросах идет на реплики из
+settings.DATABASE_REPLICAS, все записи и остальные запросы - на 'default'.
+После успешной записи ответ содержит заголовок PIN_HEADER со временем
+окончания закрепления (Unix-время, через REPLICA_PIN_SECONDS). Клиент,
+который повторяет этот заголовок в запросах, до этого времени читает из
+основной БД и сразу видит свои изменения.
+"""
+import random
+import time
+from contextvars import ContextVar
+from django.conf import settings
+from .sharding import (
+    SHARD_MODELS, SHARD_REFERENCES, NoShardSelected, current_shard,
+    is_sharded,
+)
+from .utils import AsyncCapableMiddleware
+
+PIN_HEADER = 'X-Primary-Pin'
+
+# Разрешено ли чтение с реплик в текущем запросе
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+class ShardRouter:
+    """
+    Роутер: запросы к моделям заказов идут в текущий шард, даже если
+    получены через курьера из 'default' (courier.assigned_orders), а вне
+    шарда - в базу загруженного объекта или ошибка NoShardSelected.
+    Остальные модели передаются следующему роутеру
+    """
+    def _db(self, model, **hints):
+        if not is_sharded(model):
+            return None
+        shard = current_shard()
+        if shard is not None:
+            return shard
+        instance = hints.get('instance')
+        if instance is not None and is_sharded(type(instance)):
+            if instance._state.db is not None:
+                return instance._state.db
+        raise NoShardSelected(
+            f'{model._meta.label} query outside of a shard, use each_shard()'
+        )
+
+    def db_for_read(self, model, **hints):
+        return self._db(model, **hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Назначение в шарде ссылается на курьера из 'default'
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        in_shard = db in settings.DATABASE_SHARDS
+        if model_name is None:
+            # RunPython и RunSQL: миграции api_v1 сами проверяют модели
+            # через router.allow_migrate_model
+            return app_label == 'api_v1' if in_shard else None
+        if not in_shard:
+            return None
+        label = f'{app_label}.{model_name}'
+        return label in SHARD_MODELS or label in SHARD_REFERENCES
+
+
+class ReplicaRouter:
+    """
+    Роутер: чтение с реплик, если это разрешено для текущего запроса,
+    запись только в основную БД
+    """
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        # После записи дочитываем из основной БД до конца запроса
+        _replica_reads.set(False)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему через репликацию
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaRoutingMiddleware(AsyncCapableMiddleware):
+    """
+    Разрешает чтение с реплик для безопасных запросов клиентов, которые
+    недавно ничего не записывали. Ставит заголовок закрепления после
+    успешной записи.
+    Работает и в синхронной, и в асинхронной цепочке
+    """
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def call(self, request):
+        token = self.allow_replica_reads(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        # sync_to_async передает переменную контекста в поток представления
+        token = self.allow_replica_reads(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+        return self.pin(request, response)
+
+    def allow_replica_reads(self, request):
+        return _replica_reads.set(
+            request.method in self.safe_methods and not self.pinned(request)
+        )
+
+    @staticmethod
+    def pinned(request):
+        try:
+            return float(request.headers[PIN_HEADER]) > time.time()
+        except (KeyError, ValueError):
+            return False
+
+    def pin(self, request, response):
+        if (request.method not in self.safe_methods
+                and 200 <= response.status_code < 300):
+            response[PIN_HEADER] = (
+                f'{time.time() + settings.REPLICA_PIN_SECONDS:.3f}'
+            )
+        return response
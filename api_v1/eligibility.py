@@ -0,0 +1,57 @@
+"""
+Правила, по которым свободный заказ (Order.objects.live) подходит
+курьеру: район из районов курьера, вес не больше грузоподъемности,
+пересечение хотя бы одного интервала доставки с интервалом работы.
+order_condition - эти правила условием для запроса (назначение и снятие
+заказов при PATCH курьера), order_fits - те же правила для заказа в
+памяти (пробное назначение, api_v1.simulation).
+courier - профиль курьера: region_ids, max_weight, minute_ranges()
+и, для запроса, ranges и intervals (api_v1.profiles.CourierProfile).
+"""
+import operator
+from functools import reduce
+from django.db.models import Q
+from .ranges import inline_storage, ranges_intersect
+
+
+def time_condition(courier, prefix=''):
+    """
+    Условие пересечения интервалов доставки заказа с интервалами работы
+    курьера. prefix - путь к заказу, например 'order__'
+    """
+    if inline_storage():
+        return Q(**{f'{prefix}delivery_ranges__overlap': list(courier.ranges)})
+    if not courier.intervals:
+        # Курьер без часов работы не подходит ни одному заказу
+        return Q(pk__in=[])
+    # Проходим по всем интервалам работы курьера и формируем условия:
+    return reduce(operator.or_, (
+        Q(**{
+            f'{prefix}delivery_hours__start__lt': end,
+            f'{prefix}delivery_hours__end__gt': start,
+        })
+        for start, end in courier.intervals
+    ))
+
+
+def order_condition(courier, prefix=''):
+    """
+    Условие, что заказ подходит курьеру
+    """
+    return (
+        Q(**{f'{prefix}region__in': courier.region_ids})
+        & Q(**{f'{prefix}weight__lte': courier.max_weight})
+        & time_condition(courier, prefix)
+    )
+
+
+def order_fits(courier, region_id, weight, ranges):
+    """
+    Подходит ли курьеру заказ района region_id с весом weight и
+    интервалами доставки ranges в минутах
+    """
+    return (
+        region_id in courier.region_ids
+        and weight <= courier.max_weight
+        and ranges_intersect(ranges, courier.minute_ranges())
+    )
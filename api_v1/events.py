@@ -0,0 +1,43 @@
+"""
+Журнал событий заказов для потребителей (биллинг, приложение курьера,
+аналитика) вместо опроса GET /couriers/{id}. Назначение, выполнение и
+снятие заказов пишут событие в той же транзакции, GET /events?after=<id>
+отдает события с id больше курсора по первичному ключу.
+Чтобы потребитель не пропустил событие с меньшим id, закоммиченное позже
+большего, на PostgreSQL запись событий сериализуется транзакционной
+advisory-блокировкой до коммита. Событие пишется последним запросом
+транзакции, поэтому блокировка держится только на время вставки и коммита.
+В SQLite записи и так идут по одной.
+"""
+from django.db import connections, router
+from django.utils import timezone
+from .models import OrderEvent
+
+# Ключ advisory-блокировки записи событий
+LOCK_KEY = 4700
+
+
+def record(kind, courier_id, order_ids, time=None):
+    """
+    Добавляет событие kind (OrderEvent.Kind) по заказам order_ids.
+    Вызывается внутри транзакции последним запросом
+    """
+    if not order_ids:
+        return None
+    connection = connections[router.db_for_write(OrderEvent)]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [LOCK_KEY])
+    return OrderEvent.objects.create(
+        kind=kind,
+        courier_id=courier_id,
+        order_ids=order_ids,
+        time=time or timezone.now(),
+    )
+
+
+def read(after, limit):
+    """
+    События с id больше after, не больше limit штук
+    """
+    return list(OrderEvent.objects.filter(pk__gt=after).order_by('pk')[:limit])
@@ -0,0 +1,118 @@
+"""
+Заголовок Idempotency-Key для создания курьеров и заказов, назначения и
+выполнения заказов. Первый запрос с ключом сохраняет хэш разобранного
+тела и ответ на IDEMPOTENCY_TTL секунд, повтор с тем же телом получает
+сохраненный ответ без повторной валидации. Повтор, пришедший пока первый
+запрос еще выполняется, сразу получает 409 с Retry-After, чтобы не
+занимать рабочий поток ожиданием.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils import encoders
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def _error(detail, status_code):
+    return Response({'detail': detail}, status=status_code)
+
+
+def payload_hash(data):
+    """
+    Хэш разобранного тела запроса: не зависит от сжатия, порядка ключей
+    и пробелов
+    """
+    canonical = json.dumps(
+        data, sort_keys=True, separators=(',', ':'),
+        cls=encoders.JSONEncoder
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _acquire(key, request_hash):
+    """
+    Занимает ключ. Возвращает запись, если запрос нужно выполнить, или
+    готовый ответ: сохраненный либо ошибку
+    """
+    while True:
+        now = timezone.now()
+        record, created = IdempotencyKey.objects.get_or_create(
+            key=key,
+            defaults={
+                'request_hash': request_hash,
+                # Если процесс упадет, ключ освободится через это время
+                'expires': now + timedelta(
+                    seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT
+                ),
+            }
+        )
+        if created:
+            return record, None
+        if record.expires <= now:
+            IdempotencyKey.objects.filter(key=key, expires__lte=now).delete()
+            continue
+        if record.request_hash != request_hash:
+            return None, _error(
+                f'{HEADER} was already used with a different request body',
+                status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        if record.status_code is not None:
+            response = Response(
+                json.loads(record.response), status=record.status_code
+            )
+            response['Idempotent-Replayed'] = 'true'
+            return None, response
+        response = _error(
+            f'A request with this {HEADER} is still in progress',
+            status.HTTP_409_CONFLICT
+        )
+        response['Retry-After'] = str(settings.IDEMPOTENCY_RETRY_AFTER)
+        return None, response
+
+
+def idempotent(handler):
+    """
+    Декоратор действия ViewSet. Без заголовка Idempotency-Key действие
+    выполняется как обычно
+    """
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        header = request.headers.get(HEADER)
+        if header is None:
+            return handler(self, request, *args, **kwargs)
+        if not header or len(header) > MAX_KEY_LENGTH:
+            return _error(
+                f'{HEADER} must be 1-{MAX_KEY_LENGTH} characters',
+                status.HTTP_400_BAD_REQUEST
+            )
+        key = f'{self.basename}-{self.action}:{header}'
+        request_hash = payload_hash(request.data)
+        record, response = _acquire(key, request_hash)
+        if response is not None:
+            return response
+
+        try:
+            response = handler(self, request, *args, **kwargs)
+        except BaseException:
+            record.delete()
+            raise
+        if response.status_code >= 500:
+            # Ошибку сервера не запоминаем, повтор выполнится заново
+            record.delete()
+            return response
+        record.status_code = response.status_code
+        record.response = json.dumps(response.data, cls=encoders.JSONEncoder)
+        record.expires = timezone.now() + timedelta(
+            seconds=settings.IDEMPOTENCY_TTL
+        )
+        record.save()
+        return response
+    return wrapper
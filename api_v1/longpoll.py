@@ -0,0 +1,123 @@
+"""
+Ожидание изменения назначенных курьеру заказов для долгого опроса
+GET /couriers/{id}/orders?wait=N.
+Назначение, выполнение и снятие заказов увеличивают Courier.orders_version
+(orders_changed). Ожидающие запросы - это future в цикле событий, а не
+потоки: один фоновый опрос на цикл раз в LONG_POLL_INTERVAL секунд читает
+версии всех ожидаемых курьеров одним запросом и будит тех, у кого версия
+изменилась. Изменения в этом же процессе будят ожидающих сразу после
+коммита. Под ASGI цикл один на процесс; под WSGI у каждого запроса свой
+цикл в своем потоке, поэтому ожидающие и опрос хранятся отдельно для
+каждого цикла, а будятся через call_soon_threadsafe.
+"""
+import asyncio
+import threading
+import weakref
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from .models import Courier
+
+
+class LoopWaiters:
+    """
+    Ожидающие запросы одного цикла событий и его фоновый опрос. Меняются
+    только из потока этого цикла
+    """
+    def __init__(self):
+        # {courier_id: {future: известная клиенту версия}}
+        self.waiters = {}
+        self.poller = None
+
+    def wake(self, courier_id, version=None):
+        waiters = self.waiters.get(courier_id, {})
+        for future, known_version in waiters.items():
+            if not future.done() and known_version != version:
+                future.set_result(None)
+
+
+class VersionWatcher:
+    def __init__(self, fetch_versions):
+        self.fetch_versions = fetch_versions
+        # {цикл событий: LoopWaiters}, запись уходит вместе с циклом
+        self._loops = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _loop_waiters(self, loop):
+        with self._lock:
+            state = self._loops.get(loop)
+            if state is None:
+                state = self._loops[loop] = LoopWaiters()
+            return state
+
+    async def wait(self, courier_id, version, timeout):
+        """
+        Ждет изменения версии курьера, но не дольше timeout секунд
+        """
+        loop = asyncio.get_running_loop()
+        state = self._loop_waiters(loop)
+        future = loop.create_future()
+        state.waiters.setdefault(courier_id, {})[future] = version
+        if state.poller is None or state.poller.done():
+            state.poller = loop.create_task(self._poll(state))
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            waiters = state.waiters.get(courier_id, {})
+            waiters.pop(future, None)
+            if not waiters:
+                state.waiters.pop(courier_id, None)
+            if not state.waiters and state.poller is not None:
+                # Под WSGI цикл закрывается вместе с запросом
+                state.poller.cancel()
+                state.poller = None
+
+    async def _poll(self, state):
+        while state.waiters:
+            await asyncio.sleep(settings.LONG_POLL_INTERVAL)
+            if not state.waiters:
+                break
+            versions = await sync_to_async(self.fetch_versions)(
+                list(state.waiters)
+            )
+            for courier_id, version in versions.items():
+                state.wake(courier_id, version)
+
+    def notify(self, courier_id):
+        """
+        Будит ожидающих курьера во всех циклах. Можно вызывать из любого
+        потока
+        """
+        with self._lock:
+            loops = list(self._loops.items())
+        for loop, state in loops:
+            if not state.waiters:
+                continue
+            try:
+                loop.call_soon_threadsafe(state.wake, courier_id)
+            except RuntimeError:
+                # Цикл закрылся
+                pass
+
+
+def fetch_versions(courier_ids):
+    return dict(
+        Courier.objects.filter(pk__in=courier_ids)
+        .values_list('pk', 'orders_version')
+    )
+
+
+watcher = VersionWatcher(fetch_versions)
+
+
+def orders_changed(courier_id):
+    """
+    Отмечает изменение назначенных курьеру заказов
+    """
+    Courier.objects.filter(pk=courier_id).update(
+        orders_version=F('orders_version') + 1
+    )
+    transaction.on_commit(lambda: watcher.notify(courier_id))
@@ -0,0 +1,68 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from api_v1.models import AssignedOrder, ArchivedOrder
+from api_v1.sharding import each_shard
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит выполненные назначения старше --days дней из '
+        'AssignedOrder в архив ArchivedOrder. Работает пачками в отдельных '
+        'транзакциях, прерванный запуск можно просто повторить'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        # Архив лежит в том же шарде, что и назначения
+        for alias in each_shard():
+            self.archive(alias, cutoff, options['batch_size'])
+
+    def archive(self, alias, cutoff, batch_size):
+        completed = AssignedOrder.objects.filter(
+            is_competed=True, complete_time__lt=cutoff
+        ).order_by('pk')
+        last_pk = 0
+        done = 0
+        while True:
+            with transaction.atomic(using=alias):
+                rows = list(
+                    completed.filter(pk__gt=last_pk).values(
+                        'order_id', 'courier_id', 'order__region_id',
+                        'assign_time', 'complete_time', 'delivery_time',
+                        'payment',
+                    )[:batch_size]
+                )
+                if not rows:
+                    break
+                # ignore_conflicts: строки, перенесенные до сбоя, не мешают
+                # повторному запуску
+                ArchivedOrder.objects.bulk_create(
+                    (
+                        ArchivedOrder(
+                            order_id=row['order_id'],
+                            courier_id=row['courier_id'],
+                            region_id=row['order__region_id'],
+                            month=row['complete_time'].date().replace(day=1),
+                            assign_time=row['assign_time'],
+                            complete_time=row['complete_time'],
+                            delivery_time=row['delivery_time'],
+                            payment=row['payment'],
+                        )
+                        for row in rows
+                    ),
+                    ignore_conflicts=True
+                )
+                AssignedOrder.objects.filter(
+                    pk__in=[row['order_id'] for row in rows]
+                ).delete()
+            last_pk = rows[-1]['order_id']
+            done += len(rows)
+            self.stdout.write(
+                f'{alias}: {done} archived, last id {last_pk}'
+            )
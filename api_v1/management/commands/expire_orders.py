@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from api_v1.models import Order
+from api_v1.sequencing import delivery_windows
+from api_v1.sharding import each_shard
+from api_v1.supply import Delta
+
+
+class Command(BaseCommand):
+    help = (
+        'Отмечает просроченные (expires_at в прошлом) свободные заказы, '
+        'чтобы они не попадали в выборку для назначения. Работает пачками, '
+        'прерванный запуск можно просто повторить'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        for alias in each_shard():
+            self.expire(alias, now, options['batch_size'])
+
+    def expire(self, alias, now, batch_size):
+        expired = Order.objects.filter(
+            is_assigned=False, is_expired=False, expires_at__lte=now
+        ).order_by('pk')
+        last_pk = 0
+        done = 0
+        while True:
+            with transaction.atomic(using=alias):
+                ids = list(
+                    expired.filter(pk__gt=last_pk)
+                    .values_list('pk', flat=True)[:batch_size]
+                )
+                if not ids:
+                    break
+                # Заказ мог быть назначен после выборки - условие повторяем
+                # и блокируем строки до конца транзакции
+                orders = list(
+                    Order.objects.select_for_update()
+                    .filter(pk__in=ids, is_assigned=False)
+                )
+                Order.objects.filter(
+                    pk__in=[order.pk for order in orders]
+                ).update(is_expired=True)
+                supply = Delta()
+                supply.add_orders(orders, delivery_windows(orders), opened=-1)
+                supply.save()
+            last_pk = ids[-1]
+            done += len(ids)
+            self.stdout.write(f'{alias}: {done} expired, last id {last_pk}')
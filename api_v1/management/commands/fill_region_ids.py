@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api_v1.models import Courier
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит районы курьеров из M2M-связи с Region в массив '
+        'region_ids для режима REGION_STORAGE = "array". Работает пачками, '
+        'повторный запуск безопасен, --after продолжает с заданного id'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--after', type=int, default=0,
+            help='Process only couriers with id greater than this'
+        )
+
+    def handle(self, *args, **options):
+        last_pk = options['after']
+        done = 0
+        while True:
+            with transaction.atomic():
+                couriers = list(
+                    Courier.objects.filter(pk__gt=last_pk)
+                    .order_by('pk')
+                    .prefetch_related('regions')
+                    [:options['batch_size']]
+                )
+                if not couriers:
+                    break
+                for courier in couriers:
+                    courier.region_ids = [
+                        region.pk for region in courier.regions.all()
+                    ]
+                Courier.objects.bulk_update(couriers, ['region_ids'])
+            last_pk = couriers[-1].pk
+            done += len(couriers)
+            self.stdout.write(f'Courier: {done} done, last id {last_pk}')
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api_v1.models import Courier, Order
+from api_v1.ranges import intervals_to_ranges
+from api_v1.sharding import each_shard
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит интервалы из M2M-связей с TimeInterval в поля '
+        'working_ranges и delivery_ranges для режима '
+        'INTERVAL_STORAGE = "inline". Заказы обрабатывает в каждом шарде. '
+        'Работает пачками, повторный запуск безопасен, --after продолжает '
+        'с заданного id'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--after', type=int, default=0,
+            help='Process only objects with id greater than this'
+        )
+
+    def handle(self, *args, **options):
+        self.fill(
+            Courier, 'working_hours', 'working_ranges', options
+        )
+        for alias in each_shard():
+            self.fill(
+                Order, 'delivery_hours', 'delivery_ranges', options, alias
+            )
+
+    def fill(self, model, m2m_field, ranges_field, options, using='default'):
+        last_pk = options['after']
+        done = 0
+        while True:
+            with transaction.atomic(using=using):
+                objects = list(
+                    model.objects.filter(pk__gt=last_pk)
+                    .order_by('pk')
+                    .prefetch_related(m2m_field)
+                    [:options['batch_size']]
+                )
+                if not objects:
+                    break
+                for obj in objects:
+                    setattr(obj, ranges_field, intervals_to_ranges(
+                        getattr(obj, m2m_field).all()
+                    ))
+                model.objects.bulk_update(objects, [ranges_field])
+            last_pk = objects[-1].pk
+            done += len(objects)
+            self.stdout.write(
+                f'{model.__name__} ({using}): {done} done, '
+                f'last id {last_pk}'
+            )
@@ -0,0 +1,430 @@
+import random
+from bisect import bisect_left
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from api_v1.models import Courier, Order, AssignedOrder, Region, TimeInterval
+from api_v1.profiles import profiles
+from api_v1.arrays import region_array_storage
+from api_v1.eligibility import order_fits
+from api_v1.ranges import inline_storage, intervals_to_ranges
+from api_v1.serializers import OrderAssignSerializer
+from api_v1.sharding import sharding_enabled
+from api_v1.simulation import CourierSnapshot
+
+
+def parse_weights(value):
+    """
+    Разбор распределения вида "foot:5,bike:3,car:2"
+    """
+    try:
+        pairs = [item.split(':') for item in value.split(',')]
+        return {key: float(weight) for key, weight in pairs}
+    except ValueError:
+        raise CommandError(f'Wrong distribution: {value}')
+
+
+def parse_numbers(value):
+    try:
+        return [float(item) for item in value.split(',')]
+    except ValueError:
+        raise CommandError(f'Wrong list of numbers: {value}')
+
+
+def interval_string(start_minutes, length_minutes):
+    """
+    Интервал "HH:MM-HH:MM", обрезанный концом суток
+    """
+    end_minutes = min(start_minutes + length_minutes, 23 * 60 + 59)
+    start_hours, start_minutes = divmod(start_minutes, 60)
+    end_hours, end_minutes = divmod(end_minutes, 60)
+    return (
+        f'{start_hours:02}:{start_minutes:02}-'
+        f'{end_hours:02}:{end_minutes:02}'
+    )
+
+
+def insert_rows(model, field_names, rows, batch_size):
+    """
+    Быстрая вставка строк-кортежей без создания объектов моделей.
+    Значения приводятся к формату БД так же, как при сохранении через ORM.
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(
+        connection.ops.quote_name(field.column) for field in fields
+    )
+    placeholders = ', '.join(['%s'] * len(fields))
+    sql = f'INSERT INTO {table} ({columns}) VALUES ({placeholders})'
+    adapters = [
+        None if field.get_internal_type() in (
+            'CharField', 'BooleanField', 'IntegerField',
+            'PositiveIntegerField', 'ForeignKey',
+        ) else field.get_db_prep_save
+        for field in fields
+    ]
+    rows = iter(rows)
+    with connection.cursor() as cursor:
+        while True:
+            batch = [
+                tuple(
+                    adapt(value, connection) if adapt else value
+                    for adapt, value in zip(adapters, row)
+                )
+                for _, row in zip(range(batch_size), rows)
+            ]
+            if not batch:
+                break
+            cursor.executemany(sql, batch)
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует воспроизводимый (при одинаковом --seed) набор '
+        'курьеров, заказов и истории выполнения для нагрузочных тестов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--couriers', type=int, default=1000)
+        parser.add_argument('--orders', type=int, default=10000)
+        parser.add_argument('--regions', type=int, default=100)
+        parser.add_argument(
+            '--region-skew', type=float, default=1.0,
+            help='Zipf exponent of region popularity, 0 for uniform'
+        )
+        parser.add_argument(
+            '--regions-per-courier', default='1:5,2:3,3:2',
+            help='Distribution of region count per courier'
+        )
+        parser.add_argument(
+            '--courier-types', default='foot:5,bike:3,car:2',
+            help='Distribution of courier types'
+        )
+        parser.add_argument(
+            '--shift-start', default='8,2',
+            help='Mean and deviation of shift start hour'
+        )
+        parser.add_argument(
+            '--shift-hours', default='4,6,8,12',
+            help='Possible shift lengths in hours'
+        )
+        parser.add_argument(
+            '--shifts-per-courier', default='1:8,2:2',
+            help='Distribution of working intervals per courier'
+        )
+        parser.add_argument(
+            '--window-hours', default='1,2,3,4',
+            help='Possible delivery window lengths in hours'
+        )
+        parser.add_argument(
+            '--windows-per-order', default='1:7,2:3',
+            help='Distribution of delivery intervals per order'
+        )
+        parser.add_argument(
+            '--weight', default='1.0,0.8',
+            help='mu and sigma of lognormal order weight, kg (0.01-50)'
+        )
+        parser.add_argument(
+            '--completed', type=float, default=0.5,
+            help='Fraction of orders with completion history'
+        )
+        parser.add_argument(
+            '--history-days', type=int, default=30,
+            help='How far back completion history goes'
+        )
+        parser.add_argument(
+            '--expired', type=float, default=0,
+            help='Fraction of unassigned orders with expires_at in the past'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if sharding_enabled():
+            # Строки пишутся напрямую через connection базы 'default'
+            raise CommandError(
+                'Dataset generation is not supported with DATABASE_SHARDS'
+            )
+        self.rnd = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.options = options
+        self.inline = inline_storage()
+        self.region_array = region_array_storage()
+
+        with transaction.atomic():
+            self.create_regions()
+            intervals = self.create_intervals()
+            couriers_by_region = self.create_couriers(intervals)
+            self.create_orders(intervals, couriers_by_region)
+
+    def choice(self, distribution):
+        """
+        Случайное значение из распределения {значение: вес}
+        """
+        values = list(distribution)
+        weights = list(distribution.values())
+        return self.rnd.choices(values, weights)[0]
+
+    def random_region(self):
+        return self.rnd.choices(
+            self.region_ids, cum_weights=self.region_cum_weights
+        )[0]
+
+    def create_regions(self):
+        """
+        Популярность районов распределена по закону Ципфа
+        """
+        count = self.options['regions']
+        Region.objects.bulk_create(
+            (Region(region_id=i) for i in range(1, count + 1)),
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        skew = self.options['region_skew']
+        self.region_ids = list(range(1, count + 1))
+        self.rnd.shuffle(self.region_ids)
+        self.region_cum_weights = list(accumulate(
+            1 / rank ** skew for rank in range(1, count + 1)
+        ))
+
+    def create_intervals(self):
+        """
+        Все интервалы с шагом 30 минут и нужной длительностью
+        """
+        lengths = {
+            int(hours * 60)
+            for hours in (
+                parse_numbers(self.options['shift_hours']) +
+                parse_numbers(self.options['window_hours'])
+            )
+        }
+        names = {
+            interval_string(start, length)
+            for start in range(0, 24 * 60, 30)
+            for length in lengths
+        }
+        new_intervals = []
+        for name in sorted(names):
+            start, end = name.split('-')
+            new_intervals.append(
+                TimeInterval(interval=name, start=start, end=end)
+            )
+        TimeInterval.objects.bulk_create(
+            new_intervals, batch_size=self.batch_size, ignore_conflicts=True
+        )
+        intervals = TimeInterval.objects.in_bulk(names, field_name='interval')
+        # Интервалы в минутах для режима INTERVAL_STORAGE = 'inline'
+        self.interval_ranges = {
+            interval.pk: intervals_to_ranges([interval])[0]
+            for interval in intervals.values()
+        }
+        return {name: interval.pk for name, interval in intervals.items()}
+
+    def minute_ranges(self, interval_ids):
+        return sorted(self.interval_ranges[pk] for pk in interval_ids)
+
+    def ranges(self, interval_ids):
+        if not self.inline:
+            return []
+        return self.minute_ranges(interval_ids)
+
+    def random_interval(self, intervals, lengths, start_hour=None):
+        """
+        id случайного интервала; если start_hour не задан, начало
+        распределено равномерно по суткам
+        """
+        if start_hour is None:
+            start = self.rnd.randrange(0, 24 * 60, 30)
+        else:
+            start = int(min(max(start_hour, 0), 23.5) * 2) * 30
+        length = int(self.rnd.choice(lengths) * 60)
+        return intervals[interval_string(start, length)]
+
+    def create_couriers(self, intervals):
+        """
+        Возвращает для каждого района список (грузоподъемность, id,
+        CourierSnapshot) курьеров, работающих в нем
+        """
+        types = parse_weights(self.options['courier_types'])
+        regions_count = parse_weights(self.options['regions_per_courier'])
+        shifts_count = parse_weights(self.options['shifts_per_courier'])
+        shift_mean, shift_sd = parse_numbers(self.options['shift_start'])
+        shift_hours = parse_numbers(self.options['shift_hours'])
+        first_id = (
+            Courier.objects.aggregate(max_id=Max('courier_id'))['max_id'] or 0
+        ) + 1
+        last_id = first_id + self.options['couriers']
+
+        couriers = []
+        courier_regions = []
+        courier_hours = []
+        couriers_by_region = {}
+        for courier_id in range(first_id, last_id):
+            courier_type = self.choice(types)
+            regions = set()
+            regions_number = min(
+                int(self.choice(regions_count)), len(self.region_ids)
+            )
+            while len(regions) < regions_number:
+                regions.add(self.random_region())
+            hours = {
+                self.random_interval(
+                    intervals, shift_hours,
+                    self.rnd.gauss(shift_mean, shift_sd)
+                )
+                for _ in range(int(self.choice(shifts_count)))
+            }
+            snapshot = CourierSnapshot(courier_id, courier_type)
+            snapshot.region_ids = sorted(regions)
+            snapshot.ranges = self.minute_ranges(hours)
+            for region_id in regions:
+                if not self.region_array:
+                    courier_regions.append((courier_id, region_id))
+                couriers_by_region.setdefault(region_id, []).append((
+                    snapshot.max_weight, courier_id, snapshot,
+                ))
+            couriers.append((
+                courier_id, courier_type, self.ranges(hours),
+                sorted(regions) if self.region_array else [], 0, 0,
+            ))
+            if not self.inline:
+                for interval_id in hours:
+                    courier_hours.append((courier_id, interval_id))
+
+        insert_rows(
+            Courier,
+            ('courier_id', 'courier_type', 'working_ranges', 'region_ids',
+             'version', 'orders_version'),
+            couriers, self.batch_size
+        )
+        insert_rows(
+            Courier.regions.through, ('courier_id', 'region_id'),
+            courier_regions, self.batch_size
+        )
+        insert_rows(
+            Courier.working_hours.through, ('courier_id', 'timeinterval_id'),
+            courier_hours, self.batch_size
+        )
+        # Вставка идет мимо ORM, сигналы не отправляются
+        profiles.invalidate(*range(first_id, last_id))
+        self.stdout.write(f'Created {len(couriers)} couriers')
+        # Сортировка по грузоподъемности, чтобы быстро отбирать курьеров,
+        # которые могут взять заказ
+        for region_couriers in couriers_by_region.values():
+            region_couriers.sort()
+        return couriers_by_region
+
+    def create_orders(self, intervals, couriers_by_region):
+        """
+        Заказы создаются пачками по batch_size, чтобы не держать в памяти
+        миллионы строк. Часть заказов назначается подходящему курьеру (те же
+        правила, что и при назначении, api_v1.eligibility.order_fits)
+        и отмечается выполненной.
+        """
+        windows_count = parse_weights(self.options['windows_per_order'])
+        window_hours = parse_numbers(self.options['window_hours'])
+        weight_mu, weight_sigma = parse_numbers(self.options['weight'])
+        completed = self.options['completed']
+        expired = self.options['expired']
+        history_start = (
+            timezone.now() - timedelta(days=self.options['history_days'])
+        )
+        history_seconds = self.options['history_days'] * 24 * 60 * 60
+        capacities = {
+            region_id: [capacity for capacity, _, _ in region_couriers]
+            for region_id, region_couriers in couriers_by_region.items()
+        }
+        payments = {
+            courier_type: OrderAssignSerializer.calculate_payment(
+                courier_type
+            )
+            for courier_type in Courier.max_weights
+        }
+        last_complete = {}
+        first_id = (
+            Order.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        ) + 1
+        last_id = first_id + self.options['orders']
+        created = assigned = 0
+
+        for batch_start in range(first_id, last_id, self.batch_size):
+            orders = []
+            order_hours = []
+            assigned_orders = []
+            for order_id in range(
+                    batch_start, min(batch_start + self.batch_size, last_id)):
+                weight = self.rnd.lognormvariate(weight_mu, weight_sigma)
+                weight = Decimal(f'{min(max(weight, 0.01), 50):.2f}')
+                region_id = self.random_region()
+                hours = {
+                    self.random_interval(intervals, window_hours)
+                    for _ in range(int(self.choice(windows_count)))
+                }
+                if not self.inline:
+                    for interval_id in hours:
+                        order_hours.append((order_id, interval_id))
+                order = [order_id, weight, region_id, self.ranges(hours)]
+
+                candidates = []
+                if self.rnd.random() < completed:
+                    region_couriers = couriers_by_region.get(region_id, [])
+                    first = bisect_left(
+                        capacities.get(region_id, []), weight
+                    )
+                    ranges = self.minute_ranges(hours)
+                    candidates = [
+                        courier
+                        for _, _, courier in region_couriers[first:]
+                        if order_fits(courier, region_id, weight, ranges)
+                    ]
+                is_assigned = bool(candidates)
+                expires_at = None
+                if not is_assigned and expired and self.rnd.random() < expired:
+                    expires_at = history_start
+                orders.append(order + [is_assigned, expires_at, False])
+                if not is_assigned:
+                    continue
+
+                courier = self.rnd.choice(candidates)
+                courier_id = courier.courier_id
+                assign_time = history_start + timedelta(
+                    seconds=self.rnd.uniform(0, history_seconds)
+                )
+                previous_time = max(
+                    last_complete.get(courier_id, assign_time), assign_time
+                )
+                complete_time = previous_time + timedelta(
+                    minutes=self.rnd.expovariate(1 / 30)
+                )
+                last_complete[courier_id] = complete_time
+                assigned_orders.append((
+                    order_id, courier_id, assign_time, complete_time,
+                    complete_time - previous_time, True,
+                    payments[courier.courier_type],
+                ))
+
+            insert_rows(
+                Order,
+                ('id', 'weight', 'region', 'delivery_ranges', 'is_assigned',
+                 'expires_at', 'is_expired'),
+                orders, self.batch_size
+            )
+            insert_rows(
+                Order.delivery_hours.through, ('order_id', 'timeinterval_id'),
+                order_hours, self.batch_size
+            )
+            insert_rows(
+                AssignedOrder,
+                ('order', 'courier', 'assign_time', 'complete_time',
+                 'delivery_time', 'is_competed', 'payment'),
+                assigned_orders, self.batch_size
+            )
+            created += len(orders)
+            assigned += len(assigned_orders)
+            self.stdout.write(f'Created {created} orders')
+
+        self.stdout.write(f'Orders with completion history: {assigned}')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api_v1.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Удаляет просроченные ответы для заголовка Idempotency-Key'
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyKey.objects.filter(
+            expires__lte=timezone.now()
+        ).delete()
+        self.stdout.write(f'{deleted} keys deleted')
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from api_v1.models import Courier, Order
+from api_v1.sequencing import delivery_windows
+from api_v1.sharding import each_shard
+from api_v1 import supply
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает сводку спроса и предложения по районам (RegionSlot) '
+        'по заказам и курьерам и заменяет ею текущую. Исправляет '
+        'расхождения, нужна после смены SUPPLY_SLOT_MINUTES и загрузки '
+        'данных в обход API'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        delta = supply.Delta()
+        for alias in each_shard():
+            open_orders = Order.objects.filter(
+                is_assigned=False, is_expired=False
+            )
+            assigned_orders = Order.objects.filter(
+                assignedorder__is_competed=False
+            )
+            for orders in self.batches(open_orders, batch_size):
+                delta.add_orders(orders, delivery_windows(orders), opened=1)
+            for orders in self.batches(assigned_orders, batch_size):
+                delta.add_orders(orders, delivery_windows(orders), assigned=1)
+        couriers = 0
+        for batch in self.batches(Courier.objects.all(), batch_size):
+            for region_ids, ranges in supply.courier_supply(batch).values():
+                delta.add_courier(region_ids, ranges)
+            couriers += len(batch)
+        rows = len([values for values in delta.rows.values() if any(values)])
+        supply.replace(delta)
+        self.stdout.write(f'{couriers} couriers, {rows} region slots')
+
+    @staticmethod
+    def batches(queryset, batch_size):
+        """
+        Объекты queryset пачками по первичному ключу
+        """
+        queryset = queryset.order_by('pk')
+        last_pk = None
+        while True:
+            page = queryset if last_pk is None else queryset.filter(
+                pk__gt=last_pk
+            )
+            batch = list(page[:batch_size])
+            if not batch:
+                return
+            yield batch
+            last_pk = batch[-1].pk
@@ -0,0 +1,55 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from api_v1.simulation import load_couriers, load_orders, simulate
+
+
+def parse_ids(value):
+    """
+    Разбор списка id вида "1,2,10-20"
+    """
+    ids = []
+    try:
+        for item in value.split(','):
+            first, _, last = item.partition('-')
+            ids.extend(range(int(first), int(last or first) + 1))
+    except ValueError:
+        raise CommandError(f'Wrong list of ids: {value}')
+    return list(dict.fromkeys(ids))
+
+
+class Command(BaseCommand):
+    help = (
+        'Пробное назначение свободных заказов выбранным курьерам по правилам '
+        '/orders/assign без записи в БД. Выводит покрытие заказов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--couriers', type=parse_ids,
+            help='Courier ids in assignment order, e.g. "1,2,10-20". '
+                 'All couriers by default'
+        )
+        parser.add_argument(
+            '--limit', type=int,
+            help='Use only the first N of the selected couriers'
+        )
+        parser.add_argument(
+            '--json', action='store_true', help='Print full result as JSON'
+        )
+
+    def handle(self, *args, **options):
+        couriers = load_couriers(options['couriers'])
+        if options['limit'] is not None:
+            couriers = couriers[:options['limit']]
+        result = simulate(couriers, load_orders())
+        if options['json']:
+            self.stdout.write(json.dumps(result))
+            return
+        for key in (
+            'couriers', 'idle_couriers', 'pending_orders', 'covered_orders',
+            'coverage', 'pending_weight', 'covered_weight',
+            'orders_by_courier_type',
+        ):
+            self.stdout.write(f'{key}: {result[key]}')
+        top = list(result['uncovered_by_region'].items())[:10]
+        self.stdout.write(f'most uncovered regions: {top}')
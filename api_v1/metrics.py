@@ -0,0 +1,120 @@
+"""
+Метрики запросов в формате Prometheus, отдаются по /metrics.
+Для каждого действия DRF записываются время запроса, число запросов к БД,
+время в БД и число элементов в теле запроса.
+При нескольких процессах (gunicorn и т.п.) нужно задать переменную
+окружения PROMETHEUS_MULTIPROC_DIR - каталог для общих файлов метрик.
+"""
+import os
+import time
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Histogram, REGISTRY,
+    generate_latest, multiprocess,
+)
+from rest_framework.fields import empty
+from .utils import (
+    AsyncCapableMiddleware, request_action, wrap_connections
+)
+
+REQUEST_LATENCY = Histogram(
+    'api_request_duration_seconds',
+    'Request latency',
+    ['action', 'method', 'status'],
+)
+DB_QUERIES = Histogram(
+    'api_db_queries',
+    'SQL queries per request',
+    ['action'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000),
+)
+DB_TIME = Histogram(
+    'api_db_duration_seconds',
+    'Time spent in SQL queries per request',
+    ['action'],
+)
+PAYLOAD_ITEMS = Histogram(
+    'api_payload_items',
+    'Items in the "data" array of bulk requests',
+    ['action'],
+    buckets=(1, 10, 100, 1000, 10000, 100000),
+)
+
+
+class QueryCounter:
+    """
+    Обертка для connection.execute_wrapper, считает запросы и время в БД
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+def _payload_items(response):
+    """
+    Число элементов в ключе "data" уже разобранного тела запроса
+    """
+    drf_request = getattr(response, 'renderer_context', {}).get('request')
+    data = getattr(drf_request, '_full_data', empty)
+    if isinstance(data, dict) and isinstance(data.get('data'), list):
+        return len(data['data'])
+    return None
+
+
+class MetricsMiddleware(AsyncCapableMiddleware):
+    """
+    Работает и в синхронной, и в асинхронной цепочке, чтобы не переводить
+    асинхронные представления (долгий опрос) в отдельные потоки
+    """
+    def call(self, request):
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with wrap_connections(counter):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+        self.observe(request, response, duration, counter)
+        return response
+
+    async def __acall__(self, request):
+        # Запросы из потоков sync_to_async считаются тем же счетчиком
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with wrap_connections(counter):
+            response = await self.get_response(request)
+        duration = time.perf_counter() - start
+        self.observe(request, response, duration, counter)
+        return response
+
+    def observe(self, request, response, duration, counter):
+        action = request_action(request)
+        REQUEST_LATENCY.labels(
+            action, request.method, response.status_code
+        ).observe(duration)
+        DB_QUERIES.labels(action).observe(counter.count)
+        DB_TIME.labels(action).observe(counter.duration)
+        items = _payload_items(response)
+        if items is not None:
+            PAYLOAD_ITEMS.labels(action).observe(items)
+
+
+def metrics_view(request):
+    """
+    Метрики в текстовом формате Prometheus
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(
+        generate_latest(registry),
+        content_type=CONTENT_TYPE_LATEST
+    )
@@ -0,0 +1,61 @@
+# Generated by Django 3.1.7 on 2026-10-19 16:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Region',
+            fields=[
+                ('region_id', models.PositiveIntegerField(primary_key=True, serialize=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TimeInterval',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('interval', models.CharField(max_length=11, unique=True)),
+                ('start', models.TimeField()),
+                ('end', models.TimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('weight', models.DecimalField(decimal_places=2, max_digits=4)),
+                ('is_assigned', models.BooleanField(default=False)),
+                ('delivery_hours', models.ManyToManyField(to='api_v1.TimeInterval')),
+                ('region', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='api_v1.region')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Courier',
+            fields=[
+                ('courier_id', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('courier_type', models.CharField(choices=[('foot', '10'), ('bike', '15'), ('car', '50')], max_length=4)),
+                ('regions', models.ManyToManyField(to='api_v1.Region')),
+                ('working_hours', models.ManyToManyField(to='api_v1.TimeInterval')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AssignedOrder',
+            fields=[
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='api_v1.order')),
+                ('assign_time', models.DateTimeField()),
+                ('complete_time', models.DateTimeField(blank=True, null=True)),
+                ('delivery_time', models.DurationField(blank=True, null=True)),
+                ('is_competed', models.BooleanField(default=False)),
+                ('payment', models.IntegerField(blank=True, null=True)),
+                ('courier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assigned_orders', to='api_v1.courier')),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.1.7 on 2026-10-19 16:08
+
+import api_v1.ranges
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_v1', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='courier',
+            name='working_ranges',
+            field=api_v1.ranges.TimeRangesField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='delivery_ranges',
+            field=api_v1.ranges.TimeRangesField(blank=True, default=list),
+        ),
+    ]
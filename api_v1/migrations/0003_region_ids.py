@@ -0,0 +1,19 @@
+# Generated by Django 3.1.7 on 2026-10-19 16:08
+
+import api_v1.arrays
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_v1', '0002_time_ranges'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='courier',
+            name='region_ids',
+            field=api_v1.arrays.IntegerArrayField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.1.7 on 2026-10-19 16:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_v1', '0003_region_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='api_v1.order')),
+                ('month', models.DateField()),
+                ('assign_time', models.DateTimeField()),
+                ('complete_time', models.DateTimeField()),
+                ('delivery_time', models.DurationField()),
+                ('payment', models.IntegerField(blank=True, null=True)),
+                ('courier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to='api_v1.courier')),
+                ('region', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api_v1.region')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['month', 'courier'], name='api_v1_arch_month_fbbbdf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['courier', 'complete_time'], name='api_v1_arch_courier_968389_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.7 on 2026-10-19 16:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_v1', '0008_order_expiry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignedorder',
+            name='sequence',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
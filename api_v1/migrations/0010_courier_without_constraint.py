@@ -0,0 +1,24 @@
+# Generated by Django 3.1.7 on 2026-10-19 16:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_v1', '0009_assignedorder_sequence'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedorder',
+            name='courier',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to='api_v1.courier'),
+        ),
+        migrations.AlterField(
+            model_name='assignedorder',
+            name='courier',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='assigned_orders', to='api_v1.courier'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.1.7 on 2026-10-19 16:08
+
+import api_v1.arrays
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_v1', '0010_courier_without_constraint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('assigned', 'Assigned'), ('completed', 'Completed'), ('unassigned', 'Unassigned')], max_length=10)),
+                ('courier_id', models.PositiveIntegerField()),
+                ('order_ids', api_v1.arrays.IntegerArrayField(default=list)),
+                ('time', models.DateTimeField()),
+            ],
+        ),
+    ]
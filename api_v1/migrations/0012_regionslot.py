@@ -0,0 +1,28 @@
+# Generated by Django 3.1.7 on 2026-10-19 16:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_v1', '0011_orderevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegionSlot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('region_id', models.PositiveIntegerField()),
+                ('slot', models.PositiveSmallIntegerField()),
+                ('open_orders', models.IntegerField(default=0)),
+                ('open_weight', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('assigned_orders', models.IntegerField(default=0)),
+                ('couriers', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('region_id', 'slot')},
+            },
+        ),
+    ]
@@ -0,0 +1,89 @@
+"""
+Функции и индексы только для PostgreSQL: GiST-индекс по интервалам
+доставки (INTERVAL_STORAGE = 'inline', api_v1.ranges) и GIN-индекс по
+районам курьера (REGION_STORAGE = 'array', api_v1.arrays). Модели от СУБД
+не зависят, поэтому остальные миграции одинаковы для всех окружений.
+"""
+from django.db import migrations, router
+
+FUNCTIONS = '''
+CREATE OR REPLACE FUNCTION ranges_pairs(packed text)
+RETURNS TABLE (range_start integer, range_end integer)
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT numbers[i], numbers[i + 1]
+    FROM (SELECT string_to_array(packed, ',')::integer[] AS numbers) AS p,
+         generate_series(1, coalesce(array_length(numbers, 1), 0), 2) AS i
+$$;
+
+-- Кандидаты для индекса: нулевой интервал [x, x) расширен до [x, x + 1),
+-- чтобы не пропасть при нормализации диапазона
+CREATE OR REPLACE FUNCTION ranges_index(packed text)
+RETURNS int4multirange
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT coalesce(
+        range_agg(int4range(
+            range_start, greatest(range_end, range_start + 1)
+        )),
+        '{}'::int4multirange
+    )
+    FROM ranges_pairs(packed)
+$$;
+
+-- Точная проверка, как ranges_overlap в api_v1/ranges.py
+CREATE OR REPLACE FUNCTION ranges_overlap(packed_a text, packed_b text)
+RETURNS boolean
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT EXISTS (
+        SELECT 1
+        FROM ranges_pairs(packed_a) AS a, ranges_pairs(packed_b) AS b
+        WHERE a.range_start < b.range_end AND b.range_start < a.range_end
+    )
+$$;
+'''
+
+# Индексы по моделям, создаются только в базах, где есть таблица модели
+# (при шардировании - api_v1.db_routers.ShardRouter.allow_migrate)
+INDEXES = {
+    'Order': '''
+CREATE INDEX api_v1_order_delivery_ranges_gist
+    ON api_v1_order USING gist (ranges_index(delivery_ranges));
+''',
+    'Courier': '''
+CREATE INDEX api_v1_courier_region_ids_gin
+    ON api_v1_courier USING gin (region_ids);
+''',
+}
+
+DROP_FUNCTIONS = '''
+DROP INDEX IF EXISTS api_v1_courier_region_ids_gin;
+DROP INDEX IF EXISTS api_v1_order_delivery_ranges_gist;
+DROP FUNCTION IF EXISTS ranges_overlap(text, text);
+DROP FUNCTION IF EXISTS ranges_index(text);
+DROP FUNCTION IF EXISTS ranges_pairs(text);
+'''
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(FUNCTIONS)
+        alias = schema_editor.connection.alias
+        for model_name, sql in INDEXES.items():
+            model = apps.get_model('api_v1', model_name)
+            if router.allow_migrate_model(alias, model):
+                schema_editor.execute(sql)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_FUNCTIONS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_v1', '0012_regionslot'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
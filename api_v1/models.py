@@ -1,4 +1,9 @@
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+from .arrays import IntegerArrayField, region_array_storage
+from .profiles import courier_profile
+from .ranges import TimeRangesField
 
 
 class Region(models.Model):
@@ -25,6 +30,16 @@ class TimeInterval(models.Model):
         return f'{self.start}-{self.end}'
 
 
+class CourierQuerySet(models.QuerySet):
+    def serving_region(self, region_id):
+        """
+        Курьеры, работающие в районе
+        """
+        if region_array_storage():
+            return self.filter(region_ids__contains=[region_id])
+        return self.filter(regions=region_id)
+
+
 class Courier(models.Model):
     max_weights = {
         'foot': 10,
@@ -44,6 +59,42 @@ class Courier(models.Model):
     )
     regions = models.ManyToManyField(Region)
     working_hours = models.ManyToManyField(TimeInterval)
+    # Интервалы работы в режиме INTERVAL_STORAGE = 'inline'
+    working_ranges = TimeRangesField(default=list, blank=True)
+    # Районы в режиме REGION_STORAGE = 'array'
+    region_ids = IntegerArrayField(default=list, blank=True)
+    # Увеличивается при изменении курьера, сверяется кэшем профилей
+    version = models.PositiveIntegerField(default=0)
+    # Увеличивается при изменении назначенных заказов (api_v1.longpoll)
+    orders_version = models.PositiveIntegerField(default=0)
+
+    objects = CourierQuerySet.as_manager()
+
+    def get_region_ids(self):
+        """
+        Районы курьера для фильтра region__in: список или подзапрос
+        """
+        if region_array_storage():
+            return self.region_ids
+        return self.regions.all()
+
+    @property
+    def profile(self):
+        return courier_profile(self)
+
+
+class OrderQuerySet(models.QuerySet):
+    def live(self, now=None):
+        """
+        Свободные заказы, которые еще можно назначить: не назначенные
+        и не просроченные
+        """
+        now = now or timezone.now()
+        return self.filter(
+            Q(expires_at__isnull=True) | Q(expires_at__gt=now),
+            is_assigned=False,
+            is_expired=False,
+        )
 
 
 class Order(models.Model):
@@ -55,14 +106,35 @@ class Order(models.Model):
         on_delete=models.CASCADE,
     )
     delivery_hours = models.ManyToManyField(TimeInterval)
+    # Интервалы доставки в режиме INTERVAL_STORAGE = 'inline'
+    delivery_ranges = TimeRangesField(default=list, blank=True)
     is_assigned = models.BooleanField(default=False)
+    # Необязательный срок, после которого заказ не назначается. Просроченные
+    # свободные заказы отмечает командой expire_orders
+    expires_at = models.DateTimeField(null=True, blank=True)
+    is_expired = models.BooleanField(default=False)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Частичный индекс только по заказам, доступным для назначения
+            models.Index(
+                fields=['region', 'weight'],
+                condition=Q(is_assigned=False, is_expired=False),
+                name='order_candidates',
+            ),
+        ]
 
 
 class AssignedOrder(models.Model):
+    # Без ограничения в БД: при шардировании (api_v1.sharding) назначение
+    # лежит в шарде заказа, а курьер - в 'default'
     courier = models.ForeignKey(
         Courier,
         on_delete=models.CASCADE,
-        related_name='assigned_orders'
+        related_name='assigned_orders',
+        db_constraint=False,
     )
     order = models.OneToOneField(
         Order,
@@ -74,4 +146,94 @@ class AssignedOrder(models.Model):
     delivery_time = models.DurationField(null=True, blank=True)
     is_competed = models.BooleanField(default=False)
     payment = models.IntegerField(null=True, blank=True)
+    # Номер в порядке доставки заказов одного назначения (api_v1.sequencing)
+    sequence = models.PositiveIntegerField(null=True, blank=True)
+
+
+class ArchivedOrder(models.Model):
+    """
+    Выполненные назначения, перенесенные из AssignedOrder командой
+    archive_assignments. Горячая таблица остается маленькой, история
+    разбита по месяцам выполнения (поле month)
+    """
+    order = models.OneToOneField(
+        Order,
+        on_delete=models.CASCADE,
+        primary_key=True
+    )
+    courier = models.ForeignKey(
+        Courier,
+        on_delete=models.CASCADE,
+        related_name='archived_orders',
+        db_constraint=False,
+    )
+    # Район заказа, чтобы считать рейтинг без join с Order
+    region = models.ForeignKey(
+        Region,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    month = models.DateField()
+    assign_time = models.DateTimeField()
+    complete_time = models.DateTimeField()
+    delivery_time = models.DurationField()
+    payment = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['month', 'courier']),
+            models.Index(fields=['courier', 'complete_time']),
+        ]
+
+
+class OrderEvent(models.Model):
+    """
+    Журнал назначений, выполнений и снятий заказов для GET /events
+    (api_v1.events). Строки только добавляются, id - курсор потребителя
+    """
+    class Kind(models.TextChoices):
+        ASSIGNED = 'assigned'
+        COMPLETED = 'completed'
+        UNASSIGNED = 'unassigned'
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    # Без внешних ключей: журнал переживает архивацию и шардирование
+    courier_id = models.PositiveIntegerField()
+    order_ids = IntegerArrayField(default=list)
+    time = models.DateTimeField()
+
+
+class IdempotencyKey(models.Model):
+    """
+    Ответ на запрос с заголовком Idempotency-Key (api_v1.idempotency).
+    Пока запрос выполняется, status_code пустой
+    """
+    # "<basename>-<действие>:<значение заголовка>"
+    key = models.CharField(max_length=300, primary_key=True)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.TextField(blank=True)
+    expires = models.DateTimeField(db_index=True)
+
+
+class RegionSlot(models.Model):
+    """
+    Сводка спроса и предложения по району и интервалу суток
+    (api_v1.supply): свободные заказы, их вес, назначенные невыполненные
+    заказы и курьеры, которые работают в районе в этом интервале.
+    Обновляется приращениями, пересчитывается командой rebuild_supply
+    """
+    # Без внешнего ключа: при шардировании районы есть в каждом шарде
+    region_id = models.PositiveIntegerField()
+    # Номер интервала длиной SUPPLY_SLOT_MINUTES от начала суток
+    slot = models.PositiveSmallIntegerField()
+    open_orders = models.IntegerField(default=0)
+    open_weight = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0
+    )
+    assigned_orders = models.IntegerField(default=0)
+    couriers = models.IntegerField(default=0)
 
+    class Meta:
+        unique_together = ('region_id', 'slot')
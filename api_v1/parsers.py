@@ -0,0 +1,35 @@
+"""
+Парсер JSON на основе orjson.
+Если orjson не установлен, работает как стандартный JSONParser.
+Сжатое тело (Content-Encoding: gzip, zstd) распаковывается перед разбором.
+"""
+import codecs
+import io
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from .compression import decode_stream
+from .renderers import ORJSONRenderer, orjson
+
+
+class ORJSONParser(JSONParser):
+    """
+    Парсер на orjson. Если orjson не смог разобрать тело запроса, разбор
+    повторяется стандартным парсером: так сохраняются сообщения об ошибках
+    и поведение для значений, которые orjson не принимает.
+    """
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        stream = decode_stream(stream, parser_context)
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(
+                io.BytesIO(body), media_type, parser_context
+            )
@@ -0,0 +1,305 @@
+"""
+Быстрая предварительная проверка списков "data" в POST /couriers и
+POST /orders. Схемы элементов (CourierCreate, OrderCreate) из
+openapi.yaml один раз на процесс компилируются в функции проверки.
+Элемент, прошедший схему, преобразуется полями сериализатора без
+run_validation, после чего остаются только проверки validate_<поле>
+(уникальность id). Элементы, не прошедшие схему или преобразование,
+проверяет вложенный сериализатор как обычно, поэтому ошибки и id в
+validation_error совпадают с проверкой без предварительного этапа.
+Ограничения, которые проверяют поля, но не выводит drf-spectacular
+(id районов > 0, формат интервалов), добавляются в схему хуком
+add_field_constraints.
+"""
+import logging
+import re
+from functools import lru_cache
+import yaml
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import empty, get_error_detail
+
+logger = logging.getLogger(__name__)
+
+INTERVAL_PATTERN = (
+    r'^([01][0-9]|2[0-3]):[0-5][0-9]-([01][0-9]|2[0-3]):[0-5][0-9]$'
+)
+
+# {компонент схемы: {свойство: дополнение схемы}}
+FIELD_CONSTRAINTS = {
+    'CourierCreate': {
+        'regions': {'items': {'minimum': 1}},
+        'working_hours': {'items': {'pattern': INTERVAL_PATTERN}},
+    },
+    'CourierUpdate': {
+        'regions': {'items': {'minimum': 1}},
+        'working_hours': {'items': {'pattern': INTERVAL_PATTERN}},
+    },
+    'PatchedCourierUpdate': {
+        'regions': {'items': {'minimum': 1}},
+        'working_hours': {'items': {'pattern': INTERVAL_PATTERN}},
+    },
+    'OrderCreate': {
+        'region': {'minimum': 1},
+        'delivery_hours': {'items': {'pattern': INTERVAL_PATTERN}},
+    },
+}
+
+
+class Fallback(Exception):
+    """
+    Значение нельзя преобразовать быстро, элемент нужно проверить
+    сериализатором
+    """
+
+
+def add_field_constraints(result, generator, **kwargs):
+    """
+    Хук drf-spectacular (POSTPROCESSING_HOOKS): добавляет в компоненты
+    ограничения из FIELD_CONSTRAINTS
+    """
+    schemas = result.get('components', {}).get('schemas', {})
+    for component, properties in FIELD_CONSTRAINTS.items():
+        for name, extra in properties.items():
+            prop = schemas.get(component, {}).get('properties', {}).get(name)
+            if prop is None:
+                continue
+            for key, value in extra.items():
+                if isinstance(value, dict):
+                    prop.setdefault(key, {}).update(value)
+                else:
+                    prop[key] = value
+    return result
+
+
+TYPE_CHECKS = {
+    'integer': lambda value: type(value) is int,
+    'number': lambda value: type(value) in (int, float),
+    'string': lambda value: type(value) is str,
+    'boolean': lambda value: type(value) is bool,
+    'array': lambda value: type(value) is list,
+    'object': lambda value: type(value) is dict,
+}
+
+
+def _all(checks):
+    if not checks:
+        return lambda value: True
+    if len(checks) == 1:
+        return checks[0]
+    checks = tuple(checks)
+
+    def check_all(value):
+        for check in checks:
+            if not check(value):
+                return False
+        return True
+    return check_all
+
+
+def compile_schema(schema, components):
+    """
+    Функция value -> bool для подмножества JSON Schema, которое выводит
+    drf-spectacular: $ref, allOf, type, enum, nullable, minimum, maximum,
+    pattern, items, properties, required. readOnly-свойства во входных
+    данных не проверяются
+    """
+    if '$ref' in schema:
+        name = schema['$ref'].rsplit('/', 1)[-1]
+        return compile_schema(components[name], components)
+    checks = [
+        compile_schema(part, components) for part in schema.get('allOf', ())
+    ]
+    if 'type' in schema:
+        checks.append(TYPE_CHECKS[schema['type']])
+    if 'enum' in schema:
+        choices = frozenset(schema['enum'])
+
+        def check_enum(value):
+            try:
+                return value in choices
+            except TypeError:
+                return False
+        checks.append(check_enum)
+    if 'minimum' in schema:
+        minimum = schema['minimum']
+        checks.append(lambda value: value >= minimum)
+    if 'maximum' in schema:
+        maximum = schema['maximum']
+        checks.append(lambda value: value <= maximum)
+    if 'pattern' in schema:
+        match = re.compile(schema['pattern']).search
+        checks.append(lambda value: match(value) is not None)
+    if 'items' in schema:
+        check_item = compile_schema(schema['items'], components)
+
+        def check_items(value):
+            for item in value:
+                if not check_item(item):
+                    return False
+            return True
+        checks.append(check_items)
+    if 'properties' in schema:
+        writable = {
+            name: prop for name, prop in schema['properties'].items()
+            if not prop.get('readOnly')
+        }
+        required = tuple(
+            name for name in schema.get('required', ()) if name in writable
+        )
+        properties = tuple(
+            (name, compile_schema(prop, components))
+            for name, prop in writable.items()
+        )
+
+        def check_object(value):
+            for name in required:
+                if name not in value:
+                    return False
+            for name, check in properties:
+                if name in value and not check(value[name]):
+                    return False
+            return True
+        checks.append(check_object)
+    check = _all(checks)
+    if schema.get('nullable'):
+        return lambda value: value is None or check(value)
+    return check
+
+
+@lru_cache(maxsize=None)
+def load_components():
+    """
+    Схемы компонентов из SCHEMA_FILE, None, если файла нет
+    """
+    try:
+        with open(settings.SCHEMA_FILE, 'rb') as schema_file:
+            schema = yaml.load(
+                schema_file,
+                Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+            )
+    except OSError:
+        logger.warning(
+            'Schema file %s not found, prevalidation is disabled',
+            settings.SCHEMA_FILE
+        )
+        return None
+    return schema['components']['schemas']
+
+
+@lru_cache(maxsize=None)
+def item_check(component):
+    """
+    Скомпилированная проверка компонента схемы или None
+    """
+    components = load_components()
+    if components is None or component not in components:
+        return None
+    return compile_schema(components[component], components)
+
+
+def compile_all():
+    """
+    Компилирует схемы сериализаторов, использующих предварительную проверку
+    """
+    for component in FIELD_CONSTRAINTS:
+        item_check(component)
+
+
+def field_converter(field):
+    """
+    Преобразование значения, уже прошедшего схему, в значение поля.
+    Поле может задать свое преобразование методом convert_prevalidated,
+    оно вызывает Fallback, если значение нужно проверить полностью.
+    Преобразования не полагаются на схему: устаревший openapi.yaml
+    замедляет проверку, но не пропускает неверные данные
+    """
+    convert = getattr(field, 'convert_prevalidated', None)
+    if convert is not None:
+        return convert
+    if type(field) is serializers.IntegerField:
+        def convert(value):
+            if type(value) is not int:
+                raise Fallback
+            field.run_validators(value)
+            return value
+        return convert
+    if type(field) is serializers.ChoiceField:
+        choices = field.choice_strings_to_values
+
+        def convert(value):
+            if type(value) is not str or value not in choices:
+                raise Fallback
+            return choices[value]
+        return convert
+    return field.run_validation
+
+
+def prevalidate(list_serializer, data):
+    """
+    Проверка списка data для list_serializer (UniqueIdListSerializer).
+    Возвращает список validated_data или вызывает ValidationError с
+    ошибками по элементам, как ListSerializer.to_internal_value
+    """
+    child = list_serializer.child
+    component = type(child).__name__[:-len('Serializer')]
+    check = item_check(component)
+    if check is None or child.validators or not data:
+        return None
+    fields = []
+    for field in child._writable_fields:
+        if len(field.source_attrs) != 1 or field.default is not empty:
+            return None
+        fields.append((
+            field.field_name, field.source, field_converter(field),
+            getattr(child, f'validate_{field.field_name}', None),
+        ))
+    ret = []
+    errors = []
+    has_errors = False
+    for item in data:
+        validated = None
+        if check(item):
+            try:
+                validated = {}
+                for name, source, convert, validate in fields:
+                    if name in item:
+                        validated[source] = convert(item[name])
+            except (Fallback, ValidationError):
+                validated = None
+        if validated is None:
+            # Полная проверка сериализатором, в том числе сообщения
+            try:
+                validated = child.run_validation(item)
+            except ValidationError as exc:
+                errors.append(exc.detail)
+                has_errors = True
+                continue
+            ret.append(validated)
+            errors.append({})
+            continue
+        item_errors = {}
+        for name, source, convert, validate in fields:
+            if validate is not None and source in validated:
+                try:
+                    validated[source] = validate(validated[source])
+                except ValidationError as exc:
+                    item_errors[name] = exc.detail
+                except DjangoValidationError as exc:
+                    item_errors[name] = get_error_detail(exc)
+        if not item_errors:
+            try:
+                validated = child.validate(validated)
+            except (ValidationError, DjangoValidationError) as exc:
+                item_errors = serializers.as_serializer_error(exc)
+        if item_errors:
+            errors.append(item_errors)
+            has_errors = True
+            continue
+        ret.append(validated)
+        errors.append({})
+    if has_errors:
+        raise ValidationError(errors)
+    return ret
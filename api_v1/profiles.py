@@ -0,0 +1,145 @@
+"""
+Кэш профилей курьеров в памяти процесса. Профиль - компактная выжимка
+курьера (тип, грузоподъемность, районы, интервалы работы), которой хватает
+назначению заказов, снятию неподходящих заказов и карточке курьера без
+запросов к M2M-таблицам.
+Запись в кэше сверяется с полем Courier.version, которое увеличивается
+при каждом PATCH, поэтому профиль, измененный в другом процессе, не
+используется. Изменения в этом процессе сбрасывают запись сигналами.
+"""
+from collections import OrderedDict
+from threading import Lock
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from .arrays import region_array_storage
+from .ranges import format_ranges, inline_storage, to_minutes
+
+
+class CourierProfile:
+    __slots__ = (
+        'courier_id', 'courier_type', 'max_weight', 'version',
+        'region_ids', 'working_hours', 'intervals', 'ranges',
+    )
+
+    def __init__(self, courier, regions=None, intervals=None):
+        """
+        regions и intervals - уже известные районы и объекты TimeInterval
+        курьера (после PATCH), иначе M2M-связи читаются из БД
+        """
+        self.courier_id = courier.pk
+        self.courier_type = courier.courier_type
+        self.max_weight = courier.max_weights[courier.courier_type]
+        self.version = courier.version
+        if region_array_storage():
+            self.region_ids = tuple(courier.region_ids)
+        elif regions is not None:
+            self.region_ids = tuple(sorted({region.pk for region in regions}))
+        else:
+            self.region_ids = tuple(
+                courier.regions.values_list('pk', flat=True)
+            )
+        if inline_storage():
+            # Пересечение ищется по полю working_ranges
+            self.ranges = tuple(courier.working_ranges)
+            self.working_hours = tuple(format_ranges(self.ranges))
+            self.intervals = ()
+        else:
+            if intervals is not None:
+                rows = [
+                    (interval.interval, interval.start, interval.end)
+                    for interval in intervals
+                ]
+            else:
+                rows = courier.working_hours.values_list(
+                    'interval', 'start', 'end'
+                )
+            self.ranges = ()
+            self.working_hours = tuple(interval for interval, _, _ in rows)
+            self.intervals = tuple((start, end) for _, start, end in rows)
+
+    def minute_ranges(self):
+        """
+        Часы работы в минутах от начала суток
+        """
+        if self.ranges:
+            return self.ranges
+        return tuple(
+            (to_minutes(start), to_minutes(end))
+            for start, end in self.intervals
+        )
+
+
+class ProfileCache:
+    """
+    LRU-кэш профилей на COURIER_CACHE_SIZE курьеров, 0 отключает кэш
+    """
+    def __init__(self):
+        self._profiles = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, courier_id, version):
+        with self._lock:
+            profile = self._profiles.get(courier_id)
+            if profile is None or profile.version != version:
+                return None
+            self._profiles.move_to_end(courier_id)
+            return profile
+
+    def put(self, profile):
+        size = settings.COURIER_CACHE_SIZE
+        if size <= 0:
+            return
+        with self._lock:
+            self._profiles[profile.courier_id] = profile
+            self._profiles.move_to_end(profile.courier_id)
+            while len(self._profiles) > size:
+                self._profiles.popitem(last=False)
+
+    def invalidate(self, *courier_ids):
+        with self._lock:
+            for courier_id in courier_ids:
+                self._profiles.pop(courier_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+    def __len__(self):
+        return len(self._profiles)
+
+
+profiles = ProfileCache()
+
+
+def courier_profile(courier):
+    """
+    Профиль курьера из кэша или построенный по загруженной строке courier
+    """
+    profile = profiles.get(courier.pk, courier.version)
+    if profile is None:
+        profile = CourierProfile(courier)
+        profiles.put(profile)
+    return profile
+
+
+@receiver(post_save, sender='api_v1.Courier')
+@receiver(post_delete, sender='api_v1.Courier')
+def invalidate_courier(sender, instance, **kwargs):
+    profiles.invalidate(instance.pk)
+
+
+@receiver(m2m_changed, sender='api_v1.Courier_regions')
+@receiver(m2m_changed, sender='api_v1.Courier_working_hours')
+def invalidate_courier_relations(sender, instance, action, reverse, pk_set,
+                                 **kwargs):
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        # Изменение со стороны района или интервала: pk_set - курьеры
+        if pk_set is None:
+            profiles.clear()
+        else:
+            profiles.invalidate(*pk_set)
+    else:
+        profiles.invalidate(instance.pk)
@@ -0,0 +1,105 @@
+"""
+Профилирование отдельных запросов по требованию.
+Включается настройкой PROFILING (middleware добавляется в MIDDLEWARE только
+тогда, поэтому в выключенном состоянии накладных расходов нет).
+Профилируется запрос с заголовком PROFILING_HEADER или случайная доля
+запросов PROFILING_SAMPLE_RATE. Для каждого запроса в PROFILING_DIR
+пишутся два файла: <имя>.prof (cProfile, можно открыть в snakeviz) и
+<имя>.json (запрос, время и все SQL-запросы с длительностью).
+Когда суммарный размер каталога превышает PROFILING_MAX_BYTES,
+самые старые файлы удаляются.
+"""
+import cProfile
+import json
+import os
+import random
+import time
+from pathlib import Path
+from django.conf import settings
+from .utils import request_action, wrap_connections
+
+
+class QueryRecorder:
+    """
+    Обертка для connection.execute_wrapper, записывает SQL и длительность
+    """
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'database': context['connection'].alias,
+                'sql': sql,
+                'many': many,
+                'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+            })
+
+
+def rotate(directory, max_bytes):
+    """
+    Удаляет самые старые файлы, пока каталог больше max_bytes
+    """
+    files = sorted(
+        (entry.stat().st_mtime, entry.stat().st_size, entry)
+        for entry in directory.iterdir() if entry.is_file()
+    )
+    total = sum(size for _, size, _ in files)
+    for _, size, entry in files:
+        if total <= max_bytes:
+            break
+        entry.unlink(missing_ok=True)
+        total -= size
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.directory = Path(settings.PROFILING_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.header = 'HTTP_' + settings.PROFILING_HEADER.upper().replace(
+            '-', '_'
+        )
+
+    def should_profile(self, request):
+        if request.META.get(self.header):
+            return True
+        return random.random() < settings.PROFILING_SAMPLE_RATE
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        with wrap_connections(recorder):
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration = time.perf_counter() - start
+
+        action = request_action(request)
+        name = f'{time.time():.6f}-{action}-{os.getpid()}'
+        profiler.dump_stats(self.directory / f'{name}.prof')
+        report = {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'action': action,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 3),
+            'sql_count': len(recorder.queries),
+            'sql_duration_ms': round(
+                sum(query['duration_ms'] for query in recorder.queries), 3
+            ),
+            'sql': recorder.queries,
+        }
+        with open(self.directory / f'{name}.json', 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+        rotate(self.directory, settings.PROFILING_MAX_BYTES)
+        return response
@@ -0,0 +1,130 @@
+"""
+Хранение интервалов времени прямо в строке курьера или заказа
+(режим INTERVAL_STORAGE = 'inline') вместо M2M-связи с TimeInterval.
+Интервал - пара минут от начала суток [начало, конец).
+Интервалы упакованы в строку целых чисел "начало,конец,начало,конец" на
+всех СУБД: порядок, пересекающиеся и нулевые интервалы сохраняются как
+переданы в API. Пересечение проверяет функция ranges_overlap с той же
+логикой, что и условие для M2M: в SQLite она регистрируется при
+подключении, в PostgreSQL создается миграцией вместе с ranges_index -
+int4multirange для GiST-индекса, по которому отбираются кандидаты.
+"""
+from django.conf import settings
+from django.db import models
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def inline_storage():
+    return settings.INTERVAL_STORAGE == 'inline'
+
+
+def to_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def intervals_to_ranges(intervals):
+    """
+    Список объектов TimeInterval в список интервалов в минутах без
+    повторов, в порядке передачи
+    """
+    return list(dict.fromkeys(
+        (to_minutes(interval.start), to_minutes(interval.end))
+        for interval in intervals
+    ))
+
+
+def format_ranges(ranges):
+    """
+    Интервалы в минутах в формат API "HH:MM-HH:MM"
+    """
+    return [
+        f'{start // 60:02}:{start % 60:02}-{end // 60:02}:{end % 60:02}'
+        for start, end in ranges
+    ]
+
+
+def pack_ranges(ranges):
+    return ','.join(f'{start},{end}' for start, end in ranges)
+
+
+def unpack_ranges(value):
+    if not value:
+        return []
+    numbers = [int(number) for number in value.split(',')]
+    return list(zip(numbers[::2], numbers[1::2]))
+
+
+def ranges_intersect(ranges_a, ranges_b):
+    """
+    Есть ли пересечение хотя бы одной пары интервалов в минутах
+    """
+    return any(
+        start_a < end_b and start_b < end_a
+        for start_a, end_a in ranges_a
+        for start_b, end_b in ranges_b
+    )
+
+
+def ranges_overlap(packed_a, packed_b):
+    """
+    ranges_intersect для упакованных строк, функция SQLite
+    """
+    return ranges_intersect(unpack_ranges(packed_a), unpack_ranges(packed_b))
+
+
+class TimeRangesField(models.Field):
+    """
+    Список интервалов [(начало, конец), ...] в минутах от начала суток
+    """
+    description = 'List of time ranges in minutes'
+
+    def db_type(self, connection):
+        return 'text'
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return []
+        return unpack_ranges(value)
+
+    def to_python(self, value):
+        if isinstance(value, str):
+            return unpack_ranges(value)
+        return [tuple(pair) for pair in value or []]
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        return pack_ranges(self.to_python(value))
+
+
+@TimeRangesField.register_lookup
+class Overlap(models.Lookup):
+    """
+    field__overlap=[(начало, конец), ...]
+    """
+    lookup_name = 'overlap'
+
+    def get_db_prep_lookup(self, value, connection):
+        return '%s', [self.lhs.output_field.get_db_prep_value(
+            value, connection
+        )]
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        params = lhs_params + rhs_params
+        if connection.vendor == 'postgresql':
+            # Отбор по GiST-индексу, затем точная проверка
+            return (
+                f'ranges_index({lhs}) && ranges_index({rhs}) '
+                f'AND ranges_overlap({lhs}, {rhs})',
+                params * 2
+            )
+        return f'ranges_overlap({lhs}, {rhs})', params
+
+
+@receiver(connection_created)
+def register_sqlite_functions(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function(
+            'ranges_overlap', 2, ranges_overlap, deterministic=True
+        )
@@ -0,0 +1,51 @@
+"""
+Рендерер JSON на основе orjson.
+Если orjson не установлен, работает как стандартный JSONRenderer.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Рендерер на orjson. Decimal, datetime, timedelta и прочие типы, которые
+    orjson не умеет сериализовать сам, передаются в стандартный
+    JSONEncoder DRF, поэтому вывод совпадает со стандартным рендерером.
+    """
+    default = encoders.JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        # Форматированный вывод и ASCII-режим оставляем стандартному рендереру
+        if (
+            orjson is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context)
+        ):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except orjson.JSONEncodeError:
+            # Например, int больше 64 бит или NaN
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        # Как и JSONRenderer, экранируем U+2028 и U+2029
+        return (
+            ret.replace(b'\xe2\x80\xa8', b'\\u2028')
+            .replace(b'\xe2\x80\xa9', b'\\u2029')
+        )
@@ -0,0 +1,16 @@
+"""
+Генерация схемы OpenAPI (drf-spectacular). Параметры запроса берутся из
+сериализатора query_serializer_class представления. Модуль загружается
+только при генерации схемы, профиль API_ONLY его не импортирует.
+"""
+from drf_spectacular.openapi import AutoSchema as SpectacularAutoSchema
+
+
+class AutoSchema(SpectacularAutoSchema):
+    def get_override_parameters(self):
+        query_serializer_class = getattr(
+            self.view, 'query_serializer_class', None
+        )
+        if query_serializer_class is None:
+            return super().get_override_parameters()
+        return [query_serializer_class]
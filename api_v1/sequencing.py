@@ -0,0 +1,65 @@
+"""
+Порядок доставки назначенных заказов. Для каждого заказа берется самый
+ранний конец пересечения его интервалов доставки с часами работы курьера
+(срок доставки). Заказы группируются по району: районы идут по самому
+раннему сроку своих заказов, внутри района - по сроку (earliest deadline
+first), при равенстве - по началу окна и id.
+"""
+from collections import defaultdict
+from .models import Order
+from .ranges import inline_storage, to_minutes
+
+DAY = (0, 24 * 60)
+
+
+def delivery_windows(orders):
+    """
+    {id заказа: интервалы доставки в минутах}
+    """
+    if inline_storage():
+        return {order.pk: order.delivery_ranges for order in orders}
+    windows = {order.pk: [] for order in orders}
+    rows = Order.delivery_hours.through.objects.filter(
+        order_id__in=list(windows)
+    ).values_list('order_id', 'timeinterval__start', 'timeinterval__end')
+    for order_id, start, end in rows:
+        windows[order_id].append((to_minutes(start), to_minutes(end)))
+    return windows
+
+
+def deadline(windows, working_ranges):
+    """
+    (конец, начало) самого раннего пересечения окна доставки с часами
+    работы
+    """
+    feasible = [
+        (min(end, work_end), max(start, work_start))
+        for start, end in windows
+        for work_start, work_end in working_ranges
+        if max(start, work_start) < min(end, work_end)
+    ]
+    if not feasible:
+        feasible = [(end, start) for start, end in windows] or [DAY[::-1]]
+    return min(feasible)
+
+
+def sequence(orders, working_ranges, windows=None):
+    """
+    Заказы в порядке доставки. windows - результат delivery_windows, если
+    он уже получен (например, отдельно в каждом шарде)
+    """
+    if windows is None:
+        windows = delivery_windows(orders)
+    keys = {
+        order.pk: (*deadline(windows[order.pk], working_ranges), order.pk)
+        for order in orders
+    }
+    by_region = defaultdict(list)
+    for order in orders:
+        by_region[order.region_id].append(order)
+    for region_orders in by_region.values():
+        region_orders.sort(key=lambda order: keys[order.pk])
+    regions = sorted(
+        by_region.values(), key=lambda region: keys[region[0].pk]
+    )
+    return [order for region in regions for order in region]
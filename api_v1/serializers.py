@@ -1,49 +1,257 @@
-import operator
 from datetime import datetime
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
-from rest_framework.validators import UniqueValidator
-from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Q, Sum, Avg, Min
+from rest_framework.relations import MANY_RELATION_KWARGS
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum, Count
 from django.utils import timezone
-from functools import reduce
-from .models import Courier, TimeInterval, Region, Order, AssignedOrder
+from . import events
+from .admission import BatchTooLarge
+from .arrays import region_array_storage
+from .eligibility import order_condition
+from .models import (
+    Courier, TimeInterval, Region, Order, AssignedOrder, ArchivedOrder,
+    OrderEvent, RegionSlot,
+)
+from .longpoll import orders_changed
+from .prevalidation import Fallback, prevalidate
+from .profiles import CourierProfile, profiles
+from .sequencing import delivery_windows, sequence
+from .sharding import each_shard, is_sharded, shard_atomic, shard_for_region
+from .supply import Delta, enabled as supply_enabled, slot_label
+from .ranges import inline_storage, intervals_to_ranges, format_ranges
 
 
-class RegionRelatedField(serializers.PrimaryKeyRelatedField):
+class InlineManyRelatedField(serializers.ManyRelatedField):
     """
-    Кастомное поле на основе PrimaryKeyRelatedField,
-    создает Region, если его еще не было в базе
+    Список связанных объектов, который при включенном режиме хранения
+    (storage_enabled) читается из поля inline_source модели, а не из
+    M2M-связи
     """
+    storage_enabled = None
+
+    def __init__(self, inline_source=None, **kwargs):
+        self.inline_source = inline_source
+        super().__init__(**kwargs)
+
+    def is_inline(self):
+        return bool(self.inline_source) and self.storage_enabled()
+
+    def get_attribute(self, instance):
+        if self.is_inline():
+            return getattr(instance, self.inline_source)
+        return super().get_attribute(instance)
+
+    def to_representation(self, iterable):
+        if self.is_inline():
+            return self.format_inline(iterable)
+        return super().to_representation(iterable)
+
+    def format_inline(self, value):
+        return list(value)
+
+    def convert_prevalidated(self, data):
+        """
+        Преобразование списка, прошедшего схему (см. prevalidation)
+        """
+        if not data and not self.allow_empty:
+            raise Fallback
+        convert = self.child_relation.convert_prevalidated
+        return [convert(item) for item in data]
+
+
+class InlineManyMixin:
+    """
+    Передает аргумент inline_source в поле-список many_class
+    """
+    many_class = InlineManyRelatedField
+
+    @classmethod
+    def many_init(cls, *args, inline_source=None, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return cls.many_class(inline_source=inline_source, **list_kwargs)
+
+
+class RegionsManyField(InlineManyRelatedField):
+    """
+    Список районов. В режиме REGION_STORAGE = 'array' читается из
+    массива id в строке модели
+    """
+    storage_enabled = staticmethod(region_array_storage)
+
+
+class TimeIntervalsManyField(InlineManyRelatedField):
+    """
+    Список интервалов. В режиме INTERVAL_STORAGE = 'inline' читается из
+    поля inline_source модели, а не из M2M-связи
+    """
+    storage_enabled = staticmethod(inline_storage)
+
+    def format_inline(self, value):
+        return format_ranges(value)
+
+
+class RegionRelatedField(InlineManyMixin,
+                         serializers.PrimaryKeyRelatedField):
+    """
+    Кастомное поле на основе PrimaryKeyRelatedField.
+    Не обращается к БД: возвращает несохраненный Region, отсутствующие в
+    базе регионы создаются одним запросом в save_regions
+    """
+    many_class = RegionsManyField
+
+    default_error_messages = {
+        **serializers.PrimaryKeyRelatedField.default_error_messages,
+        'min_value': 'Region id must be integer > 0.',
+    }
+
     def to_internal_value(self, data):
-        queryset = self.get_queryset()
+        if isinstance(data, bool) or not isinstance(data, (int, str)):
+            self.fail('incorrect_type', data_type=type(data).__name__)
         try:
-            return queryset.get(pk=data)
-        except ObjectDoesNotExist:
-            return queryset.create(pk=data)
-        except (TypeError, ValueError):
+            region_id = int(data)
+        except ValueError:
             self.fail('incorrect_type', data_type=type(data).__name__)
+        if region_id < 1:
+            self.fail('min_value')
+        return Region(region_id=region_id)
 
+    def convert_prevalidated(self, data):
+        if type(data) is not int or data < 1:
+            raise Fallback
+        return Region(region_id=data)
 
-class TimeIntervalRelatedField(serializers.SlugRelatedField):
+
+class TimeIntervalRelatedField(InlineManyMixin,
+                               serializers.SlugRelatedField):
     """
-    Кастомное поле на основе SlugRelatedField,
-    создает TimeInterval, если его еще не было в базе
+    Кастомное поле на основе SlugRelatedField.
+    Не обращается к БД: возвращает несохраненный TimeInterval, интервалы
+    сохраняются и получают id одним запросом в save_intervals
     """
+    many_class = TimeIntervalsManyField
+
     def to_internal_value(self, data):
-        queryset = self.get_queryset()
         try:
             start, end = data.split('-')
-            datetime.strptime(start, '%H:%M')
-            datetime.strptime(end, '%H:%M')
+            start_time = datetime.strptime(start, '%H:%M').time()
+            end_time = datetime.strptime(end, '%H:%M').time()
             if start > end:
                 self.fail('invalid')
-            return queryset.get(**{self.slug_field: data})
-        except ObjectDoesNotExist:
-            return queryset.create(**{self.slug_field: data})
-        except (TypeError, ValueError):
+            return TimeInterval(
+                **{self.slug_field: data}, start=start_time, end=end_time
+            )
+        except (TypeError, ValueError, AttributeError):
             self.fail('invalid')
 
+    def convert_prevalidated(self, data):
+        """
+        Одинаковые интервалы разбираются один раз на поле
+        """
+        cache = self.__dict__.setdefault('_prevalidated', {})
+        try:
+            return cache[data]
+        except KeyError:
+            pass
+        except TypeError:
+            raise Fallback
+        try:
+            interval = self.to_internal_value(data)
+        except ValidationError:
+            raise Fallback
+        cache[data] = interval
+        return interval
+
+
+def save_regions(regions, using=None):
+    """
+    Создает одним запросом регионы, которых еще нет в базе
+    """
+    regions = {region.pk: region for region in regions}
+    Region.objects.db_manager(using).bulk_create(
+        regions.values(), ignore_conflicts=True
+    )
+
+
+def save_intervals(intervals, using=None):
+    """
+    Создает недостающие интервалы и возвращает словарь
+    {строка интервала: TimeInterval из базы}
+    """
+    intervals = {interval.interval: interval for interval in intervals}
+    manager = TimeInterval.objects.db_manager(using)
+    manager.bulk_create(intervals.values(), ignore_conflicts=True)
+    return manager.in_bulk(intervals, field_name='interval')
+
+
+def existing_pks(model, ids):
+    """
+    id из ids, которые уже есть в базе (во всех шардах для моделей заказов)
+    """
+    shards = each_shard() if is_sharded(model) else [None]
+    return {
+        pk
+        for _ in shards
+        for pk in model.objects.filter(pk__in=ids)
+        .values_list('pk', flat=True)
+    }
+
+
+class UniqueIdListSerializer(serializers.ListSerializer):
+    """
+    Перед валидацией элементов одним запросом находит id, которые уже есть
+    в базе или повторяются в запросе. Элементы проверяют уникальность по
+    этому множеству (см. validate_unique_id).
+    Список длиннее MAX_BATCH_ITEMS[Meta.batch_name] отклоняется с 413 до
+    валидации элементов. При PREVALIDATION элементы сначала проверяются
+    скомпилированной схемой (см. prevalidation)
+    """
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            max_items = settings.MAX_BATCH_ITEMS[self.child.Meta.batch_name]
+            if len(data) > max_items:
+                raise BatchTooLarge(
+                    f'Too many items in "data": {len(data)}, '
+                    f'maximum is {max_items}.'
+                )
+            id_field = self.child.Meta.unique_id_field
+            ids = []
+            for item in data:
+                try:
+                    ids.append(int(item[id_field]))
+                except (KeyError, TypeError, ValueError):
+                    pass
+            existing_ids = existing_pks(self.child.Meta.model, ids)
+            seen_ids = set()
+            for pk in ids:
+                if pk in seen_ids:
+                    existing_ids.add(pk)
+                seen_ids.add(pk)
+            self.existing_ids = existing_ids
+            if settings.PREVALIDATION:
+                validated = prevalidate(self, data)
+                if validated is not None:
+                    return validated
+        return super().to_internal_value(data)
+
+
+def validate_unique_id(serializer, value):
+    """
+    Проверка уникальности id, переданного при создании объекта
+    """
+    existing_ids = getattr(serializer.parent, 'existing_ids', None)
+    if existing_ids is None:
+        exists = bool(existing_pks(serializer.Meta.model, [value]))
+    else:
+        exists = value in existing_ids
+    if exists:
+        raise ValidationError('This field must be unique.')
+    return value
+
 
 class CourierCreateSerializer(serializers.ModelSerializer):
     """
@@ -54,6 +262,7 @@ class CourierCreateSerializer(serializers.ModelSerializer):
         many=True,
         queryset=Region.objects.all(),
         write_only=True,
+        inline_source='region_ids',
         help_text='Working regions, array of integer, must be > 0 '
     )
     working_hours = TimeIntervalRelatedField(
@@ -61,6 +270,7 @@ class CourierCreateSerializer(serializers.ModelSerializer):
         slug_field='interval',
         queryset=TimeInterval.objects.all(),
         write_only=True,
+        inline_source='working_ranges',
         help_text='Working hours, array of string with format: "HH:MM-HH:MM"'
     )
     id = serializers.IntegerField(
@@ -71,6 +281,9 @@ class CourierCreateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Courier
+        list_serializer_class = UniqueIdListSerializer
+        unique_id_field = 'courier_id'
+        batch_name = 'couriers'
         fields = (
             'courier_id',
             'courier_type',
@@ -88,10 +301,14 @@ class CourierCreateSerializer(serializers.ModelSerializer):
             'courier_id': {
                 'write_only': True,
                 'min_value': 1,
+                'validators': [],
                 'help_text': 'Unique ID for courier, must be integer > 0',
             },
         }
 
+    def validate_courier_id(self, value):
+        return validate_unique_id(self, value)
+
 
 class CourierDataSerializer(serializers.Serializer):
     """
@@ -105,15 +322,74 @@ class CourierDataSerializer(serializers.Serializer):
     class Meta:
         fields = ('data', 'couriers')
 
+    @transaction.atomic
     def create(self, validated_data):
-        couriers = []
-        for courier_data in validated_data['data']:
-            courier_regions = courier_data.pop('regions')
-            courier_hours = courier_data.pop('working_hours')
-            new_courier = Courier.objects.create(**courier_data)
-            new_courier.regions.add(*courier_regions)
-            new_courier.working_hours.add(*courier_hours)
-            couriers.append(new_courier)
+        """
+        Создает курьеров и их связи с регионами и интервалами
+        фиксированным числом запросов, независимо от размера списка
+        """
+        couriers_data = validated_data['data']
+        inline = inline_storage()
+        region_array = region_array_storage()
+        save_regions(
+            region
+            for courier_data in couriers_data
+            for region in courier_data['regions']
+        )
+        couriers = Courier.objects.bulk_create(
+            Courier(
+                courier_id=courier_data['courier_id'],
+                courier_type=courier_data['courier_type'],
+                working_ranges=(
+                    intervals_to_ranges(courier_data['working_hours'])
+                    if inline else []
+                ),
+                region_ids=(
+                    sorted({region.pk for region in courier_data['regions']})
+                    if region_array else []
+                ),
+            )
+            for courier_data in couriers_data
+        )
+        # bulk_create не отправляет сигналы, поэтому сбрасываем профили
+        # с такими id явно
+        profiles.invalidate(*(courier.pk for courier in couriers))
+        supply = Delta()
+        for courier_data in couriers_data:
+            supply.add_courier(
+                [region.pk for region in courier_data['regions']],
+                intervals_to_ranges(courier_data['working_hours'])
+            )
+        supply.save()
+        if not region_array:
+            CourierRegion = Courier.regions.through
+            CourierRegion.objects.bulk_create(
+                CourierRegion(courier_id=courier.pk, region_id=region_id)
+                for courier, courier_data in zip(couriers, couriers_data)
+                for region_id in dict.fromkeys(
+                    region.pk for region in courier_data['regions']
+                )
+            )
+        if inline:
+            return {'couriers': couriers}
+
+        intervals = save_intervals(
+            interval
+            for courier_data in couriers_data
+            for interval in courier_data['working_hours']
+        )
+        CourierInterval = Courier.working_hours.through
+        CourierInterval.objects.bulk_create(
+            CourierInterval(
+                courier_id=courier.pk,
+                timeinterval_id=intervals[interval].pk
+            )
+            for courier, courier_data in zip(couriers, couriers_data)
+            for interval in dict.fromkeys(
+                interval.interval
+                for interval in courier_data['working_hours']
+            )
+        )
 
         return {'couriers': couriers}
 
@@ -128,6 +404,7 @@ class CourierUpdateSerializer(serializers.ModelSerializer):
     regions = RegionRelatedField(
         many=True,
         queryset=Region.objects.all(),
+        inline_source='region_ids',
         help_text='Working regions, array of integer, must be > 0 '
     )
 
@@ -135,6 +412,7 @@ class CourierUpdateSerializer(serializers.ModelSerializer):
         many=True,
         slug_field='interval',
         queryset=TimeInterval.objects.all(),
+        inline_source='working_ranges',
         help_text='Working hours, array of string with format: "HH:MM-HH:MM"'
     )
 
@@ -164,42 +442,135 @@ class CourierUpdateSerializer(serializers.ModelSerializer):
             )
         return attrs
 
+    def to_representation(self, instance):
+        """
+        После update районы и часы работы берутся из нового профиля
+        """
+        profile = getattr(self, '_profile', None)
+        if profile is None:
+            return super().to_representation(instance)
+        return {
+            'courier_id': instance.pk,
+            'courier_type': instance.courier_type,
+            'working_hours': list(profile.working_hours),
+            'regions': list(profile.region_ids),
+        }
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         """
         Обновляет информацию о курьере, снимает заказы, которые больше не
         подходят
         """
-        super().update(instance, validated_data)
-        courier_working_hours = instance.working_hours.all()
-        # Проходим по всем интервалам работы курьера и формируем условия:
-        time_conditions = []
-        for interval in courier_working_hours:
-            time_conditions.append(
-                Q(
-                    Q(order__delivery_hours__start__lt=interval.end) &
-                    Q(order__delivery_hours__end__gt=interval.start)
+        supply = Delta()
+        if supply_enabled():
+            supply.add_profile(instance.profile, -1)
+        # Сохраняются только изменяемые поля: полная запись строки вернула
+        # бы прочитанный orders_version и потеряла параллельные изменения
+        update_fields = ['version']
+        if 'courier_type' in validated_data:
+            instance.courier_type = validated_data.pop('courier_type')
+            update_fields.append('courier_type')
+        if 'regions' in validated_data:
+            save_regions(validated_data['regions'])
+            if region_array_storage():
+                instance.region_ids = sorted({
+                    region.pk for region in validated_data.pop('regions')
+                })
+                update_fields.append('region_ids')
+        inline = inline_storage()
+        if 'working_hours' in validated_data:
+            if inline:
+                instance.working_ranges = intervals_to_ranges(
+                    validated_data.pop('working_hours')
                 )
+                update_fields.append('working_ranges')
+            else:
+                intervals = save_intervals(validated_data['working_hours'])
+                validated_data['working_hours'] = list(dict.fromkeys(
+                    intervals[interval.interval]
+                    for interval in validated_data['working_hours']
+                ))
+        # Новая версия делает устаревшими профили в кэшах других процессов
+        instance.version = F('version') + 1
+        instance.save(update_fields=update_fields)
+        instance.refresh_from_db(fields=['version'])
+        # Остались связи многие-ко-многим: regions и working_hours.
+        # Связи заменяются целиком двумя запросами на поле
+        for field, value in validated_data.items():
+            relation = getattr(Courier, field)
+            through = relation.through
+            target = relation.field.m2m_reverse_field_name()
+            through.objects.filter(courier_id=instance.pk).delete()
+            through.objects.bulk_create(
+                through(courier_id=instance.pk, **{f'{target}_id': related.pk})
+                for related in dict.fromkeys(value)
             )
-        # Отфильтровываем заказы, не подходящие по новым параметрам:
-        unsuitable_orders = instance.assigned_orders.exclude(
-            Q(order__weight__lte=instance.max_weights[instance.courier_type]),
-            Q(order__region__in=instance.regions.all()),
-            reduce(operator.or_, time_conditions)
+        # Профиль строится по записанным данным, без повторного чтения
+        profile = CourierProfile(
+            instance,
+            regions=validated_data.get('regions'),
+            intervals=validated_data.get('working_hours'),
         )
-        # Сбрасываем назначение у ранее назначенных заказов:
-        Order.objects.filter(assignedorder__in=unsuitable_orders).update(
-            is_assigned=False
-        )
-        # Удаляем неподходящие заказы из таблицы назначенных заказов:
-        unsuitable_orders.delete()
+        self._profile = profile
+        transaction.on_commit(lambda: profiles.put(profile))
+        supply.add_profile(profile)
+        unassigned = []
+        # Заказы могут быть в шардах прежних районов, проверяем все шарды
+        for alias in each_shard():
+            # Отфильтровываем заказы, не подходящие по новым параметрам:
+            unsuitable = dict(
+                instance.assigned_orders.exclude(
+                    order_condition(profile, 'order__')
+                ).values_list('order_id', 'is_competed')
+            )
+            if not unsuitable:
+                continue
+            unsuitable_ids = list(unsuitable)
+            # Снятые заказы снова свободны, невыполненные - уже не назначены
+            orders = list(Order.objects.filter(pk__in=unsuitable_ids))
+            windows = delivery_windows(orders)
+            supply.add_orders(orders, windows, opened=1)
+            supply.add_orders(
+                [order for order in orders if not unsuitable[order.pk]],
+                windows, assigned=-1
+            )
+            with shard_atomic(alias):
+                # Сбрасываем назначение у ранее назначенных заказов:
+                Order.objects.filter(
+                    pk__in=unsuitable_ids
+                ).update(is_assigned=False)
+                # Удаляем неподходящие заказы из таблицы назначенных:
+                AssignedOrder.objects.filter(pk__in=unsuitable_ids).delete()
+            unassigned.extend(unsuitable_ids)
+        supply.save()
+        if unassigned:
+            orders_changed(instance.pk)
+            # Событие - последняя запись транзакции (см. api_v1.events)
+            events.record(
+                OrderEvent.Kind.UNASSIGNED, instance.pk, unassigned
+            )
         return instance
 
 
 class CourierInfoSerializer(CourierUpdateSerializer):
     """
     Сериализатор, возвращающий информацию о курьере.
-    Вычисляет два поля, rating и earnings
+    Вычисляет два поля, rating и earnings. Районы и часы работы берутся
+    из профиля курьера
     """
+    regions = serializers.ListField(
+        child=serializers.IntegerField(),
+        source='profile.region_ids',
+        read_only=True,
+        help_text='Working regions'
+    )
+    working_hours = serializers.ListField(
+        child=serializers.CharField(),
+        source='profile.working_hours',
+        read_only=True,
+        help_text='Working hours, format: "HH:MM-HH:MM"'
+    )
     rating = serializers.SerializerMethodField(
         help_text='Rating of courier'
     )
@@ -207,6 +578,39 @@ class CourierInfoSerializer(CourierUpdateSerializer):
         help_text='Total payment'
     )
 
+    def completed_totals(self, courier):
+        """
+        Время доставки в секундах, число заказов и оплата по районам для
+        выполненных заказов курьера из горячей таблицы и архива.
+        Считается один раз на курьера для рейтинга и заработка
+        """
+        cached = getattr(self, '_completed_totals', None)
+        if cached and cached[0] == courier.pk:
+            return cached[1]
+        totals = {}
+        rows = []
+        for _ in each_shard():
+            rows.extend(courier.assigned_orders
+                               .filter(is_competed=True)
+                               .values_list('order__region')
+                               .annotate(Sum('delivery_time'), Count('pk'),
+                                         Sum('payment')))
+            rows.extend(courier.archived_orders
+                               .values_list('region')
+                               .annotate(Sum('delivery_time'), Count('pk'),
+                                         Sum('payment')))
+        for region, time, count, payment in rows:
+            region_time, region_count, region_payment = totals.get(
+                region, (0, 0, 0)
+            )
+            totals[region] = (
+                region_time + time.total_seconds(),
+                region_count + count,
+                region_payment + (payment or 0),
+            )
+        self._completed_totals = (courier.pk, totals)
+        return totals
+
     def get_rating(self, courier):
         """
         Возвращает рейтинг курьера.
@@ -220,25 +624,17 @@ class CourierInfoSerializer(CourierUpdateSerializer):
         (или временем назначения заказов, если вычисляется время для первого
         заказа).
         """
-        # Вычисляем минимальное среднее время доставки по регионам:
-        t_min_delta = (courier.assigned_orders
-                              .filter(is_competed=True)
-                              .values('order_id__region')
-                              .annotate(avg_time=Avg('delivery_time'))
-                              .aggregate(t_min=Min('avg_time')))['t_min']
-        # Если минимальная дельта не найдена, рейтинг не расчитываем
-        if t_min_delta is None:
+        totals = self.completed_totals(courier)
+        # Если выполненных заказов нет, рейтинг не расчитываем
+        if not totals:
             return None
-        t = t_min_delta.total_seconds()
+        t = min(time / count for time, count, _ in totals.values())
         raw_rating = (60 * 60 - min(t, 60 * 60)) / (60 * 60) * 5
         return round(raw_rating, 2)
 
     def get_earnings(self, courier):
-        earning_data = (
-            courier.assigned_orders.filter(is_competed=True)
-            .aggregate(earning=Sum('payment'))
-        )
-        return earning_data['earning'] or 0
+        totals = self.completed_totals(courier)
+        return sum(payment for _, _, payment in totals.values())
 
     class Meta:
         model = Courier
@@ -266,7 +662,6 @@ class OrderCreateSerializer(serializers.ModelSerializer):
     """
     order_id = serializers.IntegerField(
         min_value=1,
-        validators=[UniqueValidator(queryset=Order.objects.all())],
         write_only=True,
         source='id',
         help_text='Unique ID for order, must be integer > 0'
@@ -281,22 +676,33 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         slug_field='interval',
         queryset=TimeInterval.objects.all(),
         write_only=True,
+        inline_source='delivery_ranges',
         help_text='Delivery time, array of string with format: "HH:MM-HH:MM"'
     )
 
     class Meta:
         model = Order
+        list_serializer_class = UniqueIdListSerializer
+        unique_id_field = 'order_id'
+        batch_name = 'orders'
         fields = (
             'order_id',
             'weight',
             'region',
             'delivery_hours',
+            'expires_at',
             'id',
         )
 
         extra_kwargs = {
+            'expires_at': {
+                'write_only': True,
+                'help_text': 'Optional time after which the order is not '
+                             'assigned, format ISO 8601'
+            },
             'weight': {
                 'write_only': True,
+                'coerce_to_string': False,
                 'min_value': 0.009,
                 'max_value': 50,
                 'help_text': 'Weight of order, from 0.01 to 50'
@@ -306,6 +712,9 @@ class OrderCreateSerializer(serializers.ModelSerializer):
             },
         }
 
+    def validate_order_id(self, value):
+        return validate_unique_id(self, value)
+
 
 class OrderDataSerializer(serializers.Serializer):
     """
@@ -316,15 +725,78 @@ class OrderDataSerializer(serializers.Serializer):
     data = OrderCreateSerializer(many=True, write_only=True)
     orders = OrderCreateSerializer(many=True, read_only=True)
 
+    @transaction.atomic
     def create(self, validated_data):
-        orders = []
-        for order_data in validated_data['data']:
-            delivery_hours = order_data.pop('delivery_hours')
-            new_order = Order.objects.create(**order_data)
-            new_order.delivery_hours.add(*delivery_hours)
-            orders.append(new_order)
+        """
+        Создает заказы и их связи с интервалами фиксированным числом
+        запросов, независимо от размера списка
+        """
+        orders_data = validated_data['data']
+        # Заказы пишутся в шард своего района, ответ - в порядке запроса
+        by_shard = {}
+        for order_data in orders_data:
+            alias = shard_for_region(order_data['region'].pk)
+            by_shard.setdefault(alias, []).append(order_data)
+        orders = {}
+        for alias, shard_orders_data in by_shard.items():
+            with shard_atomic(alias):
+                for order in self.create_orders(shard_orders_data, alias):
+                    orders[order.pk] = order
+        supply = Delta()
+        supply.add_orders(orders.values(), {
+            order_data['id']: intervals_to_ranges(order_data['delivery_hours'])
+            for order_data in orders_data
+        }, opened=1)
+        supply.save()
+        return {
+            'orders': [orders[order_data['id']] for order_data in orders_data]
+        }
 
-        return {'orders': orders}
+    def create_orders(self, orders_data, using):
+        """
+        Создает заказы одного шарда
+        """
+        inline = inline_storage()
+        save_regions(
+            (order_data['region'] for order_data in orders_data), using
+        )
+        orders = Order.objects.bulk_create(
+            Order(
+                id=order_data['id'],
+                weight=order_data['weight'],
+                region_id=order_data['region'].pk,
+                expires_at=order_data.get('expires_at'),
+                delivery_ranges=(
+                    intervals_to_ranges(order_data['delivery_hours'])
+                    if inline else []
+                ),
+            )
+            for order_data in orders_data
+        )
+        if inline:
+            return orders
+
+        intervals = save_intervals(
+            (
+                interval
+                for order_data in orders_data
+                for interval in order_data['delivery_hours']
+            ),
+            using
+        )
+        OrderInterval = Order.delivery_hours.through
+        OrderInterval.objects.bulk_create(
+            OrderInterval(
+                order_id=order.pk,
+                timeinterval_id=intervals[interval].pk
+            )
+            for order, order_data in zip(orders, orders_data)
+            for interval in dict.fromkeys(
+                interval.interval
+                for interval in order_data['delivery_hours']
+            )
+        )
+        return orders
 
 
 class CompleteOrderSerializer(serializers.Serializer):
@@ -347,53 +819,102 @@ class CompleteOrderSerializer(serializers.Serializer):
         fields = ('courier_id', 'order_id', 'complete_time')
 
     def validate(self, attrs):
-
-        assigned_order = AssignedOrder.objects.filter(
-            courier_id=attrs['courier_id'],
-            order_id=attrs['order_id'],
-            is_competed=False
+        assigned_order = self.find_assigned(
+            attrs['courier_id'], attrs['order_id']
         )
-        if not assigned_order.exists():
+        if assigned_order is None:
             raise serializers.ValidationError(
                 detail='Assigned order not found'
             )
 
-        if not attrs['complete_time'] > assigned_order.first().assign_time:
+        if not attrs['complete_time'] > assigned_order.assign_time:
             raise serializers.ValidationError(
                 detail='complete_time must be greater than assign_time'
             )
+        # Назначение уже загружено, в create повторно не читаем
+        attrs['assigned_order'] = assigned_order
         return attrs
 
     def create(self, validated_data):
+        self.complete(
+            validated_data['courier_id'],
+            validated_data['order_id'],
+            validated_data['complete_time'],
+            validated_data['assigned_order'],
+        )
+        return {'order_id': validated_data['order_id']}
+
+    @staticmethod
+    def find_assigned(courier_id, order_id):
+        """
+        Невыполненное назначение заказа курьеру во всех шардах или None
+        """
+        for _ in each_shard():
+            assigned_order = AssignedOrder.objects.filter(
+                courier_id=courier_id,
+                order_id=order_id,
+                is_competed=False
+            ).select_related('order').first()
+            if assigned_order is not None:
+                return assigned_order
+        return None
+
+    @classmethod
+    @transaction.atomic
+    def complete(cls, courier_id, order_id, complete_time, assigned_order):
         """
         Отмечает, что заказ выполнен, и записывает время выполнения и разницу
         между временем выполнения предыдущего заказа. Если заказы ранее не
         выполнялись, то разница берется от времни назанчения заказа.
+        Возвращает False, если заказ уже был отмечен выполненным.
         """
-        courier_id = validated_data['courier_id']
-        order_id = validated_data['order_id']
-        complete_time = validated_data['complete_time']
-        completed_order = AssignedOrder.objects.filter(order_id=order_id)
-        # Находим предыдущий заказ
-        previous_order = (
-            AssignedOrder.objects
-            .filter(courier_id=courier_id, is_competed=True)
-            .order_by('-complete_time')
-            .first()
+        # Находим время выполнения предыдущего заказа
+        previous_time = cls.last_complete_time(
+            AssignedOrder.objects.filter(
+                courier_id=courier_id, is_competed=True
+            )
         )
-        if previous_order:
-            previous_time = previous_order.complete_time
-        else:
+        if previous_time is None:
+            # Все выполненные заказы курьера могли уйти в архив
+            previous_time = cls.last_complete_time(
+                ArchivedOrder.objects.filter(courier_id=courier_id)
+            )
+        if previous_time is None:
             # Если выполенных заказов ранее не было, то берем время назначения
-            previous_time = completed_order.first().assign_time
+            previous_time = assigned_order.assign_time
         delivery_time = complete_time - previous_time
-        completed_order.update(
-            is_competed=True,
-            complete_time=complete_time,
-            delivery_time=delivery_time
+        with shard_atomic(assigned_order._state.db):
+            # Заказ мог быть выполнен параллельным запросом после проверки
+            completed = AssignedOrder.objects.filter(
+                order_id=order_id, is_competed=False
+            ).update(
+                is_competed=True,
+                complete_time=complete_time,
+                delivery_time=delivery_time
+            )
+            if not completed:
+                return False
+            windows = delivery_windows([assigned_order.order])
+        supply = Delta()
+        supply.add_orders([assigned_order.order], windows, assigned=-1)
+        supply.save()
+        orders_changed(courier_id)
+        events.record(
+            OrderEvent.Kind.COMPLETED, courier_id, [order_id], complete_time
         )
+        return True
 
-        return {'order_id': order_id}
+    @staticmethod
+    def last_complete_time(completed):
+        """
+        Наибольшее время выполнения среди completed по всем шардам
+        """
+        times = []
+        for _ in each_shard():
+            previous_order = completed.order_by('-complete_time').first()
+            if previous_order is not None:
+                times.append(previous_order.complete_time)
+        return max(times, default=None)
 
 
 class AssignedOrderSerializer(serializers.ModelSerializer):
@@ -453,52 +974,224 @@ class OrderAssignSerializer(serializers.Serializer):
         return payment
 
     def create(self, validated_data):
+        assigned_orders, assign_time = self.assign(
+            validated_data.pop('courier_id')
+        )
+        result = {'orders': assigned_orders}
+        # Если заказы назначены, в ответ добавить время назначения
+        if assigned_orders:
+            result.update(assign_time=assign_time)
+        return result
+
+    @classmethod
+    @transaction.atomic
+    def assign(cls, courier):
         """
-        Назначает заказы курьеру
+        Назначает заказы курьеру, возвращает список AssignedOrder в порядке
+        доставки и время назначения
         """
-        courier = validated_data.pop('courier_id')
         courier_type = courier.courier_type
-        courier_working_hours = courier.working_hours.all()
-
-        time_conditions = []
-        # Проходим по всем интервалам работы курьера и формируем условия:
-        for interval in courier_working_hours:
-            time_conditions.append(
-                Q(
-                    Q(delivery_hours__start__lt=interval.end) &
-                    Q(delivery_hours__end__gt=interval.start)
-                )
-            )
-        # Затем по условиям фильтруем заказы
-        suitable_orders = Order.objects.filter(
-            Q(region__in=courier.regions.all()),
-            Q(is_assigned=False),
-            Q(weight__lte=courier.max_weights[courier_type]),
-            reduce(operator.or_, time_conditions)
+        # Районы и интервалы курьера из кэша профилей, без запросов к M2M
+        profile = courier.profile
+        suitable_orders = Order.objects.live().filter(
+            order_condition(profile)
         )
-        assigned_orders = []
+        if not inline_storage():
+            # Пересечение через join с интервалами может дать дубли
+            suitable_orders = suitable_orders.distinct()
+        # Заказы ищутся только в шардах районов курьера
+        orders = []
+        windows = {}
+        for _ in each_shard(profile.region_ids):
+            shard_orders = list(suitable_orders.all())
+            orders.extend(shard_orders)
+            windows.update(delivery_windows(shard_orders))
         assign_time = timezone.now()
-        # В цикле проходим по подходящим заказам,
-        # создаем новый объект OrderAssign
-        for order in suitable_orders:
-            new_assigned_order = AssignedOrder.objects.create(
-                courier=courier,
-                order=order,
+        payment = cls.calculate_payment(courier_type)
+        # Порядок доставки: по районам, внутри - по сроку окна доставки
+        ordered = sequence(orders, profile.minute_ranges(), windows)
+        assigned_orders = [
+            AssignedOrder(
+                courier_id=courier.pk,
+                order_id=order.pk,
                 assign_time=assign_time,
-                payment=self.calculate_payment(courier_type)
+                payment=payment,
+                sequence=number,
             )
-            assigned_orders.append(new_assigned_order)
-        # Для назначенных заказов записываем признак 'is_assigned=True',
-        # чтобы они не были назначены другому курьеру
-        if suitable_orders:
-            suitable_orders.update(is_assigned=True)
-        # Фильтруем назначенные на курьера, но не выполненные заказы,
-        # для использования в ответе:
-        # assigned_to_courier = courier.assigned_orders.filter(
-        #     is_competed=False
-        # )
-        result = {'orders': assigned_orders}
-        # Если заказы назначены, в ответ добавить время назначения
+            for number, order in enumerate(ordered, 1)
+        ]
+        by_shard = {}
+        for order, assigned in zip(ordered, assigned_orders):
+            by_shard.setdefault(order._state.db, []).append(assigned)
+        assigned_ids = set()
+        for alias, shard_assigned in by_shard.items():
+            with shard_atomic(alias):
+                # Заказ мог быть назначен другому курьеру или просрочен
+                # после выборки - условие повторяем и блокируем строки до
+                # конца транзакции
+                free = set(
+                    Order.objects.select_for_update().live(assign_time)
+                    .filter(pk__in=[
+                        assigned.order_id for assigned in shard_assigned
+                    ])
+                    .values_list('pk', flat=True)
+                )
+                # Создаем объекты AssignedOrder для всех подходящих заказов
+                # шарда одним запросом
+                AssignedOrder.objects.bulk_create(
+                    assigned for assigned in shard_assigned
+                    if assigned.order_id in free
+                )
+                # Для назначенных заказов записываем признак
+                # 'is_assigned=True', чтобы они не были назначены другому
+                # курьеру
+                Order.objects.filter(pk__in=free).update(is_assigned=True)
+                assigned_ids |= free
+        ordered = [order for order in ordered if order.pk in assigned_ids]
+        assigned_orders = [
+            assigned for assigned in assigned_orders
+            if assigned.order_id in assigned_ids
+        ]
+        supply = Delta()
+        supply.add_orders(ordered, windows, opened=-1, assigned=1)
+        supply.save()
         if assigned_orders:
-            result.update(assign_time=assign_time)
-        return result
+            orders_changed(courier.pk)
+            events.record(
+                OrderEvent.Kind.ASSIGNED, courier.pk,
+                [assigned.order_id for assigned in assigned_orders],
+                assign_time
+            )
+        return assigned_orders, assign_time
+
+
+class CourierOrdersSerializer(serializers.Serializer):
+    """
+    Невыполненные заказы курьера для GET /couriers/{id}/orders
+    """
+    orders = AssignedOrderSerializer(
+        many=True,
+        read_only=True,
+        help_text='Array of active orders, format {id: int}'
+    )
+    assign_time = serializers.DateTimeField(
+        read_only=True,
+        required=False,
+        help_text='Time of assignment of orders'
+    )
+    version = serializers.IntegerField(
+        source='orders_version',
+        read_only=True,
+        help_text='Changes whenever assigned orders change, pass it back '
+                  'with wait to wait for the next change'
+    )
+
+    def to_representation(self, courier):
+        orders = []
+        for _ in each_shard():
+            orders.extend(
+                courier.assigned_orders.filter(is_competed=False)
+            )
+        orders.sort(key=lambda order: (
+            order.assign_time, order.sequence or 0, order.order_id
+        ))
+        data = {'orders': orders, 'orders_version': courier.orders_version}
+        if orders:
+            data['assign_time'] = max(order.assign_time for order in orders)
+        return super().to_representation(data)
+
+
+class OrderEventSerializer(serializers.ModelSerializer):
+    """
+    Событие журнала для GET /events
+    """
+    type = serializers.CharField(source='kind')
+    order_ids = serializers.ListField(child=serializers.IntegerField())
+
+    class Meta:
+        model = OrderEvent
+        fields = ('id', 'type', 'courier_id', 'order_ids', 'time')
+
+
+class OrderEventsQuerySerializer(serializers.Serializer):
+    """
+    Параметры запроса GET /events
+    """
+    after = serializers.IntegerField(
+        min_value=0,
+        default=0,
+        help_text='Cursor, events with id greater than after are returned'
+    )
+    limit = serializers.IntegerField(
+        min_value=1,
+        required=False,
+        help_text='Page size, EVENTS_PAGE_SIZE by default, '
+                  'at most EVENTS_MAX_LIMIT'
+    )
+
+
+class OrderEventsSerializer(serializers.Serializer):
+    """
+    Страница журнала событий для GET /events
+    """
+    events = OrderEventSerializer(many=True)
+    cursor = serializers.IntegerField(
+        help_text='Value of after for the next request'
+    )
+
+
+class SupplyQuerySerializer(serializers.Serializer):
+    """
+    Параметры запроса GET /supply
+    """
+    region = serializers.RegexField(
+        r'^-?\d+(,-?\d+)*$',
+        required=False,
+        allow_blank=True,
+        help_text='Region ids, comma separated integers, all regions '
+                  'if not set'
+    )
+
+    def validate_region(self, value):
+        if not value:
+            return None
+        return [int(region_id) for region_id in value.split(',')]
+
+
+class RegionSlotSerializer(serializers.ModelSerializer):
+    """
+    Строка сводки спроса и предложения
+    """
+    region = serializers.IntegerField(source='region_id')
+    slot = serializers.SerializerMethodField(
+        help_text='Time of day slot, format "HH:MM-HH:MM"'
+    )
+    orders = serializers.IntegerField(
+        source='open_orders', help_text='Number of free orders'
+    )
+    weight = serializers.DecimalField(
+        source='open_weight', max_digits=14, decimal_places=2,
+        coerce_to_string=False, help_text='Total weight of free orders'
+    )
+    assigned = serializers.IntegerField(
+        source='assigned_orders',
+        help_text='Number of assigned, not completed orders'
+    )
+
+    class Meta:
+        model = RegionSlot
+        fields = ('region', 'slot', 'orders', 'weight', 'assigned',
+                  'couriers')
+
+    def get_slot(self, row) -> str:
+        return slot_label(row.slot)
+
+
+class SupplySerializer(serializers.Serializer):
+    """
+    Сводка спроса и предложения для GET /supply
+    """
+    slot_minutes = serializers.IntegerField(
+        help_text='Slot length in minutes'
+    )
+    slots = RegionSlotSerializer(many=True)
@@ -0,0 +1,111 @@
+"""
+Шардирование заказов по районам. Заказы, их интервалы доставки,
+назначения и архив (SHARD_MODELS) хранятся в шарде своего района:
+DATABASE_SHARDS[region_id % len(DATABASE_SHARDS)]. Курьеры и остальные
+таблицы остаются в 'default'.
+Код, работающий с заказами, перебирает нужные шарды через each_shard:
+внутри итерации ShardRouter (api_v1.db_routers) направляет запросы к
+SHARD_MODELS в текущий шард. Без шардирования each_shard один раз отдает
+'default', и запросы не меняются.
+Запись в шард идет в его транзакции (shard_atomic), вложенной в транзакцию
+'default'. Двухфазной фиксации нет: шард фиксируется при выходе из блока,
+'default' - позже, и при сбое между ними изменения шарда остаются, а
+записи 'default' (сводка RegionSlot, события OrderEvent) откатываются.
+Сводку исправляет команда rebuild_supply, события такой операции теряются.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+# Модели, строки которых живут в шарде района заказа
+SHARD_MODELS = {
+    'api_v1.order',
+    'api_v1.order_delivery_hours',
+    'api_v1.assignedorder',
+    'api_v1.archivedorder',
+}
+
+# Модели, на которые ссылаются SHARD_MODELS: районы и интервалы пишутся
+# и в 'default', и в шард. Таблица курьеров в шарде пустая, она нужна
+# внешнему ключу назначений из 0001_initial до миграции 0010
+SHARD_REFERENCES = {
+    'api_v1.region',
+    'api_v1.timeinterval',
+    'api_v1.courier',
+}
+
+# Шард, в который идут запросы к SHARD_MODELS
+_current_shard = ContextVar('current_shard', default=None)
+
+
+class NoShardSelected(RuntimeError):
+    """
+    Запрос к SHARD_MODELS вне each_shard, use_shard и shard_atomic
+    """
+
+
+def sharding_enabled():
+    return bool(settings.DATABASE_SHARDS)
+
+
+def is_sharded(model):
+    return model._meta.label_lower in SHARD_MODELS
+
+
+def current_shard():
+    return _current_shard.get()
+
+
+def shard_for_region(region_id):
+    """
+    Алиас БД шарда района
+    """
+    shards = settings.DATABASE_SHARDS
+    if not shards:
+        return DEFAULT_DB_ALIAS
+    return shards[region_id % len(shards)]
+
+
+def shard_aliases(region_ids=None):
+    """
+    Шарды районов region_ids без повторов, все шарды, если районы не заданы
+    """
+    if region_ids is None:
+        return list(settings.DATABASE_SHARDS) or [DEFAULT_DB_ALIAS]
+    return list(dict.fromkeys(
+        shard_for_region(region_id) for region_id in region_ids
+    ))
+
+
+@contextmanager
+def use_shard(alias):
+    """
+    Делает alias текущим шардом для запросов к SHARD_MODELS
+    """
+    token = _current_shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _current_shard.reset(token)
+
+
+@contextmanager
+def shard_atomic(alias):
+    """
+    Делает alias текущим шардом и выполняет блок в транзакции шарда. Без
+    шардирования блок входит в открытую транзакцию 'default' без точки
+    сохранения
+    """
+    with use_shard(alias), transaction.atomic(using=alias, savepoint=False):
+        yield alias
+
+
+def each_shard(region_ids=None):
+    """
+    Перебирает шарды районов region_ids (все шарды, если None), делая
+    каждый текущим на время итерации
+    """
+    for alias in shard_aliases(region_ids):
+        with use_shard(alias):
+            yield alias
@@ -0,0 +1,179 @@
+"""
+Пробное назначение заказов без записи в БД для планирования: сколько
+свободных заказов возьмут выбранные курьеры, если начнут сейчас.
+Свободные заказы и курьеры читаются в память несколькими запросами,
+дальше назначение идет по тем же правилам, что и в
+OrderAssignSerializer.assign (api_v1.eligibility.order_fits). Заказы
+разложены по районам и весу только для быстрого отбора кандидатов.
+Курьеры обрабатываются по очереди, каждый забирает все подходящие ему
+заказы, которые не взяли предыдущие.
+"""
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from .arrays import region_array_storage
+from .eligibility import order_fits
+from .models import Courier, Order
+from .ranges import inline_storage, to_minutes
+from .sharding import each_shard
+
+# Ограничение числа параметров в одном запросе (SQLite - 999)
+CHUNK_SIZE = 500
+
+
+def chunked(values, size=CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class CourierSnapshot:
+    __slots__ = ('courier_id', 'courier_type', 'max_weight', 'region_ids',
+                 'ranges')
+
+    def __init__(self, courier_id, courier_type):
+        self.courier_id = courier_id
+        self.courier_type = courier_type
+        self.max_weight = Courier.max_weights[courier_type]
+        self.region_ids = []
+        self.ranges = []
+
+    def minute_ranges(self):
+        return self.ranges
+
+
+def load_couriers(courier_ids=None):
+    """
+    Снимок курьеров в порядке courier_ids (по умолчанию - все по id)
+    """
+    couriers = Courier.objects.order_by('pk')
+    if courier_ids is not None:
+        couriers = couriers.filter(pk__in=courier_ids)
+    snapshots = {}
+    for courier_id, courier_type, region_ids, ranges in couriers.values_list(
+        'pk', 'courier_type', 'region_ids', 'working_ranges'
+    ).iterator():
+        snapshot = CourierSnapshot(courier_id, courier_type)
+        if region_array_storage():
+            snapshot.region_ids = region_ids
+        if inline_storage():
+            snapshot.ranges = ranges
+        snapshots[courier_id] = snapshot
+
+    ids = list(snapshots)
+    for chunk in chunked(ids):
+        if not region_array_storage():
+            rows = Courier.regions.through.objects.filter(
+                courier_id__in=chunk
+            ).values_list('courier_id', 'region_id')
+            for courier_id, region_id in rows:
+                snapshots[courier_id].region_ids.append(region_id)
+        if not inline_storage():
+            rows = Courier.working_hours.through.objects.filter(
+                courier_id__in=chunk
+            ).values_list(
+                'courier_id', 'timeinterval__start', 'timeinterval__end'
+            )
+            for courier_id, start, end in rows:
+                snapshots[courier_id].ranges.append(
+                    (to_minutes(start), to_minutes(end))
+                )
+    if courier_ids is None:
+        return list(snapshots.values())
+    return [snapshots[pk] for pk in courier_ids if pk in snapshots]
+
+
+def load_shard_orders(orders):
+    """
+    Добавляет в orders свободные заказы текущего шарда:
+    {id: (район, вес, интервалы)}
+    """
+    inline = inline_storage()
+    pending = Order.objects.live()
+    for order_id, region_id, weight, ranges in pending.values_list(
+        'pk', 'region_id', 'weight', 'delivery_ranges'
+    ).iterator():
+        orders[order_id] = (region_id, weight, ranges if inline else [])
+    if not inline:
+        rows = Order.delivery_hours.through.objects.filter(
+            order__in=pending
+        ).values_list('order_id', 'timeinterval__start', 'timeinterval__end')
+        for order_id, start, end in rows.iterator():
+            if order_id in orders:
+                orders[order_id][2].append(
+                    (to_minutes(start), to_minutes(end))
+                )
+
+
+def load_orders():
+    """
+    Снимок свободных заказов: {район: (веса по возрастанию,
+    [(вес, id, интервалы), ...])}
+    """
+    orders = {}
+    for _ in each_shard():
+        load_shard_orders(orders)
+
+    by_region = defaultdict(list)
+    for order_id, (region_id, weight, ranges) in orders.items():
+        by_region[region_id].append((weight, order_id, ranges))
+    result = {}
+    for region_id, entries in by_region.items():
+        entries.sort()
+        result[region_id] = ([weight for weight, _, _ in entries], entries)
+    return result
+
+
+def simulate(couriers, orders):
+    """
+    Назначает заказы из снимка orders курьерам couriers в памяти
+    и возвращает статистику покрытия
+    """
+    taken = set()
+    per_courier = {}
+    types = Counter()
+    covered_weight = 0
+    for courier in couriers:
+        assigned = 0
+        for region_id in courier.region_ids:
+            if region_id not in orders:
+                continue
+            weights, entries = orders[region_id]
+            # Заказы отсортированы по весу: берем только подъемные
+            for weight, order_id, ranges in entries[
+                :bisect_right(weights, courier.max_weight)
+            ]:
+                if order_id in taken or not order_fits(
+                    courier, region_id, weight, ranges
+                ):
+                    continue
+                taken.add(order_id)
+                assigned += 1
+                covered_weight += weight
+        per_courier[courier.courier_id] = assigned
+        types[courier.courier_type] += assigned
+
+    pending = sum(len(entries) for _, entries in orders.values())
+    pending_weight = sum(
+        sum(weights) for weights, _ in orders.values()
+    )
+    uncovered = Counter({
+        region_id: sum(
+            1 for _, order_id, _ in entries if order_id not in taken
+        )
+        for region_id, (_, entries) in orders.items()
+    })
+    return {
+        'couriers': len(per_courier),
+        'idle_couriers': sum(1 for count in per_courier.values() if not count),
+        'pending_orders': pending,
+        'covered_orders': len(taken),
+        'coverage': round(len(taken) / pending, 4) if pending else None,
+        'pending_weight': float(pending_weight),
+        'covered_weight': float(covered_weight),
+        'orders_by_courier_type': dict(types),
+        'uncovered_by_region': dict(
+            (region_id, count)
+            for region_id, count in uncovered.most_common()
+            if count
+        ),
+        'orders_by_courier': per_courier,
+    }
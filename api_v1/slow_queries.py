@@ -0,0 +1,140 @@
+"""
+Журнал медленных SQL-запросов.
+Middleware ставит на все соединения execute_wrapper, который пишет в лог
+'api_v1.slow_queries' каждый запрос дольше SLOW_QUERY_MS вместе с действием
+DRF, в котором он выполнен. На PostgreSQL для доли
+SLOW_QUERY_EXPLAIN_RATE медленных SELECT дополнительно снимается
+EXPLAIN (ANALYZE, BUFFERS), не чаще SLOW_QUERY_EXPLAIN_PER_MINUTE раз
+в минуту на процесс.
+"""
+import logging
+import random
+import threading
+import time
+from django.conf import settings
+from .utils import request_action, wrap_connections
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Не больше limit событий за период period секунд
+    """
+    def __init__(self, limit, period=60):
+        self.limit = limit
+        self.period = period
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.count = 0
+
+    def allow(self):
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= self.period:
+                self.window_start = now
+                self.count = 0
+            if self.count >= self.limit:
+                return False
+            self.count += 1
+            return True
+
+
+def explain(connection, sql, params):
+    """
+    План выполнения запроса. Выполняется отдельным курсором драйвера,
+    чтобы не затереть результат исходного запроса и не попасть снова
+    в execute_wrapper. Внутри транзакции ошибка EXPLAIN откатывается
+    до точки сохранения.
+    """
+    cursor = connection.connection.cursor()
+    savepoint = connection.in_atomic_block
+    try:
+        if savepoint:
+            cursor.execute('SAVEPOINT slow_query_explain')
+        try:
+            cursor.execute(
+                'EXPLAIN (ANALYZE, BUFFERS, FORMAT TEXT) ' + sql, params
+            )
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        except Exception:
+            if savepoint:
+                cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            logger.exception('EXPLAIN failed')
+            return None
+        if savepoint:
+            cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+        return plan
+    finally:
+        cursor.close()
+
+
+class SlowQueryLogger:
+    """
+    Обертка для connection.execute_wrapper
+    """
+    explain_limiter = None
+
+    def __init__(self, action):
+        self.action = action
+        self.threshold = settings.SLOW_QUERY_MS / 1000
+        if SlowQueryLogger.explain_limiter is None:
+            SlowQueryLogger.explain_limiter = RateLimiter(
+                settings.SLOW_QUERY_EXPLAIN_PER_MINUTE
+            )
+
+    def should_explain(self, connection, sql, many):
+        return (
+            connection.vendor == 'postgresql'
+            and not many
+            and sql.lstrip()[:6].upper() == 'SELECT'
+            and random.random() < settings.SLOW_QUERY_EXPLAIN_RATE
+            and self.explain_limiter.allow()
+        )
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - start
+        if duration < self.threshold:
+            return result
+
+        connection = context['connection']
+        action = str(self.action)
+        plan = None
+        if self.should_explain(connection, sql, many):
+            plan = explain(connection, sql, params)
+        logger.warning(
+            'Slow query %.1f ms in %s on %s: %s%s',
+            duration * 1000, action, connection.alias, sql,
+            f'\n{plan}' if plan else '',
+            extra={
+                'action': action,
+                'duration_ms': duration * 1000,
+                'sql': sql,
+                'plan': plan,
+            },
+        )
+        return result
+
+
+class SlowQueryLogMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Действие известно только после разрешения url,
+        # поэтому логгер берет его из запроса лениво
+        with wrap_connections(SlowQueryLogger(LazyAction(request))):
+            return self.get_response(request)
+
+
+class LazyAction:
+    """
+    Название действия DRF, вычисляется при выводе в лог
+    """
+    def __init__(self, request):
+        self.request = request
+
+    def __str__(self):
+        return request_action(self.request)
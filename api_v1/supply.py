@@ -0,0 +1,185 @@
+"""
+Сводка спроса и предложения по районам и интервалам суток (RegionSlot)
+для диспетчеров вместо запросов с join заказов, курьеров, интервалов и
+районов. Сутки делятся на интервалы длиной SUPPLY_SLOT_MINUTES; заказ
+учитывается во всех интервалах, которые пересекают его окна доставки,
+курьер - во всех интервалах своих часов работы в каждом своем районе.
+Создание заказов и курьеров, назначение, снятие, выполнение и истечение
+срока заказов, PATCH курьера накапливают приращения в Delta, которая
+пишется одним запросом INSERT ... ON CONFLICT DO UPDATE (PostgreSQL,
+SQLite 3.24+), поэтому параллельные запросы не теряют приращения.
+Сводка лежит в основной БД. При шардировании запись в шард и в сводку
+не атомарны, расхождение исправляет команда rebuild_supply.
+"""
+import json
+from collections import defaultdict
+from decimal import Decimal
+from django.conf import settings
+from django.db import connections, router, transaction
+from .arrays import region_array_storage
+from .models import Courier, RegionSlot
+from .ranges import format_ranges, inline_storage, to_minutes
+
+COLUMNS = ('open_orders', 'open_weight', 'assigned_orders', 'couriers')
+
+
+def enabled():
+    return bool(settings.SUPPLY_ROLLUP)
+
+
+def slots(ranges):
+    """
+    Номера интервалов суток, которые пересекают интервалы ranges в минутах
+    """
+    size = settings.SUPPLY_SLOT_MINUTES
+    return {
+        slot
+        for start, end in ranges
+        if start < end
+        for slot in range(start // size, (end - 1) // size + 1)
+    }
+
+
+def slot_label(slot):
+    """
+    Интервал суток в формате API "HH:MM-HH:MM"
+    """
+    size = settings.SUPPLY_SLOT_MINUTES
+    return format_ranges([(slot * size, (slot + 1) * size)])[0]
+
+
+class Delta:
+    """
+    Приращения строк сводки {(район, интервал): [значения COLUMNS]}
+    """
+    def __init__(self):
+        self.rows = defaultdict(lambda: [0, Decimal(0), 0, 0])
+
+    def add_orders(self, orders, windows, opened=0, assigned=0):
+        """
+        orders - заказы с интервалами доставки windows (см.
+        sequencing.delivery_windows); opened и assigned - изменение числа
+        свободных и назначенных заказов на каждый заказ
+        """
+        for order in orders:
+            weight = opened * Decimal(order.weight)
+            for slot in slots(windows[order.pk]):
+                row = self.rows[order.region_id, slot]
+                row[0] += opened
+                row[1] += weight
+                row[2] += assigned
+
+    def add_courier(self, region_ids, ranges, couriers=1):
+        """
+        Курьер с районами region_ids и часами работы ranges в минутах
+        """
+        courier_slots = slots(ranges)
+        for region_id in set(region_ids):
+            for slot in courier_slots:
+                self.rows[region_id, slot][3] += couriers
+
+    def add_profile(self, profile, couriers=1):
+        self.add_courier(profile.region_ids, profile.minute_ranges(), couriers)
+
+    def save(self):
+        """
+        Прибавляет приращения к сводке, если она включена (SUPPLY_ROLLUP)
+        """
+        if enabled():
+            self.write()
+
+    def write(self):
+        """
+        Все строки передаются одним параметром JSON, поэтому запрос один
+        при любом числе строк. Строки идут в порядке ключа, чтобы
+        параллельные транзакции не блокировали друг друга
+        """
+        rows = [
+            [region_id, slot, opened, str(weight), assigned, couriers]
+            for (region_id, slot), (opened, weight, assigned, couriers)
+            in sorted(self.rows.items())
+            if opened or weight or assigned or couriers
+        ]
+        self.rows.clear()
+        if not rows:
+            return
+        connection = connections[router.db_for_write(RegionSlot)]
+        quote = connection.ops.quote_name
+        table = quote(RegionSlot._meta.db_table)
+        columns = ('region_id', 'slot', *COLUMNS)
+        if connection.vendor == 'postgresql':
+            values = (
+                'SELECT (v->>0)::int, (v->>1)::int, (v->>2)::int, '
+                '(v->>3)::numeric, (v->>4)::int, (v->>5)::int '
+                'FROM jsonb_array_elements(%s::jsonb) AS v'
+            )
+        else:
+            # WHERE обязателен в SQLite для INSERT ... SELECT ... ON CONFLICT
+            values = 'SELECT {} FROM json_each(%s) WHERE 1'.format(', '.join(
+                f"json_extract(value, '$[{i}]')" for i in range(len(columns))
+            ))
+        updates = ', '.join(
+            f'{quote(column)} = {table}.{quote(column)} '
+            f'+ EXCLUDED.{quote(column)}'
+            for column in COLUMNS
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} '
+                f'({", ".join(quote(column) for column in columns)}) '
+                f'{values} '
+                f'ON CONFLICT ({quote("region_id")}, {quote("slot")}) '
+                f'DO UPDATE SET {updates}',
+                [json.dumps(rows)]
+            )
+
+
+def courier_supply(couriers):
+    """
+    {id курьера: (id районов, часы работы в минутах)} для списка курьеров
+    фиксированным числом запросов
+    """
+    supply = {courier.pk: ([], []) for courier in couriers}
+    if region_array_storage():
+        for courier in couriers:
+            supply[courier.pk][0].extend(courier.region_ids)
+    else:
+        rows = Courier.regions.through.objects.filter(
+            courier_id__in=list(supply)
+        ).values_list('courier_id', 'region_id')
+        for courier_id, region_id in rows:
+            supply[courier_id][0].append(region_id)
+    if inline_storage():
+        for courier in couriers:
+            supply[courier.pk][1].extend(courier.working_ranges)
+    else:
+        rows = Courier.working_hours.through.objects.filter(
+            courier_id__in=list(supply)
+        ).values_list(
+            'courier_id', 'timeinterval__start', 'timeinterval__end'
+        )
+        for courier_id, start, end in rows:
+            supply[courier_id][1].append((to_minutes(start), to_minutes(end)))
+    return supply
+
+
+def replace(delta):
+    """
+    Заменяет всю сводку значениями из delta (пересчет с нуля)
+    """
+    using = router.db_for_write(RegionSlot)
+    with transaction.atomic(using=using):
+        RegionSlot.objects.using(using).all().delete()
+        delta.write()
+
+
+def read(region_ids=None):
+    """
+    Ненулевые строки сводки по районам region_ids (всем, если не заданы)
+    """
+    rows = RegionSlot.objects.exclude(
+        open_orders=0, assigned_orders=0, couriers=0
+    ).order_by('region_id', 'slot')
+    if region_ids is not None:
+        rows = rows.filter(region_id__in=region_ids)
+    return rows
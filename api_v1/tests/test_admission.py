@@ -0,0 +1,108 @@
+import shutil
+import tempfile
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api_v1.admission import SlotPool
+
+
+@override_settings(
+    MIDDLEWARE=[
+        settings.MIDDLEWARE[0], 'api_v1.admission.AdmissionMiddleware',
+        *settings.MIDDLEWARE[1:]
+    ],
+    ADMISSION_LIMITS={'orders-create': 1},
+    ADMISSION_CAPACITY=2,
+    ADMISSION_RESERVED=1,
+)
+class AdmissionTests(APITestCase):
+    """
+    Тест ограничения одновременных запросов. Слоты, занятые отдельным
+    SlotPool, ведут себя как слоты другого процесса
+    """
+    orders = {'data': [{'order_id': 1, 'weight': 1, 'region': 1,
+                        'delivery_hours': ['10:00-12:00']}]}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp(prefix='admission-test-')
+        cls.directory_override = override_settings(ADMISSION_DIR=cls.directory)
+        cls.directory_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory_override.disable()
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def hold(self, name, size, index):
+        slot = SlotPool(self.directory, name, size).acquire([index])
+        self.assertIsNotNone(slot)
+        self.addCleanup(slot.release)
+
+    def create_orders(self):
+        return self.client.post(
+            reverse('orders-list'), self.orders, format='json'
+        )
+
+    def complete(self):
+        return self.client.post(reverse('orders-complete'), {
+            'courier_id': 1, 'order_id': 1,
+            'complete_time': '2100-01-01T00:00:00Z',
+        }, format='json')
+
+    def test_endpoint_limit(self):
+        """
+        Тяжелое действие сверх своего лимита получает 429, легкие
+        работают
+        """
+        self.hold('orders-create', 1, 0)
+        response = self.create_orders()
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(
+            self.complete().status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_reserved(self):
+        """
+        Резервный слот доступен только легким действиям
+        """
+        self.hold('shared', 2, 0)
+        self.assertEqual(
+            self.create_orders().status_code,
+            status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertEqual(
+            self.complete().status_code, status.HTTP_400_BAD_REQUEST
+        )
+        self.hold('shared', 2, 1)
+        self.assertEqual(
+            self.complete().status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+
+    def test_slots_released(self):
+        """
+        Слоты освобождаются после ответа
+        """
+        for _ in range(3):
+            self.assertNotEqual(
+                self.create_orders().status_code,
+                status.HTTP_429_TOO_MANY_REQUESTS
+            )
+
+    @override_settings(MAX_BATCH_ITEMS={'couriers': 10, 'orders': 1})
+    def test_max_items(self):
+        data = {'data': self.orders['data'] * 2}
+        response = self.client.post(
+            reverse('orders-list'), data, format='json'
+        )
+        self.assertEqual(
+            response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+        self.assertEqual(response['Retry-After'], '1')
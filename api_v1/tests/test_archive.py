@@ -0,0 +1,73 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api_v1.models import AssignedOrder, ArchivedOrder
+
+
+class ArchiveTests(APITestCase):
+    """
+    Тест переноса выполненных назначений в архив
+    """
+    def setUp(self):
+        couriers = {'data': [{
+            'courier_id': 1,
+            'courier_type': 'foot',
+            'regions': [1, 12],
+            'working_hours': ['00:00-23:59'],
+        }]}
+        orders = {'data': [
+            {'order_id': i, 'weight': 5, 'region': region,
+             'delivery_hours': ['00:00-23:59']}
+            for i, region in ((1, 1), (2, 1), (3, 12))
+        ]}
+        self.client.post(reverse('couriers-list'), couriers, format='json')
+        self.client.post(reverse('orders-list'), orders, format='json')
+        response = self.client.post(
+            reverse('orders-assign'), {'courier_id': 1}, format='json'
+        )
+        self.assign_time = timezone.now()
+        self.assertEqual(len(response.data['orders']), 3)
+
+    def complete(self, order_id, minutes):
+        complete_time = self.assign_time + timedelta(minutes=minutes)
+        response = self.client.post(
+            reverse('orders-complete'),
+            {'courier_id': 1, 'order_id': order_id,
+             'complete_time': complete_time.isoformat()},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_archive(self):
+        """
+        Рейтинг, заработок и время доставки учитывают архив
+        """
+        self.complete(1, 10)
+        self.complete(2, 30)
+        before = self.client.get(reverse('couriers-detail', args=[1])).data
+        call_command('archive_assignments', days=-1, stdout=StringIO())
+        self.assertEqual(ArchivedOrder.objects.count(), 2)
+        self.assertEqual(
+            list(AssignedOrder.objects.values_list('pk', flat=True)), [3]
+        )
+        after = self.client.get(reverse('couriers-detail', args=[1])).data
+        self.assertEqual(before, after)
+        self.assertEqual(after['earnings'], 2000)
+
+        self.complete(3, 45)
+        self.assertEqual(
+            AssignedOrder.objects.get(pk=3).delivery_time,
+            timedelta(minutes=15)
+        )
+
+    def test_threshold(self):
+        """
+        Свежие выполненные назначения остаются в горячей таблице
+        """
+        self.complete(1, 10)
+        call_command('archive_assignments', days=30, stdout=StringIO())
+        self.assertFalse(ArchivedOrder.objects.exists())
@@ -70,3 +70,27 @@ class AssignTests(APITestCase):
         url = reverse('orders-assign')
         response = self.client.post(url, self.invalid_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_serializer_forms(self):
+        """
+        Запросы не в основном формате обрабатывает сериализатор: id строкой
+        принимается, остальное - 400 с ошибками сериализатора
+        """
+        url = reverse('orders-assign')
+        response = self.client.post(url, {'courier_id': '1'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['orders'], self.success_data)
+        for data, errors in (
+            ({}, {'courier_id': ['This field is required.']}),
+            ({'courier_id': 999},
+             {'courier_id': ['Invalid pk "999" - object does not exist.']}),
+            ({'courier_id': [1]}, {'courier_id': [
+                'Incorrect type. Expected pk value, received list.'
+            ]}),
+        ):
+            with self.subTest(data=data):
+                response = self.client.post(url, data, format='json')
+                self.assertEqual(
+                    response.status_code, status.HTTP_400_BAD_REQUEST
+                )
+                self.assertEqual(response.json(), errors)
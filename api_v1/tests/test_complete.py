@@ -85,3 +85,24 @@ class CompleteTests(APITestCase):
         """
         response = self.client.post(self.url, self.invalid_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_serializer_forms(self):
+        """
+        Запросы не в основном формате и ошибки обрабатывает сериализатор
+        """
+        for data in (
+            {**self.data, 'complete_time': 'yesterday'},
+            {**self.data, 'complete_time': '2021-03-29T14:00:00Z'},
+            {**self.data, 'courier_id': 2},
+            [self.data],
+        ):
+            with self.subTest(data=data):
+                response = self.client.post(self.url, data, format='json')
+                self.assertEqual(
+                    response.status_code, status.HTTP_400_BAD_REQUEST
+                )
+        response = self.client.post(
+            self.url, {**self.data, 'order_id': '1'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, self.success_data)
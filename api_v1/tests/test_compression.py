@@ -0,0 +1,62 @@
+import gzip
+import json
+from unittest import skipIf
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api_v1.compression import zstandard
+from api_v1.models import Order
+
+
+class CompressionTests(APITestCase):
+    """
+    Тест сжатых тел запросов и ответов
+    """
+    def setUp(self):
+        self.body = json.dumps({'data': [
+            {'order_id': i, 'weight': 1, 'region': 1,
+             'delivery_hours': ['10:00-12:00']}
+            for i in range(1, 51)
+        ]}).encode()
+
+    def post(self, body, encoding, **headers):
+        return self.client.generic(
+            'POST', reverse('orders-list'), body,
+            content_type='application/json',
+            HTTP_CONTENT_ENCODING=encoding, **headers
+        )
+
+    def test_gzip(self):
+        """
+        Сжатый запрос разбирается, ответ сжимается по Accept-Encoding
+        """
+        response = self.post(
+            gzip.compress(self.body), 'gzip', HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        data = json.loads(gzip.decompress(response.content))
+        self.assertEqual(len(data['orders']), 50)
+        self.assertEqual(Order.objects.count(), 50)
+
+    @skipIf(zstandard is None, 'zstandard is not installed')
+    def test_zstd(self):
+        body = zstandard.ZstdCompressor().compress(self.body)
+        response = self.post(body, 'zstd')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_errors(self):
+        response = self.post(gzip.compress(self.body)[:-10], 'gzip')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.post(self.body, 'br')
+        self.assertEqual(
+            response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+        )
+        with override_settings(REQUEST_MAX_DECOMPRESSED_BYTES=1000):
+            response = self.post(gzip.compress(self.body), 'gzip')
+        self.assertEqual(
+            response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+        self.assertFalse(Order.objects.exists())
@@ -0,0 +1,101 @@
+import asyncio
+import time
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from api_v1.db_routers import (
+    PIN_HEADER, ReplicaRouter, ReplicaRoutingMiddleware
+)
+from api_v1.models import Courier
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'], REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTests(SimpleTestCase):
+    """
+    Тест маршрутизации чтения на реплики
+    """
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        self.used_db = []
+
+    def view(self, request):
+        self.used_db.append(self.router.db_for_read(Courier))
+        return HttpResponse()
+
+    def call(self, request):
+        return ReplicaRoutingMiddleware(self.view)(request)
+
+    def test_read_from_replica(self):
+        """
+        GET читает с реплики
+        """
+        self.call(self.factory.get('/couriers/1'))
+        self.assertEqual(self.used_db, ['replica_1'])
+
+    def test_write_to_primary(self):
+        """
+        POST читает из основной БД и закрепляет клиента за ней
+        """
+        response = self.call(self.factory.post('/orders/assign'))
+        self.assertEqual(self.used_db, ['default'])
+        self.assertAlmostEqual(
+            float(response[PIN_HEADER]), time.time() + 5, delta=1
+        )
+        self.assertEqual(self.router.db_for_write(Courier), 'default')
+
+    def test_failed_write(self):
+        """
+        Неуспешная запись клиента не закрепляет
+        """
+        def view(request):
+            return HttpResponse(status=400)
+
+        middleware = ReplicaRoutingMiddleware(view)
+        response = middleware(self.factory.post('/orders/assign'))
+        self.assertFalse(response.has_header(PIN_HEADER))
+
+    def test_pinned_client(self):
+        """
+        Клиент, повторяющий заголовок закрепления, до его истечения читает
+        из основной БД
+        """
+        for pin, db in ((time.time() + 5, 'default'),
+                        (time.time() - 1, 'replica_1'),
+                        ('x', 'replica_1')):
+            self.used_db = []
+            self.call(self.factory.get(
+                '/couriers/1', HTTP_X_PRIMARY_PIN=str(pin)
+            ))
+            self.assertEqual(self.used_db, [db])
+
+    def test_read_after_write(self):
+        """
+        После записи в рамках запроса чтение идет в основную БД
+        """
+        def view(request):
+            self.router.db_for_write(Courier)
+            return self.view(request)
+
+        ReplicaRoutingMiddleware(view)(self.factory.get('/couriers/1'))
+        self.assertEqual(self.used_db, ['default'])
+
+    def test_async_chain(self):
+        """
+        В асинхронной цепочке GET читает с реплики, POST закрепляет клиента
+        """
+        async def view(request):
+            return await sync_to_async(self.view)(request)
+
+        middleware = ReplicaRoutingMiddleware(view)
+        asyncio.run(middleware(self.factory.get('/couriers/1')))
+        response = asyncio.run(middleware(self.factory.post('/orders/assign')))
+        self.assertEqual(self.used_db, ['replica_1', 'default'])
+        self.assertTrue(response.has_header(PIN_HEADER))
+
+    def test_outside_request(self):
+        """
+        Вне запроса чтение идет в основную БД
+        """
+        self.assertEqual(self.router.db_for_read(Courier), 'default')
+        self.assertFalse(self.router.allow_migrate('replica_1', 'api_v1'))
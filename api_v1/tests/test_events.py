@@ -0,0 +1,131 @@
+from datetime import timedelta
+from unittest import mock
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api_v1.models import AssignedOrder, OrderEvent
+
+
+class OrderEventsTests(APITestCase):
+    """
+    Журнал событий заказов и GET /events
+    """
+    def setUp(self):
+        self.client.post(reverse('couriers-list'), {'data': [{
+            'courier_id': 1,
+            'courier_type': 'car',
+            'regions': [1],
+            'working_hours': ['09:00-18:00'],
+        }]}, format='json')
+        self.client.post(reverse('orders-list'), {'data': [
+            {'order_id': i, 'weight': 1, 'region': 1,
+             'delivery_hours': ['10:00-11:00']}
+            for i in (1, 2, 3)
+        ]}, format='json')
+
+    def assign(self):
+        return self.client.post(
+            reverse('orders-assign'), {'courier_id': 1}, format='json'
+        )
+
+    def get_events(self, **params):
+        response = self.client.get(reverse('events'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_feed(self):
+        """
+        Назначение, выполнение и снятие пишут события, курсор позволяет
+        продолжить чтение с места остановки
+        """
+        self.assign()
+        assign_time = AssignedOrder.objects.get(pk=1).assign_time
+        self.client.post(reverse('orders-complete'), {
+            'courier_id': 1,
+            'order_id': 1,
+            'complete_time': assign_time + timedelta(hours=1),
+        }, format='json')
+        self.client.patch(
+            reverse('couriers-detail', args=[1]), {'regions': [2]},
+            format='json'
+        )
+
+        page = self.get_events(limit=2)
+        self.assertEqual(
+            [(event['type'], event['order_ids']) for event in page['events']],
+            [('assigned', [1, 2, 3]), ('completed', [1])]
+        )
+        self.assertEqual(page['events'][0]['courier_id'], 1)
+        page = self.get_events(after=page['cursor'])
+        self.assertEqual(
+            [(event['type'], event['order_ids']) for event in page['events']],
+            [('unassigned', [1, 2, 3])]
+        )
+        cursor = page['cursor']
+        self.assertEqual(
+            self.get_events(after=cursor), {'events': [], 'cursor': cursor}
+        )
+
+    def test_no_changes(self):
+        """
+        Назначение без заказов события не пишет
+        """
+        self.assign()
+        self.assertEqual(self.assign().data, {'orders': []})
+        self.assertEqual(OrderEvent.objects.count(), 1)
+
+    def test_same_transaction(self):
+        """
+        Ошибка после записи назначений откатывает и назначения, и событие
+        """
+        with mock.patch(
+                'api_v1.events.OrderEvent.objects.create',
+                side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.assign()
+        self.assertFalse(AssignedOrder.objects.exists())
+        self.assertFalse(OrderEvent.objects.exists())
+
+    def assert_recorded_last(self, request):
+        with CaptureQueriesContext(connection) as queries:
+            request()
+        writes = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ]
+        self.assertIn('"api_v1_orderevent"', writes[-1])
+
+    @override_settings(SUPPLY_ROLLUP=1)
+    def test_recorded_last(self):
+        """
+        Событие - последняя запись транзакции: на PostgreSQL блокировка
+        записи событий держится только до коммита
+        """
+        self.assert_recorded_last(self.assign)
+        assign_time = AssignedOrder.objects.get(pk=1).assign_time
+        self.assert_recorded_last(
+            lambda: self.client.post(reverse('orders-complete'), {
+                'courier_id': 1, 'order_id': 1,
+                'complete_time': assign_time + timedelta(hours=1),
+            }, format='json')
+        )
+        self.assert_recorded_last(
+            lambda: self.client.patch(
+                reverse('couriers-detail', args=[1]), {'regions': [2]},
+                format='json'
+            )
+        )
+
+    def test_bad_params(self):
+        for params in ({'after': 'x'}, {'after': -1}, {'limit': 0}):
+            response = self.client.get(reverse('events'), params)
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST
+            )
+        response = self.client.post(reverse('events'))
+        self.assertEqual(
+            response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED
+        )
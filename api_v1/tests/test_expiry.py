@@ -0,0 +1,66 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api_v1.models import Order
+from api_v1.simulation import load_couriers, load_orders, simulate
+
+
+class ExpiryTests(APITestCase):
+    """
+    Тест срока действия заказов
+    """
+    def setUp(self):
+        now = timezone.now()
+        couriers = {'data': [{
+            'courier_id': 1,
+            'courier_type': 'car',
+            'regions': [1],
+            'working_hours': ['00:00-23:59'],
+        }]}
+        orders = {'data': [
+            {'order_id': i, 'weight': 1, 'region': 1,
+             'delivery_hours': ['10:00-12:00'],
+             **({'expires_at': expires_at.isoformat()} if expires_at else {})}
+            for i, expires_at in (
+                (1, None),
+                (2, now - timedelta(hours=1)),
+                (3, now + timedelta(hours=1)),
+            )
+        ]}
+        self.client.post(reverse('couriers-list'), couriers, format='json')
+        response = self.client.post(
+            reverse('orders-list'), orders, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_assign_live_only(self):
+        """
+        Просроченный заказ не назначается и до, и после отметки
+        """
+        self.assertEqual(
+            simulate(load_couriers(), load_orders())['pending_orders'], 2
+        )
+        call_command('expire_orders', stdout=StringIO())
+        self.assertEqual(
+            list(Order.objects.filter(is_expired=True)
+                 .values_list('pk', flat=True)),
+            [2]
+        )
+        response = self.client.post(
+            reverse('orders-assign'), {'courier_id': 1}, format='json'
+        )
+        self.assertEqual(response.data['orders'], [{'id': 1}, {'id': 3}])
+
+    def test_generated(self):
+        call_command(
+            'generate_dataset', seed=1, couriers=5, orders=200, regions=2,
+            completed=0, expired=0.5, batch_size=100, stdout=StringIO()
+        )
+        stale = Order.objects.filter(expires_at__lte=timezone.now()).count()
+        self.assertTrue(stale)
+        call_command('expire_orders', batch_size=7, stdout=StringIO())
+        self.assertEqual(Order.objects.filter(is_expired=True).count(), stale)
@@ -0,0 +1,58 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from api_v1.eligibility import order_fits
+from api_v1.models import Courier, Order, AssignedOrder
+from api_v1.ranges import intervals_to_ranges
+
+
+class GenerateDatasetTests(TestCase):
+    """
+    Тест генератора набора данных
+    """
+    def generate(self, seed):
+        call_command(
+            'generate_dataset', seed=seed, couriers=50, orders=500,
+            regions=10, batch_size=100, stdout=StringIO()
+        )
+        return (
+            list(Courier.objects.values_list('courier_id', 'courier_type')),
+            list(Order.objects.values_list('id', 'weight', 'region_id')),
+            list(AssignedOrder.objects.values_list('order_id', 'courier_id')),
+        )
+
+    def test_generate(self):
+        """
+        Создается заданное число объектов, история выполнения согласована
+        с весом, районами и часами работы курьеров
+        """
+        self.generate(seed=1)
+        self.assertEqual(Courier.objects.count(), 50)
+        self.assertEqual(Order.objects.count(), 500)
+        self.assertTrue(AssignedOrder.objects.exists())
+        for assigned in AssignedOrder.objects.select_related(
+                'courier', 'order'):
+            courier = assigned.courier
+            self.assertTrue(assigned.order.is_assigned)
+            self.assertLessEqual(
+                assigned.order.weight,
+                courier.max_weights[courier.courier_type]
+            )
+            self.assertTrue(
+                courier.regions.filter(pk=assigned.order.region_id).exists()
+            )
+            self.assertTrue(order_fits(
+                courier.profile, assigned.order.region_id,
+                assigned.order.weight,
+                intervals_to_ranges(assigned.order.delivery_hours.all())
+            ))
+            self.assertGreater(assigned.complete_time, assigned.assign_time)
+
+    def test_same_seed(self):
+        """
+        Одинаковый seed дает одинаковые данные
+        """
+        first = self.generate(seed=7)
+        for model in (AssignedOrder, Order, Courier):
+            model.objects.all().delete()
+        self.assertEqual(self.generate(seed=7), first)
@@ -0,0 +1,114 @@
+import json
+from datetime import timedelta
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api_v1.models import Courier, IdempotencyKey
+
+
+class IdempotencyTests(APITestCase):
+    """
+    Тест заголовка Idempotency-Key
+    """
+    couriers = {'data': [{
+        'courier_id': 1,
+        'courier_type': 'foot',
+        'regions': [1],
+        'working_hours': ['09:00-18:00'],
+    }]}
+
+    def post(self, data, key='key-1', url='couriers-list'):
+        return self.client.post(
+            reverse(url), data, format='json', HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_replay(self):
+        """
+        Повтор получает сохраненный ответ, курьер создается один раз
+        """
+        first = self.post(self.couriers)
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        with self.assertNumQueries(1):
+            second = self.post(self.couriers)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Courier.objects.count(), 1)
+
+        # Без ключа или с другим ключом - обычная обработка
+        response = self.post(self.couriers, key='key-2')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_scope_and_payload(self):
+        """
+        Ключ действует в пределах действия и привязан к телу запроса
+        """
+        self.post(self.couriers)
+        response = self.post({'data': []})
+        self.assertEqual(
+            response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+        response = self.post({'data': []}, url='orders-list')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_expired(self):
+        self.post(self.couriers)
+        IdempotencyKey.objects.update(
+            expires=timezone.now() - timedelta(seconds=1)
+        )
+        response = self.post(self.couriers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+
+    def lock(self):
+        """
+        Ключ, занятый выполняющимся запросом
+        """
+        self.post(self.couriers)
+        record = IdempotencyKey.objects.get()
+        saved = record.status_code, record.response
+        record.status_code = None
+        record.save()
+        return record, saved
+
+    def test_in_progress(self):
+        """
+        Повтор во время выполнения первого запроса сразу получает 409,
+        после завершения - сохраненный ответ
+        """
+        record, (status_code, body) = self.lock()
+        response = self.post(self.couriers)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response['Retry-After'], '1')
+
+        record.status_code = status_code
+        record.response = body
+        record.save()
+        response = self.post(self.couriers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json(), {'couriers': [{'id': 1}]})
+
+    def test_canonical_payload(self):
+        """
+        Тело сравнивается после разбора: порядок ключей и пробелы
+        не важны
+        """
+        self.post(self.couriers)
+        courier = self.couriers['data'][0]
+        body = json.dumps(
+            {'data': [dict(reversed(list(courier.items())))]}, indent=4
+        )
+        response = self.client.post(
+            reverse('couriers-list'), body,
+            content_type='application/json', HTTP_IDEMPOTENCY_KEY='key-1'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+
+    def test_assign(self):
+        self.post(self.couriers)
+        data = {'courier_id': 1}
+        first = self.post(data, url='orders-assign')
+        second = self.post(data, url='orders-assign')
+        self.assertEqual(first.json(), second.json())
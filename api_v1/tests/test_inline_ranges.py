@@ -0,0 +1,152 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api_v1.models import Courier, Order, Region, TimeInterval
+from api_v1.ranges import ranges_overlap, pack_ranges, unpack_ranges
+
+
+class RangesTests(SimpleTestCase):
+    def test_overlap(self):
+        """
+        Пересечение полуоткрытых интервалов [начало, конец)
+        """
+        working = pack_ranges([(540, 840), (1020, 1320)])
+        self.assertTrue(ranges_overlap(working, pack_ranges([(480, 720)])))
+        self.assertTrue(ranges_overlap(working, pack_ranges([(1080, 1380)])))
+        self.assertFalse(ranges_overlap(working, pack_ranges([(900, 960)])))
+        self.assertFalse(ranges_overlap(working, pack_ranges([(840, 900)])))
+        self.assertFalse(ranges_overlap(working, ''))
+
+    def test_pack_keeps_ranges(self):
+        """
+        Упаковка сохраняет порядок, пересекающиеся и нулевые интервалы
+        """
+        ranges = [(660, 840), (540, 720), (600, 600)]
+        self.assertEqual(unpack_ranges(pack_ranges(ranges)), ranges)
+        self.assertEqual(unpack_ranges(pack_ranges([])), [])
+        # Нулевой интервал пересекается так же, как в условии для M2M
+        self.assertTrue(ranges_overlap(
+            pack_ranges([(600, 600)]), pack_ranges([(540, 660)])
+        ))
+
+
+@override_settings(INTERVAL_STORAGE='inline')
+class InlineStorageTests(APITestCase):
+    """
+    Тест режима хранения интервалов в полях курьера и заказа
+    """
+    def setUp(self):
+        couriers = {'data': [{
+            'courier_id': 1,
+            'courier_type': 'foot',
+            'regions': [1, 12, 22],
+            'working_hours': ['09:00-14:00', '17:00-22:00'],
+        }]}
+        orders = {'data': [
+            {'order_id': 1, 'weight': 9, 'region': 1,
+             'delivery_hours': ['08:00-12:00']},
+            {'order_id': 2, 'weight': 12, 'region': 12,
+             'delivery_hours': ['15:00-16:00']},
+            {'order_id': 3, 'weight': 9, 'region': 22,
+             'delivery_hours': ['15:00-16:00', '18:00-23:00']},
+        ]}
+        response = self.client.post(
+            reverse('couriers-list'), couriers, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(
+            reverse('orders-list'), orders, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_no_m2m_rows(self):
+        """
+        Интервалы хранятся в полях, M2M не используется
+        """
+        self.assertEqual(
+            Courier.objects.get().working_ranges, [(540, 840), (1020, 1320)]
+        )
+        self.assertEqual(
+            Order.objects.get(pk=3).delivery_ranges,
+            [(900, 960), (1080, 1380)]
+        )
+        self.assertFalse(TimeInterval.objects.exists())
+
+    def test_assign_and_info(self):
+        """
+        Назначение по пересечению интервалов, формат API не меняется
+        """
+        response = self.client.post(
+            reverse('orders-assign'), {'courier_id': 1}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['orders'], [{'id': 1}, {'id': 3}])
+        response = self.client.get(reverse('couriers-detail', args=[1]))
+        self.assertEqual(
+            response.data['working_hours'], ['09:00-14:00', '17:00-22:00']
+        )
+
+    def test_intervals_kept_as_sent(self):
+        """
+        Пересекающиеся и нулевые интервалы отдаются так, как переданы
+        """
+        hours = ['11:00-14:00', '09:00-12:00', '10:00-10:00']
+        response = self.client.patch(
+            reverse('couriers-detail', args=[1]),
+            {'working_hours': hours}, format='json'
+        )
+        self.assertEqual(response.data['working_hours'], hours)
+        response = self.client.get(reverse('couriers-detail', args=[1]))
+        self.assertEqual(response.data['working_hours'], hours)
+
+    def test_update_unassigns(self):
+        """
+        После смены часов работы неподходящие заказы снимаются
+        """
+        self.client.post(
+            reverse('orders-assign'), {'courier_id': 1}, format='json'
+        )
+        response = self.client.patch(
+            reverse('couriers-detail', args=[1]),
+            {'working_hours': ['11:00-12:00']}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['working_hours'], ['11:00-12:00'])
+        self.assertEqual(
+            list(Order.objects.filter(is_assigned=True)
+                 .values_list('pk', flat=True)),
+            [1]
+        )
+
+
+class FillTimeRangesTests(APITestCase):
+    """
+    Тест переноса интервалов из M2M в поля
+    """
+    def test_fill(self):
+        region = Region.objects.create(region_id=1)
+        courier = Courier.objects.create(courier_id=1, courier_type='car')
+        courier.regions.set([region])
+        courier.working_hours.set([
+            TimeInterval.objects.create(interval='09:00-14:00')
+        ])
+        for order_id in (1, 2):
+            order = Order.objects.create(id=order_id, weight=1, region=region)
+            order.delivery_hours.set([
+                TimeInterval.objects.get_or_create(
+                    interval='13:00-15:00' if order_id == 1 else '15:00-16:00'
+                )[0]
+            ])
+
+        call_command('fill_time_ranges', batch_size=1, stdout=StringIO())
+
+        courier.refresh_from_db()
+        self.assertEqual(courier.working_ranges, [(540, 840)])
+        with override_settings(INTERVAL_STORAGE='inline'):
+            response = self.client.post(
+                reverse('orders-assign'), {'courier_id': 1}, format='json'
+            )
+        self.assertEqual(response.data['orders'], [{'id': 1}])
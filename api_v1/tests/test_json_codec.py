@@ -0,0 +1,81 @@
+import io
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+from django.test import SimpleTestCase
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from api_v1 import renderers
+from api_v1.parsers import ORJSONParser
+from api_v1.renderers import ORJSONRenderer
+
+
+class JSONCodecTests(SimpleTestCase):
+    """
+    Тест совместимости парсера и рендерера на orjson со стандартными
+    """
+    def setUp(self):
+        self.data = {
+            'orders': [{'id': 1}, {'id': 2}],
+            'weight': Decimal('0.23'),
+            'assign_time': datetime(2021, 3, 28, 12, 30, tzinfo=timezone.utc),
+            'delivery_time': timedelta(minutes=15),
+            'text': 'строка\u2028',
+        }
+
+    def test_render_same_as_stock(self):
+        """
+        Вывод совпадает со стандартным JSONRenderer
+        """
+        self.assertEqual(
+            ORJSONRenderer().render(self.data),
+            JSONRenderer().render(self.data)
+        )
+
+    def test_render_fallback_without_orjson(self):
+        """
+        Без orjson используется стандартный рендерер
+        """
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(
+                ORJSONRenderer().render(self.data),
+                JSONRenderer().render(self.data)
+            )
+
+    def test_render_indent(self):
+        """
+        Форматированный вывод по запросу клиента
+        """
+        media_type = 'application/json; indent=4'
+        self.assertEqual(
+            ORJSONRenderer().render(self.data, media_type),
+            JSONRenderer().render(self.data, media_type)
+        )
+
+    def test_parse_same_as_stock(self):
+        """
+        Разбор совпадает со стандартным JSONParser
+        """
+        body = '{"data": [{"order_id": 1, "weight": 0.23, ' \
+               '"region": 12, "delivery_hours": ["09:00-18:00"]}]}'
+        body = body.encode()
+        self.assertEqual(
+            ORJSONParser().parse(io.BytesIO(body)),
+            JSONParser().parse(io.BytesIO(body))
+        )
+
+    def test_parse_error(self):
+        """
+        Ошибка разбора возвращается так же, как в JSONParser
+        """
+        for body in (b'{"data": ', b'{"weight": NaN}'):
+            with self.assertRaises(ParseError) as expected:
+                JSONParser().parse(io.BytesIO(body))
+            with self.assertRaises(ParseError) as actual:
+                ORJSONParser().parse(io.BytesIO(body))
+            self.assertEqual(
+                str(actual.exception.detail),
+                str(expected.exception.detail)
+            )
@@ -0,0 +1,186 @@
+import asyncio
+import threading
+import time
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api_v1.longpoll import VersionWatcher, orders_changed
+from api_v1.models import Courier
+from api_v1.serializers import CourierUpdateSerializer
+
+
+class VersionWatcherTests(SimpleTestCase):
+    """
+    Тест ожидания изменения версии без БД
+    """
+    @override_settings(LONG_POLL_INTERVAL=0.01)
+    def test_poll(self):
+        """
+        Фоновый опрос будит ожидающего при смене версии
+        """
+        versions = {1: 0}
+        watcher = VersionWatcher(lambda ids: {i: versions[i] for i in ids})
+
+        async def scenario():
+            async def change():
+                await asyncio.sleep(0.05)
+                versions[1] = 1
+            start = time.monotonic()
+            await asyncio.gather(watcher.wait(1, 0, 5), change())
+            return time.monotonic() - start
+
+        self.assertLess(asyncio.run(scenario()), 1)
+
+    @override_settings(LONG_POLL_INTERVAL=10)
+    def test_notify(self):
+        """
+        Изменение в этом процессе будит ожидающего сразу
+        """
+        watcher = VersionWatcher(lambda ids: {})
+
+        async def scenario():
+            async def change():
+                await asyncio.sleep(0.05)
+                watcher.notify(1)
+            start = time.monotonic()
+            await asyncio.gather(watcher.wait(1, 0, 5), change())
+            return time.monotonic() - start
+
+        self.assertLess(asyncio.run(scenario()), 1)
+
+    @override_settings(LONG_POLL_INTERVAL=0.01)
+    def test_timeout(self):
+        watcher = VersionWatcher(lambda ids: {1: 0})
+
+        async def scenario():
+            await watcher.wait(1, 0, 0.05)
+            state = watcher._loops[asyncio.get_running_loop()]
+            return state.waiters, state.poller
+
+        self.assertEqual(asyncio.run(scenario()), ({}, None))
+
+    @override_settings(LONG_POLL_INTERVAL=10)
+    def test_loop_per_thread(self):
+        """
+        Под WSGI у каждого запроса свой цикл в своем потоке: изменение
+        будит ожидающих во всех циклах
+        """
+        watcher = VersionWatcher(lambda ids: {})
+        durations = []
+
+        def request():
+            start = time.monotonic()
+            asyncio.run(watcher.wait(1, 0, 5))
+            durations.append(time.monotonic() - start)
+
+        threads = [threading.Thread(target=request) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        while True:
+            with watcher._lock:
+                states = list(watcher._loops.values())
+            if len(states) == 2 and all(state.waiters for state in states):
+                break
+            time.sleep(0.01)
+        watcher.notify(1)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(durations), 2)
+        self.assertLess(max(durations), 1)
+
+
+@override_settings(LONG_POLL_INTERVAL=0.01)
+class CourierOrdersTests(APITestCase):
+    """
+    Тест GET /couriers/{id}/orders
+    """
+    def setUp(self):
+        couriers = {'data': [{
+            'courier_id': 1,
+            'courier_type': 'foot',
+            'regions': [1],
+            'working_hours': ['09:00-18:00'],
+        }]}
+        orders = {'data': [
+            {'order_id': i, 'weight': 5, 'region': 1,
+             'delivery_hours': ['10:00-11:00']}
+            for i in (1, 2)
+        ]}
+        self.client.post(reverse('couriers-list'), couriers, format='json')
+        self.client.post(reverse('orders-list'), orders, format='json')
+        self.url = reverse('couriers-orders', args=[1])
+
+    def test_active_orders(self):
+        """
+        Список невыполненных заказов и версия меняются при назначении
+        и выполнении
+        """
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'orders': [], 'version': 0})
+
+        assigned = self.client.post(
+            reverse('orders-assign'), {'courier_id': 1}, format='json'
+        ).json()
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['orders'], [{'id': 1}, {'id': 2}])
+        self.assertEqual(data['assign_time'], assigned['assign_time'])
+        self.assertEqual(data['version'], 1)
+
+        self.client.post(reverse('orders-complete'), {
+            'courier_id': 1, 'order_id': 1,
+            'complete_time': '2100-01-01T00:00:00Z',
+        }, format='json')
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['orders'], [{'id': 2}])
+        self.assertEqual(data['version'], 2)
+
+    def test_wait(self):
+        """
+        Устаревшая версия возвращается сразу, текущая - по таймауту
+        """
+        start = time.monotonic()
+        response = self.client.get(self.url, {'wait': 5, 'version': 7})
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(response.json()['version'], 0)
+
+        start = time.monotonic()
+        response = self.client.get(self.url, {'wait': 0.1, 'version': 0})
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+        self.assertEqual(response.json()['version'], 0)
+
+    def test_errors(self):
+        response = self.client.get(reverse('couriers-orders', args=[2]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(self.url, {'wait': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url)
+        self.assertEqual(
+            response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+
+    def test_update_keeps_orders_version(self):
+        """
+        PATCH курьера не затирает версию заказов, измененную после чтения
+        """
+        courier = Courier.objects.get(pk=1)
+        orders_changed(1)
+        serializer = CourierUpdateSerializer(
+            courier, data={'courier_type': 'car'}, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        courier = Courier.objects.get(pk=1)
+        self.assertEqual(courier.orders_version, 1)
+        self.assertEqual(courier.courier_type, 'car')
+
+    @override_settings(ROOT_URLCONF='slasty.longpoll_urls')
+    def test_long_poll_only(self):
+        """
+        Процесс долгого опроса отдает только заказы курьера
+        """
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get('/couriers/1')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,72 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+class MetricsTests(APITestCase):
+    """
+    Тест метрик по действиям DRF
+    """
+    def get_metric(self, text, name, **labels):
+        """
+        Значение метрики с заданными метками из текстового формата
+        """
+        label_text = ','.join(f'{k}="{v}"' for k, v in labels.items())
+        prefix = f'{name}{{{label_text}}} '
+        for line in text.splitlines():
+            if line.startswith(prefix):
+                return float(line[len(prefix):])
+        return 0
+
+    def test_metrics(self):
+        """
+        Запросы к действию create учитываются в метриках
+        """
+        response = self.client.get(reverse('metrics'))
+        before = response.content.decode()
+        data = {'data': [
+            {
+                'courier_id': i,
+                'courier_type': 'foot',
+                'regions': [1, 2],
+                'working_hours': ['11:35-14:05'],
+            } for i in (1, 2, 3)
+        ]}
+        response = self.client.post(
+            reverse('couriers-list'), data, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        after = response.content.decode()
+        for name, labels, delta in (
+            ('api_request_duration_seconds_count',
+             {'action': 'create', 'method': 'POST', 'status': 201}, 1),
+            ('api_payload_items_sum', {'action': 'create'}, 3),
+            ('api_db_queries_count', {'action': 'create'}, 1),
+        ):
+            self.assertEqual(
+                self.get_metric(after, name, **labels) -
+                self.get_metric(before, name, **labels),
+                delta
+            )
+        queries = (
+            self.get_metric(after, 'api_db_queries_sum', action='create') -
+            self.get_metric(before, 'api_db_queries_sum', action='create')
+        )
+        self.assertGreater(queries, 0)
+
+    async def test_async_queries(self):
+        """
+        В асинхронной цепочке (долгий опрос) запросы к БД из потоков
+        sync_to_async тоже считаются
+        """
+        url = reverse('couriers-orders', args=[1])
+        await self.async_client.get(url)
+        response = await self.async_client.get(reverse('metrics'))
+        queries = self.get_metric(
+            response.content.decode(), 'api_db_queries_sum',
+            action='couriers-orders'
+        )
+        self.assertGreater(queries, 0)
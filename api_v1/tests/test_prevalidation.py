@@ -0,0 +1,139 @@
+from django.test import TestCase, override_settings
+from api_v1.prevalidation import INTERVAL_PATTERN, load_components
+from api_v1.serializers import CourierDataSerializer, OrderDataSerializer
+
+
+def order(order_id, **fields):
+    return {
+        'order_id': order_id,
+        'weight': 1.5,
+        'region': 1,
+        'delivery_hours': ['10:00-11:00'],
+        **fields,
+    }
+
+
+def courier(courier_id, **fields):
+    return {
+        'courier_id': courier_id,
+        'courier_type': 'car',
+        'regions': [1, 2],
+        'working_hours': ['09:00-18:00'],
+        **fields,
+    }
+
+
+INVALID_ORDERS = [
+    order(2, region='abc'),
+    order(3, region=0),
+    order(4, region=True),
+    order(5, weight=100),
+    order(6, weight='abc'),
+    order(7, weight=0.001),
+    order(8, delivery_hours=['9:00-10:00']),
+    order(9, delivery_hours=['12:00-11:00']),
+    order(10, delivery_hours=['25:00-26:00']),
+    order(11, delivery_hours='10:00-11:00'),
+    order(1),
+    order('x'),
+    {'order_id': 12, 'weight': 1},
+    order(13, expires_at='tomorrow'),
+    [],
+]
+
+INVALID_COURIERS = [
+    courier(2, courier_type='plane'),
+    courier(3, courier_type=['car']),
+    courier(4, regions=[1, -1]),
+    courier(5, regions=2),
+    courier(6, working_hours=[None]),
+    courier(1),
+    courier(0),
+    courier(True),
+    {'courier_id': 8},
+]
+
+
+class PrevalidationTests(TestCase):
+    """
+    Проверка списков скомпилированной схемой дает тот же результат, что и
+    сериализаторы DRF
+    """
+    def validate(self, serializer_class, data, prevalidation):
+        with override_settings(PREVALIDATION=prevalidation):
+            serializer = serializer_class(data={'data': data})
+            serializer.is_valid()
+        return serializer
+
+    def assertSameResult(self, serializer_class, data, describe):
+        fast = self.validate(serializer_class, data, True)
+        full = self.validate(serializer_class, data, False)
+        self.assertEqual(fast.errors, full.errors)
+        if not full.errors:
+            self.assertEqual(
+                [describe(item) for item in fast.validated_data['data']],
+                [describe(item) for item in full.validated_data['data']],
+            )
+        return full
+
+    def test_orders(self):
+        """
+        Корректные заказы и каждый вид ошибки вперемешку с корректными
+        """
+        def describe(item):
+            return (
+                item['id'], item['weight'], item['region'].pk,
+                [interval.interval for interval in item['delivery_hours']],
+                [interval.start for interval in item['delivery_hours']],
+                item.get('expires_at'),
+            )
+        valid = [
+            order(1, expires_at='2030-01-01T10:00:00Z'),
+            order(20, weight=50, region=7,
+                  delivery_hours=['00:00-23:59', '10:00-11:00']),
+            order(21, weight='2.5', region='4', delivery_hours=[]),
+        ]
+        self.assertSameResult(OrderDataSerializer, valid, describe)
+        for invalid in INVALID_ORDERS:
+            with self.subTest(invalid=invalid):
+                full = self.assertSameResult(
+                    OrderDataSerializer, valid + [invalid], describe
+                )
+                self.assertTrue(full.errors)
+
+    def test_couriers(self):
+        """
+        Корректные курьеры и каждый вид ошибки вперемешку с корректными
+        """
+        def describe(item):
+            return (
+                item['courier_id'], item['courier_type'],
+                [region.pk for region in item['regions']],
+                [interval.interval for interval in item['working_hours']],
+            )
+        valid = [
+            courier(1),
+            courier(20, courier_type='foot', regions=[], working_hours=[]),
+        ]
+        self.assertSameResult(CourierDataSerializer, valid, describe)
+        for invalid in INVALID_COURIERS:
+            with self.subTest(invalid=invalid):
+                full = self.assertSameResult(
+                    CourierDataSerializer, valid + [invalid], describe
+                )
+                self.assertTrue(full.errors)
+
+    def test_schema_constraints(self):
+        """
+        openapi.yaml содержит ограничения, добавленные хуком схемы
+        """
+        schemas = load_components()
+        courier_schema = schemas['CourierCreate']['properties']
+        self.assertEqual(courier_schema['regions']['items']['minimum'], 1)
+        self.assertEqual(
+            courier_schema['working_hours']['items']['pattern'],
+            INTERVAL_PATTERN
+        )
+        order_schema = schemas['OrderCreate']['properties']
+        self.assertEqual(order_schema['region']['minimum'], 1)
+        self.assertEqual(order_schema['weight']['type'], 'number')
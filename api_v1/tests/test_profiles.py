@@ -0,0 +1,115 @@
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api_v1.models import Courier
+from api_v1.profiles import ProfileCache, profiles
+
+
+class StubProfile:
+    def __init__(self, courier_id, version=0):
+        self.courier_id = courier_id
+        self.version = version
+
+
+class ProfileCacheTests(SimpleTestCase):
+    @override_settings(COURIER_CACHE_SIZE=2)
+    def test_lru(self):
+        """
+        Вытесняется давно не использованный профиль
+        """
+        cache = ProfileCache()
+        for courier_id in (1, 2):
+            cache.put(StubProfile(courier_id))
+        cache.get(1, 0)
+        cache.put(StubProfile(3))
+        self.assertIsNotNone(cache.get(1, 0))
+        self.assertIsNone(cache.get(2, 0))
+        self.assertIsNotNone(cache.get(3, 0))
+
+    def test_version(self):
+        """
+        Профиль другой версии не возвращается
+        """
+        cache = ProfileCache()
+        cache.put(StubProfile(1, version=1))
+        self.assertIsNone(cache.get(1, 2))
+
+    @override_settings(COURIER_CACHE_SIZE=0)
+    def test_disabled(self):
+        cache = ProfileCache()
+        cache.put(StubProfile(1))
+        self.assertEqual(len(cache), 0)
+
+
+class CourierProfileTests(APITestCase):
+    """
+    Тест использования профилей при назначении и изменении курьера
+    """
+    def setUp(self):
+        profiles.clear()
+        couriers = {'data': [{
+            'courier_id': 1,
+            'courier_type': 'foot',
+            'regions': [1, 2],
+            'working_hours': ['09:00-18:00'],
+        }]}
+        orders = {'data': [
+            {'order_id': 1, 'weight': 5, 'region': 1,
+             'delivery_hours': ['10:00-11:00']},
+            {'order_id': 2, 'weight': 5, 'region': 3,
+             'delivery_hours': ['10:00-11:00']},
+        ]}
+        self.client.post(reverse('couriers-list'), couriers, format='json')
+        self.client.post(reverse('orders-list'), orders, format='json')
+
+    def assign(self):
+        response = self.client.post(
+            reverse('orders-assign'), {'courier_id': 1}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [order['id'] for order in response.data['orders']]
+
+    def test_cached_profile(self):
+        """
+        Повторное назначение не читает районы и интервалы курьера
+        """
+        self.assign()
+        with CaptureQueriesContext(connection) as queries:
+            self.assign()
+        tables = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('api_v1_courier_regions', tables)
+        self.assertNotIn('api_v1_courier_working_hours', tables)
+
+    def test_patch_invalidates(self):
+        """
+        После PATCH назначение учитывает новые районы
+        """
+        self.assertEqual(self.assign(), [1])
+        response = self.client.patch(
+            reverse('couriers-detail', args=[1]), {'regions': [3]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Courier.objects.get().version, 1)
+        self.assertEqual(self.assign(), [2])
+        response = self.client.get(reverse('couriers-detail', args=[1]))
+        self.assertEqual(response.data['regions'], [3])
+
+    def test_changed_elsewhere(self):
+        """
+        Изменение в другом процессе обнаруживается по версии
+        """
+        self.assign()
+        courier = Courier.objects.get()
+        # Изменение через таблицу связей и queryset.update не отправляет
+        # сигналов, как и изменение в другом процессе
+        CourierRegion = Courier.regions.through
+        CourierRegion.objects.filter(courier=courier).delete()
+        CourierRegion.objects.bulk_create(
+            [CourierRegion(courier=courier, region_id=3)]
+        )
+        Courier.objects.update(version=5)
+        self.assertEqual(self.assign(), [2])
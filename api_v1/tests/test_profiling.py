@@ -0,0 +1,62 @@
+import json
+import tempfile
+from pathlib import Path
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api_v1.models import Courier
+
+
+class ProfilingTests(APITestCase):
+    """
+    Тест профилирования отдельных запросов
+    """
+    def setUp(self):
+        Courier.objects.create(courier_id=1, courier_type='foot')
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.directory = Path(temp_dir.name)
+        middleware = override_settings(
+            MIDDLEWARE=(
+                ['api_v1.profiling.ProfilingMiddleware'] +
+                settings.MIDDLEWARE
+            ),
+            PROFILING_DIR=temp_dir.name,
+            PROFILING_SAMPLE_RATE=0,
+            PROFILING_MAX_BYTES=10 ** 6,
+        )
+        middleware.enable()
+        self.addCleanup(middleware.disable)
+
+    def test_profile_by_header(self):
+        """
+        Запрос с заголовком профилируется вместе с SQL
+        """
+        url = reverse('couriers-detail', args=[1])
+        response = self.client.get(url, HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        [report_path] = self.directory.glob('*-retrieve-*.json')
+        self.assertTrue(report_path.with_suffix('.prof').exists())
+        report = json.loads(report_path.read_text())
+        self.assertEqual(report['status'], 200)
+        self.assertGreater(report['sql_count'], 0)
+        self.assertIn('api_v1_courier', report['sql'][0]['sql'])
+
+    def test_not_profiled(self):
+        """
+        Без заголовка и с нулевой долей запрос не профилируется
+        """
+        self.client.get(reverse('couriers-detail', args=[1]))
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+    def test_rotation(self):
+        """
+        Старые файлы удаляются при превышении размера каталога
+        """
+        with override_settings(PROFILING_MAX_BYTES=1):
+            self.client.get(
+                reverse('couriers-detail', args=[1]), HTTP_X_PROFILE='1'
+            )
+        self.assertEqual(list(self.directory.iterdir()), [])
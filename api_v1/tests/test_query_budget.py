@@ -0,0 +1,235 @@
+import sys
+from datetime import timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api_v1.models import Courier, Order, AssignedOrder, Region, TimeInterval
+
+# Размеры данных, на которых проверяется число запросов. Больше 100
+# элементов bulk_create в SQLite делится на пачки (до 999 параметров на
+# запрос), и запросов становится больше
+SIZES = (1, 10, 100)
+
+# Число SQL-запросов каждого endpoint при любом размере из SIZES - столько
+# же, сколько для одного элемента: рост означает N+1.
+# Создание курьеров и заказов, назначение, выполнение и PATCH идут
+# в транзакции (в тестах это SAVEPOINT и RELEASE), кроме создания -
+# с записью в журнал событий (INSERT события), назначение повторно
+# выбирает свободные заказы с блокировкой строк. Сводка по районам
+# (api_v1.supply) в тестах выключена.
+QUERY_BUDGETS = {
+    'couriers-create': 9,
+    'orders-create': 8,
+    'couriers-update': 19,
+    'couriers-retrieve': 5,
+    'orders-assign': 12,
+    'orders-complete': 8,
+}
+# На PostgreSQL запись события добавляет запрос advisory-блокировки
+# (api_v1.events)
+EVENT_ENDPOINTS = ('couriers-update', 'orders-assign', 'orders-complete')
+
+
+def interval_string(number):
+    """
+    Уникальный корректный интервал "HH:MM-HH:MM" для номера < 1440
+    """
+    hours, minutes = divmod(number, 60)
+    return f'{hours:02}:{minutes:02}-23:59'
+
+
+class QueryBudgetTests(APITestCase):
+    """
+    Проверка, что число SQL-запросов каждого endpoint не растет с числом
+    элементов. Фактические значения выводятся после прогона.
+    """
+    counts = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        lines = ['', 'SQL queries per request:']
+        for name, counts in sorted(cls.counts.items()):
+            sizes = ', '.join(
+                f'{size}: {count}' for size, count in sorted(counts.items())
+            )
+            lines.append(
+                f'  {name} ({sizes}), budget {cls.budget(name)}'
+            )
+        sys.stderr.write('\n'.join(lines) + '\n')
+
+    @staticmethod
+    def budget(name):
+        extra = connection.vendor == 'postgresql' and name in EVENT_ENDPOINTS
+        return QUERY_BUDGETS[name] + extra
+
+    def assertQueryBudget(self, name, size, request):
+        """
+        Выполняет запрос и проверяет число SQL-запросов
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        count = len(queries)
+        self.counts.setdefault(name, {})[size] = count
+        self.assertEqual(
+            count, self.budget(name),
+            f'{name} with {size} items made {count} queries, '
+            f'budget is {self.budget(name)}'
+        )
+        return response
+
+    def make_courier(self, courier_id, region_ids, intervals):
+        Region.objects.bulk_create(
+            [Region(region_id=i) for i in region_ids], ignore_conflicts=True
+        )
+        courier = Courier.objects.create(
+            courier_id=courier_id, courier_type='car'
+        )
+        courier.regions.set(region_ids)
+        courier.working_hours.set(intervals)
+        return courier
+
+    def make_orders(self, first_id, size, region_id, interval):
+        Region.objects.get_or_create(region_id=region_id)
+        orders = Order.objects.bulk_create(
+            Order(id=first_id + i, weight=1, region_id=region_id)
+            for i in range(size)
+        )
+        OrderInterval = Order.delivery_hours.through
+        OrderInterval.objects.bulk_create(
+            OrderInterval(order_id=order.pk, timeinterval_id=interval.pk)
+            for order in orders
+        )
+        return orders
+
+    def make_completed(self, courier, orders):
+        assign_time = timezone.now() - timedelta(days=1)
+        AssignedOrder.objects.bulk_create(
+            AssignedOrder(
+                courier=courier,
+                order=order,
+                assign_time=assign_time,
+                complete_time=assign_time + timedelta(minutes=10),
+                delivery_time=timedelta(minutes=10),
+                is_competed=True,
+                payment=1000,
+            )
+            for order in orders
+        )
+
+    def setUp(self):
+        self.interval = TimeInterval.objects.create(interval='09:00-18:00')
+
+    def test_create_couriers(self):
+        for size in SIZES:
+            first_id = size * 10000
+            data = {'data': [
+                {
+                    'courier_id': first_id + i,
+                    'courier_type': 'bike',
+                    'regions': [size, size + 1],
+                    'working_hours': [
+                        interval_string(i % 1440), '09:00-18:00'
+                    ],
+                } for i in range(size)
+            ]}
+            response = self.assertQueryBudget(
+                'couriers-create', size, lambda: self.client.post(
+                    reverse('couriers-list'), data, format='json'
+                )
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(len(response.data['couriers']), size)
+
+    def test_create_orders(self):
+        for size in SIZES:
+            first_id = size * 10000
+            data = {'data': [
+                {
+                    'order_id': first_id + i,
+                    'weight': 1.5,
+                    'region': size + i % 10,
+                    'delivery_hours': [interval_string(i % 1440)],
+                } for i in range(size)
+            ]}
+            response = self.assertQueryBudget(
+                'orders-create', size, lambda: self.client.post(
+                    reverse('orders-list'), data, format='json'
+                )
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(len(response.data['orders']), size)
+
+    def test_update_courier(self):
+        for size in SIZES:
+            courier = self.make_courier(size, [size], [self.interval])
+            orders = self.make_orders(size * 10000, size, size, self.interval)
+            AssignedOrder.objects.bulk_create(
+                AssignedOrder(
+                    courier=courier, order=order, assign_time=timezone.now()
+                )
+                for order in orders
+            )
+            data = {
+                'regions': list(range(size * 10000, size * 10000 + size)),
+                'working_hours': ['07:00-08:00', '20:00-21:00'],
+            }
+            response = self.assertQueryBudget(
+                'couriers-update', size, lambda: self.client.patch(
+                    reverse('couriers-detail', args=[size]),
+                    data, format='json'
+                )
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertFalse(courier.assigned_orders.exists())
+
+    def test_courier_info(self):
+        for size in SIZES:
+            courier = self.make_courier(size, [size], [self.interval])
+            orders = self.make_orders(size * 10000, size, size, self.interval)
+            self.make_completed(courier, orders)
+            response = self.assertQueryBudget(
+                'couriers-retrieve', size, lambda: self.client.get(
+                    reverse('couriers-detail', args=[size])
+                )
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['earnings'], 1000 * size)
+
+    def test_assign(self):
+        for size in SIZES:
+            self.make_courier(size, [size], [self.interval])
+            self.make_orders(size * 10000, size, size, self.interval)
+            response = self.assertQueryBudget(
+                'orders-assign', size, lambda: self.client.post(
+                    reverse('orders-assign'), {'courier_id': size},
+                    format='json'
+                )
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data['orders']), size)
+
+    def test_complete(self):
+        for size in SIZES:
+            courier = self.make_courier(size, [size], [self.interval])
+            orders = self.make_orders(size * 10000, size + 1, size,
+                                      self.interval)
+            self.make_completed(courier, orders[1:])
+            AssignedOrder.objects.create(
+                courier=courier, order=orders[0],
+                assign_time=timezone.now() - timedelta(hours=1),
+            )
+            data = {
+                'courier_id': size,
+                'order_id': orders[0].pk,
+                'complete_time': timezone.now().isoformat(),
+            }
+            response = self.assertQueryBudget(
+                'orders-complete', size, lambda: self.client.post(
+                    reverse('orders-complete'), data, format='json'
+                )
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
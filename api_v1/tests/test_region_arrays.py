@@ -0,0 +1,91 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api_v1.arrays import int_array_contains, pack_ints
+from api_v1.models import Courier, Region
+
+
+class IntArrayTests(SimpleTestCase):
+    def test_contains(self):
+        """
+        Проверка вхождения всех чисел в упакованный массив
+        """
+        packed = pack_ints([1, 12, 22])
+        self.assertTrue(int_array_contains(packed, pack_ints([12])))
+        self.assertTrue(int_array_contains(packed, pack_ints([1, 22])))
+        self.assertFalse(int_array_contains(packed, pack_ints([2])))
+        self.assertFalse(int_array_contains('', pack_ints([1])))
+
+
+@override_settings(REGION_STORAGE='array')
+class RegionArrayTests(APITestCase):
+    """
+    Тест хранения районов курьера массивом
+    """
+    def setUp(self):
+        couriers = {'data': [
+            {'courier_id': 1, 'courier_type': 'foot', 'regions': [22, 1, 12],
+             'working_hours': ['09:00-14:00']},
+            {'courier_id': 2, 'courier_type': 'car', 'regions': [2],
+             'working_hours': ['09:00-14:00']},
+        ]}
+        orders = {'data': [
+            {'order_id': 1, 'weight': 5, 'region': 12,
+             'delivery_hours': ['10:00-12:00']},
+            {'order_id': 2, 'weight': 5, 'region': 2,
+             'delivery_hours': ['10:00-12:00']},
+        ]}
+        response = self.client.post(
+            reverse('couriers-list'), couriers, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(
+            reverse('orders-list'), orders, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_stored_as_array(self):
+        """
+        Районы хранятся в поле курьера, связи с Region не создаются
+        """
+        self.assertEqual(Courier.objects.get(pk=1).region_ids, [1, 12, 22])
+        self.assertFalse(Courier.regions.through.objects.exists())
+        self.assertEqual(Region.objects.count(), 4)
+        self.assertEqual(
+            list(Courier.objects.serving_region(12).values_list(
+                'pk', flat=True
+            )),
+            [1]
+        )
+
+    def test_assign_update_info(self):
+        """
+        Назначение и снятие заказов по массиву районов
+        """
+        response = self.client.post(
+            reverse('orders-assign'), {'courier_id': 1}, format='json'
+        )
+        self.assertEqual(response.data['orders'], [{'id': 1}])
+        response = self.client.patch(
+            reverse('couriers-detail', args=[1]), {'regions': [5, 1]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['regions'], [1, 5])
+        self.assertFalse(Courier.objects.get(pk=1).assigned_orders.exists())
+        response = self.client.get(reverse('couriers-detail', args=[2]))
+        self.assertEqual(response.data['regions'], [2])
+
+    def test_fill_region_ids(self):
+        """
+        Перенос районов из M2M-связи в массив
+        """
+        courier = Courier.objects.get(pk=2)
+        courier.region_ids = []
+        courier.save()
+        courier.regions.set([Region.objects.get(pk=2)])
+        call_command('fill_region_ids', stdout=StringIO())
+        self.assertEqual(Courier.objects.get(pk=2).region_ids, [2])
@@ -0,0 +1,44 @@
+from django.test import RequestFactory, SimpleTestCase
+from drf_spectacular.generators import SchemaGenerator
+from slasty.schema import schema_view, swagger_view
+
+
+class StaticSchemaTests(SimpleTestCase):
+    """
+    Тест отдачи заранее сгенерированной схемы (профиль API_ONLY)
+    """
+    def test_schema_from_file(self):
+        """
+        Схема отдается из файла openapi.yaml
+        """
+        response = schema_view(RequestFactory().get('/schema/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(b'openapi: '))
+
+    def test_swagger_page(self):
+        """
+        Страница swagger ссылается на схему
+        """
+        response = swagger_view(RequestFactory().get('/docs'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'/schema/', response.content)
+
+
+class QueryParametersSchemaTests(SimpleTestCase):
+    """
+    Параметры запроса из query_serializer_class попадают в схему
+    """
+    def operation_parameters(self, path):
+        schema = SchemaGenerator().get_schema(request=None, public=True)
+        return {
+            parameter['name']: parameter
+            for parameter in schema['paths'][path]['get']['parameters']
+        }
+
+    def test_events(self):
+        parameters = self.operation_parameters('/events')
+        self.assertEqual(set(parameters), {'after', 'limit'})
+        self.assertEqual(parameters['limit']['schema']['minimum'], 1)
+
+    def test_supply(self):
+        self.assertEqual(set(self.operation_parameters('/supply')), {'region'})
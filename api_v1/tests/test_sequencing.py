@@ -0,0 +1,63 @@
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api_v1.sequencing import deadline
+
+
+class DeadlineTests(SimpleTestCase):
+    """
+    Срок доставки - конец самого раннего пересечения с часами работы
+    """
+    def test_intersection(self):
+        self.assertEqual(
+            deadline([(600, 900), (60, 120)], [(540, 720)]), (720, 600)
+        )
+
+    def test_no_intersection(self):
+        """
+        Без пересечения берется самое раннее окно доставки
+        """
+        self.assertEqual(
+            deadline([(600, 900), (60, 120)], [(0, 30)]), (120, 60)
+        )
+
+
+class SequencingTests(APITestCase):
+    """
+    Порядок доставки в ответе /orders/assign и GET /couriers/{id}/orders
+    """
+    def check_order(self):
+        self.client.post(reverse('couriers-list'), {'data': [{
+            'courier_id': 1,
+            'courier_type': 'car',
+            'regions': [1, 2],
+            'working_hours': ['09:00-18:00'],
+        }]}, format='json')
+        self.client.post(reverse('orders-list'), {'data': [
+            {'order_id': 1, 'weight': 1, 'region': 2,
+             'delivery_hours': ['09:00-10:00']},
+            {'order_id': 2, 'weight': 1, 'region': 1,
+             'delivery_hours': ['15:00-17:00']},
+            {'order_id': 3, 'weight': 1, 'region': 1,
+             'delivery_hours': ['08:00-23:00']},
+            {'order_id': 4, 'weight': 1, 'region': 2,
+             'delivery_hours': ['12:00-13:00']},
+        ]}, format='json')
+        response = self.client.post(
+            reverse('orders-assign'), {'courier_id': 1}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = [{'id': 1}, {'id': 4}, {'id': 2}, {'id': 3}]
+        self.assertEqual(response.data['orders'], expected)
+        response = self.client.get(
+            reverse('couriers-orders', args=[1])
+        )
+        self.assertEqual(response.json()['orders'], expected)
+
+    def test_m2m(self):
+        self.check_order()
+
+    @override_settings(INTERVAL_STORAGE='inline', REGION_STORAGE='array')
+    def test_inline(self):
+        self.check_order()
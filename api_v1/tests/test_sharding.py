@@ -0,0 +1,244 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.db import DatabaseError, connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api_v1 import serializers
+from api_v1.models import ArchivedOrder, AssignedOrder, Order
+from api_v1.serializers import OrderDataSerializer
+from api_v1.sharding import NoShardSelected, shard_for_region, use_shard
+
+SHARDS = ['shard_1', 'shard_2']
+sharded = override_settings(
+    DATABASE_SHARDS=SHARDS,
+    DATABASE_ROUTERS=['api_v1.db_routers.ShardRouter'],
+)
+
+
+class ShardDatabasesMixin:
+    """
+    Создает шарды - базы SQLite в памяти - только на время тестов класса,
+    остальные тесты работают с одной 'default'. Тестовый раннер создает
+    базы из атрибута databases до запуска тестов, поэтому шарды
+    добавляются в него здесь
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.databases = {'default', *SHARDS}
+        for alias in SHARDS:
+            connections.databases[alias] = {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+            }
+            with sharded:
+                connections[alias].creation.create_test_db(
+                    verbosity=0, serialize=False
+                )
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for alias in SHARDS:
+            connections[alias].creation.destroy_test_db(
+                ':memory:', verbosity=0
+            )
+            del connections[alias]
+            del connections.databases[alias]
+
+
+@sharded
+class ShardingTests(ShardDatabasesMixin, APITestCase):
+    """
+    Заказы в двух шардах SQLite: район 2 - shard_1, район 1 - shard_2
+    """
+
+    def setUp(self):
+        self.client.post(reverse('couriers-list'), {'data': [
+            {'courier_id': 1, 'courier_type': 'car', 'regions': [1, 2],
+             'working_hours': ['09:00-18:00']},
+            {'courier_id': 2, 'courier_type': 'car', 'regions': [2],
+             'working_hours': ['09:00-18:00']},
+        ]}, format='json')
+        response = self.client.post(reverse('orders-list'), {'data': [
+            {'order_id': 1, 'weight': 1, 'region': 1,
+             'delivery_hours': ['10:00-11:00']},
+            {'order_id': 2, 'weight': 1, 'region': 2,
+             'delivery_hours': ['09:00-10:00']},
+            {'order_id': 3, 'weight': 1, 'region': 1,
+             'delivery_hours': ['12:00-13:00']},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            response.data['orders'], [{'id': 1}, {'id': 2}, {'id': 3}]
+        )
+
+    def order_ids(self, alias):
+        return list(
+            Order.objects.using(alias).order_by('pk')
+            .values_list('pk', flat=True)
+        )
+
+    def assign(self, courier_id):
+        return self.client.post(
+            reverse('orders-assign'), {'courier_id': courier_id},
+            format='json'
+        )
+
+    def test_create(self):
+        """
+        Заказы пишутся в шард района, id уникальны по всем шардам
+        """
+        self.assertEqual(shard_for_region(1), 'shard_2')
+        self.assertEqual(self.order_ids('shard_1'), [2])
+        self.assertEqual(self.order_ids('shard_2'), [1, 3])
+        self.assertEqual(self.order_ids('default'), [])
+        response = self.client.post(reverse('orders-list'), {'data': [
+            {'order_id': 1, 'weight': 1, 'region': 2,
+             'delivery_hours': ['10:00-11:00']},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_assign_region_shards(self):
+        """
+        Назначение обращается только к шардам районов курьера
+        """
+        with CaptureQueriesContext(connections['shard_2']) as queries:
+            response = self.assign(2)
+        self.assertEqual(response.data['orders'], [{'id': 2}])
+        self.assertEqual(len(queries), 0)
+        self.assertTrue(
+            Order.objects.using('shard_1').get(pk=2).is_assigned
+        )
+        self.assertTrue(
+            AssignedOrder.objects.using('shard_1').filter(pk=2).exists()
+        )
+
+    def test_courier_flow(self):
+        """
+        Назначение, выполнение, список заказов, карточка и PATCH курьера
+        работают с заказами из разных шардов
+        """
+        response = self.assign(1)
+        self.assertEqual(
+            response.data['orders'], [{'id': 2}, {'id': 1}, {'id': 3}]
+        )
+        response = self.client.get(reverse('couriers-orders', args=[1]))
+        self.assertEqual(
+            response.json()['orders'], [{'id': 2}, {'id': 1}, {'id': 3}]
+        )
+        assign_time = AssignedOrder.objects.using('shard_1').get(
+            pk=2
+        ).assign_time
+
+        # Предыдущий заказ для заказа 1 выполнен в другом шарде
+        for order_id, hours in ((2, 1), (1, 3)):
+            response = self.client.post(reverse('orders-complete'), {
+                'courier_id': 1,
+                'order_id': order_id,
+                'complete_time': assign_time + timedelta(hours=hours),
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        completed = AssignedOrder.objects.using('shard_2').get(pk=1)
+        self.assertEqual(completed.delivery_time, timedelta(hours=2))
+
+        response = self.client.get(reverse('couriers-detail', args=[1]))
+        self.assertEqual(response.data['earnings'], 2 * 500 * 9)
+
+        response = self.client.patch(
+            reverse('couriers-detail', args=[1]), {'regions': [2]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(
+            Order.objects.using('shard_2').get(pk=3).is_assigned
+        )
+        self.assertFalse(
+            AssignedOrder.objects.using('shard_2').filter(pk=3).exists()
+        )
+
+    def test_commands(self):
+        """
+        Архивация и просрочка обрабатывают каждый шард
+        """
+        self.assign(2)
+        assign_time = AssignedOrder.objects.using('shard_1').get(
+            pk=2
+        ).assign_time
+        self.client.post(reverse('orders-complete'), {
+            'courier_id': 2,
+            'order_id': 2,
+            'complete_time': assign_time + timedelta(hours=1),
+        }, format='json')
+        Order.objects.using('shard_2').filter(pk=3).update(
+            expires_at=assign_time
+        )
+        Order.objects.using('shard_2').filter(pk=1).update(
+            delivery_ranges=[]
+        )
+        call_command('archive_assignments', days=-1, stdout=StringIO())
+        call_command('expire_orders', stdout=StringIO())
+        call_command('fill_time_ranges', stdout=StringIO())
+        self.assertTrue(
+            ArchivedOrder.objects.using('shard_1').filter(pk=2).exists()
+        )
+        self.assertTrue(Order.objects.using('shard_2').get(pk=3).is_expired)
+        self.assertEqual(
+            Order.objects.using('shard_2').get(pk=1).delivery_ranges,
+            [(600, 660)]
+        )
+
+    def test_outside_shard(self):
+        """
+        Запрос к заказам вне шарда - ошибка, а не чтение из 'default'
+        """
+        with self.assertRaises(NoShardSelected):
+            Order.objects.count()
+        with use_shard('shard_2'):
+            order = Order.objects.get(pk=1)
+        # Загруженный заказ остается в своем шарде
+        self.assertEqual(
+            [interval.interval for interval in order.delivery_hours.all()],
+            ['10:00-11:00']
+        )
+
+    def test_tables(self):
+        """
+        В шардах только таблицы заказов и таблицы, на которые они
+        ссылаются
+        """
+        tables = set(connections['shard_1'].introspection.table_names())
+        self.assertLessEqual({
+            'api_v1_order', 'api_v1_order_delivery_hours',
+            'api_v1_assignedorder', 'api_v1_archivedorder',
+            'api_v1_region', 'api_v1_timeinterval',
+        }, tables)
+        self.assertNotIn('api_v1_orderevent', tables)
+        self.assertNotIn('django_content_type', tables)
+
+
+@sharded
+class ShardTransactionTests(ShardDatabasesMixin, TransactionTestCase):
+    """
+    Запись в шард идет в транзакции шарда
+    """
+
+    def test_create_rolled_back(self):
+        """
+        Ошибка при создании заказов откатывает и заказы в шарде
+        """
+        serializer = OrderDataSerializer(data={'data': [
+            {'order_id': 1, 'weight': 1, 'region': 2,
+             'delivery_hours': ['10:00-11:00']},
+        ]})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with mock.patch.object(
+            serializers, 'save_intervals', side_effect=DatabaseError
+        ), self.assertRaises(DatabaseError):
+            serializer.save()
+        self.assertFalse(Order.objects.using('shard_1').exists())
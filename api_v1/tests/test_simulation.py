@@ -0,0 +1,101 @@
+import json
+import re
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from api_v1.eligibility import order_condition, order_fits
+from api_v1.models import Courier, Order
+from api_v1.serializers import OrderAssignSerializer
+from api_v1.simulation import load_couriers, load_orders, simulate
+
+
+class SimulationTests(TestCase):
+    """
+    Пробное назначение совпадает с настоящим и ничего не пишет в БД
+    """
+    def compare_with_assign(self):
+        call_command(
+            'generate_dataset', seed=3, couriers=30, orders=600,
+            regions=5, batch_size=100, stdout=StringIO()
+        )
+        courier_ids = list(
+            Courier.objects.order_by('-pk').values_list('pk', flat=True)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            result = simulate(load_couriers(courier_ids), load_orders())
+        # На PostgreSQL iterator() читает через серверный курсор DECLARE
+        self.assertTrue(all(
+            re.match(r'(DECLARE .+? FOR )?SELECT ', query['sql'])
+            for query in queries.captured_queries
+        ))
+        self.assertEqual(result['couriers'], 30)
+        self.assertTrue(result['covered_orders'])
+
+        assigned = {}
+        for courier_id in courier_ids:
+            serializer = OrderAssignSerializer(
+                data={'courier_id': courier_id}
+            )
+            serializer.is_valid(raise_exception=True)
+            assigned[courier_id] = len(serializer.save()['orders'])
+        self.assertEqual(result['orders_by_courier'], assigned)
+        self.assertEqual(
+            result['pending_orders'] - result['covered_orders'],
+            Order.objects.filter(is_assigned=False).count()
+        )
+
+    def test_m2m(self):
+        self.compare_with_assign()
+
+    @override_settings(INTERVAL_STORAGE='inline', REGION_STORAGE='array')
+    def test_inline(self):
+        self.compare_with_assign()
+
+    def compare_rules(self):
+        call_command(
+            'generate_dataset', seed=5, couriers=10, orders=200,
+            regions=4, batch_size=100, stdout=StringIO()
+        )
+        orders = {
+            order_id: (region_id, weight, ranges)
+            for region_id, (_, entries) in load_orders().items()
+            for weight, order_id, ranges in entries
+        }
+        matched = 0
+        for courier in Courier.objects.all():
+            profile = courier.profile
+            fitting = {
+                order_id
+                for order_id, order in orders.items()
+                if order_fits(profile, *order)
+            }
+            self.assertEqual(set(
+                Order.objects.live().filter(order_condition(profile))
+                .values_list('pk', flat=True)
+            ), fitting)
+            matched += len(fitting)
+        self.assertTrue(matched)
+
+    def test_rules_m2m(self):
+        """
+        Условие запроса и проверка в памяти отбирают одни и те же заказы
+        """
+        self.compare_rules()
+
+    @override_settings(INTERVAL_STORAGE='inline', REGION_STORAGE='array')
+    def test_rules_inline(self):
+        self.compare_rules()
+
+    def test_command(self):
+        call_command(
+            'generate_dataset', seed=1, couriers=10, orders=100,
+            regions=3, batch_size=100, stdout=StringIO()
+        )
+        out = StringIO()
+        call_command(
+            'simulate_assignment', couriers=[1, 2, 3], json=True, stdout=out
+        )
+        result = json.loads(out.getvalue())
+        self.assertEqual(list(result['orders_by_courier']), ['1', '2', '3'])
@@ -0,0 +1,50 @@
+from unittest import mock
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from api_v1.models import Courier
+from api_v1.slow_queries import RateLimiter
+
+
+@override_settings(
+    MIDDLEWARE=(
+        ['api_v1.slow_queries.SlowQueryLogMiddleware'] + settings.MIDDLEWARE
+    ),
+    SLOW_QUERY_MS=0.000001,
+)
+class SlowQueryLogTests(APITestCase):
+    """
+    Тест журнала медленных запросов
+    """
+    def test_slow_query_logged(self):
+        """
+        Запросы дольше порога пишутся в лог с действием DRF
+        """
+        Courier.objects.create(courier_id=1, courier_type='foot')
+        with self.assertLogs('api_v1.slow_queries', 'WARNING') as logs:
+            self.client.get(reverse('couriers-detail', args=[1]))
+        self.assertIn('in retrieve on default', logs.output[0])
+        self.assertIn('api_v1_courier', logs.output[0])
+
+    def test_fast_query_not_logged(self):
+        """
+        Запросы быстрее порога не логируются
+        """
+        with override_settings(SLOW_QUERY_MS=10 ** 6):
+            with mock.patch('api_v1.slow_queries.logger') as logger:
+                self.client.get(reverse('couriers-detail', args=[1]))
+        logger.warning.assert_not_called()
+
+
+class RateLimiterTests(SimpleTestCase):
+    def test_limit(self):
+        """
+        Не больше limit событий за период
+        """
+        limiter = RateLimiter(limit=2, period=60)
+        self.assertEqual(
+            [limiter.allow() for _ in range(3)], [True, True, False]
+        )
+        limiter.window_start -= 60
+        self.assertTrue(limiter.allow())
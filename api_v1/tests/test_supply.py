@@ -0,0 +1,175 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api_v1 import serializers
+from api_v1.models import AssignedOrder, Order, OrderEvent, RegionSlot
+from api_v1.serializers import CompleteOrderSerializer
+
+
+@override_settings(SUPPLY_ROLLUP=1)
+class SupplyTests(APITestCase):
+    """
+    Сводка спроса и предложения по районам обновляется приращениями и
+    совпадает с пересчетом rebuild_supply
+    """
+    def setUp(self):
+        self.client.post(reverse('couriers-list'), {'data': [
+            {'courier_id': 1, 'courier_type': 'car', 'regions': [1, 2],
+             'working_hours': ['09:00-11:00']},
+            {'courier_id': 2, 'courier_type': 'foot', 'regions': [1],
+             'working_hours': ['10:30-11:00']},
+        ]}, format='json')
+        self.client.post(reverse('orders-list'), {'data': [
+            {'order_id': 1, 'weight': 1.5, 'region': 1,
+             'delivery_hours': ['10:00-10:30']},
+            {'order_id': 2, 'weight': 2, 'region': 1,
+             'delivery_hours': ['09:30-11:00']},
+            {'order_id': 3, 'weight': 0.25, 'region': 3,
+             'delivery_hours': ['12:00-13:00'],
+             'expires_at': timezone.now() - timedelta(minutes=1)},
+        ]}, format='json')
+
+    def get_supply(self, **params):
+        response = self.client.get(reverse('supply'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {
+            (row['region'], row['slot']): (
+                row['orders'], row['weight'], row['assigned'],
+                row['couriers']
+            )
+            for row in response.json()['slots']
+        }
+
+    def assertRebuildMatches(self):
+        rows = self.get_supply()
+        call_command('rebuild_supply', stdout=StringIO())
+        self.assertEqual(self.get_supply(), rows)
+
+    def test_lifecycle(self):
+        """
+        Создание, назначение, выполнение, PATCH и истечение срока
+        """
+        self.assertEqual(self.get_supply(), {
+            (1, '09:00-10:00'): (1, 2.0, 0, 1),
+            (1, '10:00-11:00'): (2, 3.5, 0, 2),
+            (2, '09:00-10:00'): (0, 0.0, 0, 1),
+            (2, '10:00-11:00'): (0, 0.0, 0, 1),
+            (3, '12:00-13:00'): (1, 0.25, 0, 0),
+        })
+        self.assertRebuildMatches()
+
+        self.client.post(
+            reverse('orders-assign'), {'courier_id': 1}, format='json'
+        )
+        self.assertEqual(self.get_supply(region='1'), {
+            (1, '09:00-10:00'): (0, 0.0, 1, 1),
+            (1, '10:00-11:00'): (0, 0.0, 2, 2),
+        })
+        self.assertRebuildMatches()
+
+        assign_time = AssignedOrder.objects.get(pk=1).assign_time
+        self.client.post(reverse('orders-complete'), {
+            'courier_id': 1,
+            'order_id': 1,
+            'complete_time': assign_time + timedelta(minutes=10),
+        }, format='json')
+        self.assertEqual(self.get_supply(region='1')[1, '10:00-11:00'],
+                         (0, 0.0, 1, 2))
+        self.assertRebuildMatches()
+
+        # Заказы снимаются с курьера и снова становятся свободными
+        self.client.patch(
+            reverse('couriers-detail', args=[1]),
+            {'regions': [2], 'working_hours': ['18:00-19:00']},
+            format='json'
+        )
+        self.assertEqual(self.get_supply(region='1,2'), {
+            (1, '09:00-10:00'): (1, 2.0, 0, 0),
+            (1, '10:00-11:00'): (2, 3.5, 0, 1),
+            (2, '18:00-19:00'): (0, 0.0, 0, 1),
+        })
+        self.assertRebuildMatches()
+
+        call_command('expire_orders', stdout=StringIO())
+        self.assertEqual(self.get_supply(region='3'), {})
+        self.assertRebuildMatches()
+
+    def test_rebuild_fixes_drift(self):
+        """
+        Команда заменяет испорченную сводку пересчитанной
+        """
+        expected = self.get_supply()
+        RegionSlot.objects.filter(region_id=1).update(open_orders=100)
+        RegionSlot.objects.create(region_id=50, slot=3, couriers=7)
+        call_command('rebuild_supply', stdout=StringIO())
+        self.assertEqual(self.get_supply(), expected)
+
+    def test_assign_skips_taken_orders(self):
+        """
+        Заказ, назначенный другому курьеру после выборки, не назначается
+        повторно и не меняет сводку дважды
+        """
+        sequence = serializers.sequence
+
+        def take_order(orders, *args):
+            Order.objects.filter(pk=1).update(is_assigned=True)
+            return sequence(orders, *args)
+
+        with mock.patch.object(serializers, 'sequence', take_order):
+            response = self.client.post(
+                reverse('orders-assign'), {'courier_id': 1}, format='json'
+            )
+        self.assertEqual(response.json()['orders'], [{'id': 2}])
+        self.assertFalse(AssignedOrder.objects.filter(pk=1).exists())
+        self.assertEqual(OrderEvent.objects.get().order_ids, [2])
+        self.assertEqual(self.get_supply(region='1')[1, '10:00-11:00'],
+                         (1, 1.5, 1, 2))
+
+    def test_complete_once(self):
+        """
+        Повторное выполнение заказа не меняет сводку и не пишет событие
+        """
+        self.client.post(
+            reverse('orders-assign'), {'courier_id': 1}, format='json'
+        )
+        assigned_order = AssignedOrder.objects.select_related('order').get(
+            pk=1
+        )
+        complete_time = assigned_order.assign_time + timedelta(minutes=10)
+        self.assertTrue(CompleteOrderSerializer.complete(
+            1, 1, complete_time, assigned_order
+        ))
+        expected = self.get_supply()
+        self.assertFalse(CompleteOrderSerializer.complete(
+            1, 1, complete_time, assigned_order
+        ))
+        self.assertEqual(self.get_supply(), expected)
+        self.assertEqual(
+            OrderEvent.objects.filter(kind=OrderEvent.Kind.COMPLETED).count(),
+            1
+        )
+        self.assertRebuildMatches()
+
+    def test_invalid_region(self):
+        """
+        Некорректный список районов - 400, запись - 405
+        """
+        response = self.client.get(reverse('supply'), {'region': '1,x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('supply'))
+        self.assertEqual(
+            response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+
+
+@override_settings(INTERVAL_STORAGE='inline', REGION_STORAGE='array')
+class InlineSupplyTests(SupplyTests):
+    """
+    То же при хранении интервалов и районов в строках курьеров и заказов
+    """
@@ -1,6 +1,7 @@
 from django.urls import include, path
 from rest_framework import routers
 from . import views
+from .metrics import metrics_view
 
 
 router = routers.DefaultRouter(trailing_slash=False)
@@ -8,5 +9,12 @@ router.register(r'couriers', views.CouriersViewSet, basename='couriers')
 router.register(r'orders', views.OrdersViewSet, basename='orders')
 
 urlpatterns = [
+    path('metrics', metrics_view, name='metrics'),
+    path(
+        'couriers/<int:courier_id>/orders', views.courier_orders,
+        name='couriers-orders'
+    ),
+    path('events', views.OrderEventsView.as_view(), name='events'),
+    path('supply', views.SupplyView.as_view(), name='supply'),
     path('', include(router.urls)),
 ]
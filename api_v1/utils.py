@@ -0,0 +1,74 @@
+import asyncio
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.deprecation import MiddlewareMixin
+
+# Обертки запросов к БД текущего HTTP-запроса. Контекст копируется в потоки
+# sync_to_async, поэтому обертки действуют и на запросы асинхронных
+# представлений и не смешиваются между параллельными запросами
+_wrappers = ContextVar('execute_wrappers', default=())
+
+
+def request_action(request, with_basename=False):
+    """
+    Возвращает название действия DRF (create, assign, retrieve...) для
+    запроса, для остальных представлений - имя url, для ненайденных -
+    'unmatched'. Используется для меток метрик и логов.
+    with_basename добавляет к действию имя ViewSet: "orders-create"
+    (ключи ADMISSION_LIMITS).
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    actions = getattr(match.func, 'actions', None)
+    if actions:
+        action = actions.get(request.method.lower())
+        if action is None:
+            return match.url_name
+        if with_basename:
+            return f"{match.func.initkwargs['basename']}-{action}"
+        return action
+    return match.url_name or 'unnamed'
+
+
+def _execute(execute, sql, params, many, context):
+    for wrapper in reversed(_wrappers.get()):
+        execute = functools.partial(wrapper, execute)
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def _install(sender=None, connection=None, **kwargs):
+    if _execute not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _execute)
+
+
+@contextmanager
+def wrap_connections(wrapper):
+    """
+    Оборачивает execute_wrapper-ом wrapper запросы ко всем БД, сделанные
+    внутри блока в этом контексте, в том числе из потоков sync_to_async
+    """
+    for connection in connections.all():
+        _install(connection=connection)
+    token = _wrappers.set(_wrappers.get() + (wrapper,))
+    try:
+        yield
+    finally:
+        _wrappers.reset(token)
+
+
+class AsyncCapableMiddleware(MiddlewareMixin):
+    """
+    Middleware для синхронной и асинхронной цепочки без перехода в поток.
+    MiddlewareMixin отмечает экземпляр корутиной в асинхронной цепочке,
+    запрос обрабатывают call и __acall__ наследника
+    """
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return self.call(request)
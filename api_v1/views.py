@@ -1,10 +1,20 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotAllowed
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from rest_framework import viewsets, status
+from rest_framework import generics, serializers, viewsets, status
+from . import events, supply
+from .idempotency import idempotent
+from .longpoll import watcher
 from .models import Courier, Order
+from .renderers import ORJSONRenderer
 from .serializers import (
     CourierDataSerializer, CourierUpdateSerializer, OrderDataSerializer,
     OrderAssignSerializer, CompleteOrderSerializer, CourierInfoSerializer,
+    CourierOrdersSerializer, OrderEventsQuerySerializer,
+    OrderEventsSerializer, SupplyQuerySerializer, SupplySerializer,
     )
 
 
@@ -26,6 +36,17 @@ def _form_validations_response(serializer, request, model):
     return Response(error_response, status=status.HTTP_400_BAD_REQUEST)
 
 
+def _lean_int(data, name):
+    """
+    Целое значение data[name] из JSON или None, если тело не словарь или
+    значение другого типа
+    """
+    if type(data) is not dict:
+        return None
+    value = data.get(name)
+    return value if type(value) is int else None
+
+
 class CouriersViewSet(viewsets.ModelViewSet):
     queryset = Courier.objects.all()
     http_method_names = ['post', 'patch', 'get']
@@ -44,6 +65,7 @@ class CouriersViewSet(viewsets.ModelViewSet):
 
         return serializers.get(self.action, CourierDataSerializer)
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         """
         Создает курьеров из списка, переданного в ключе "data".
@@ -81,6 +103,7 @@ class OrdersViewSet(viewsets.ModelViewSet):
 
         return serializers.get(self.action, OrderDataSerializer)
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         """
         Создает заказы из списка, переданного в ключе "data".
@@ -100,11 +123,36 @@ class OrdersViewSet(viewsets.ModelViewSet):
 
         return _form_validations_response(serializer, request, 'order')
 
+    # Поле для вывода и разбора времени в облегченных обработчиках
+    datetime_field = serializers.DateTimeField()
+
     @action(methods=['post'], detail=False)
+    @idempotent
     def assign(self, request, *args, **kwargs):
         """
-        Endpoint для назначения курьеру подходящих заказов
+        Endpoint для назначения курьеру подходящих заказов.
+        Корректный запрос обрабатывается без сериализатора, ошибки
+        формирует OrderAssignSerializer
         """
+        courier_id = _lean_int(request.data, 'courier_id')
+        courier = None
+        if courier_id is not None:
+            courier = Courier.objects.filter(pk=courier_id).first()
+        if courier is None:
+            return self.serialized_assign(request)
+        assigned_orders, assign_time = OrderAssignSerializer.assign(courier)
+        data = {
+            'orders': [
+                {'id': assigned.order_id} for assigned in assigned_orders
+            ],
+        }
+        if assigned_orders:
+            data['assign_time'] = self.datetime_field.to_representation(
+                assign_time
+            )
+        return Response(data, status=status.HTTP_200_OK)
+
+    def serialized_assign(self, request):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid(raise_exception=True):
             self.perform_create(serializer)
@@ -116,10 +164,37 @@ class OrdersViewSet(viewsets.ModelViewSet):
             )
 
     @action(methods=['post'], detail=False)
+    @idempotent
     def complete(self, request):
         """
-        Endpoint для отметки о выполнении заказа
+        Endpoint для отметки о выполнении заказа.
+        Корректный запрос обрабатывается без сериализатора, ошибки
+        формирует CompleteOrderSerializer
         """
+        courier_id = _lean_int(request.data, 'courier_id')
+        order_id = _lean_int(request.data, 'order_id')
+        complete_time = None
+        assigned_order = None
+        if courier_id is not None and order_id is not None:
+            try:
+                complete_time = self.datetime_field.to_internal_value(
+                    request.data.get('complete_time')
+                )
+            except ValidationError:
+                pass
+            else:
+                assigned_order = CompleteOrderSerializer.find_assigned(
+                    courier_id, order_id
+                )
+        if (assigned_order is None
+                or not complete_time > assigned_order.assign_time):
+            return self.serialized_complete(request)
+        CompleteOrderSerializer.complete(
+            courier_id, order_id, complete_time, assigned_order
+        )
+        return Response({'order_id': order_id}, status=status.HTTP_200_OK)
+
+    def serialized_complete(self, request):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid(raise_exception=True):
             self.perform_create(serializer)
@@ -129,3 +204,90 @@ class OrdersViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_200_OK,
                 headers=headers
             )
+
+
+def _json_response(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(
+        ORJSONRenderer().render(data),
+        status=status_code,
+        content_type='application/json'
+    )
+
+
+def _courier_orders(courier_id):
+    courier = Courier.objects.only('orders_version').filter(
+        pk=courier_id
+    ).first()
+    if courier is None:
+        return None
+    return CourierOrdersSerializer(courier).data
+
+
+async def courier_orders(request, courier_id):
+    """
+    Невыполненные заказы курьера. С параметром wait=N ждет до N секунд
+    (не больше LONG_POLL_MAX_WAIT), пока версия заказов не станет отличной
+    от переданной в version (или текущей, если version не передан)
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    try:
+        wait = float(request.GET.get('wait', 0))
+        version = request.GET.get('version')
+        version = None if version is None else int(version)
+    except ValueError:
+        return _json_response(
+            {'detail': 'wait and version must be numbers'},
+            status.HTTP_400_BAD_REQUEST
+        )
+    wait = min(wait, settings.LONG_POLL_MAX_WAIT)
+
+    data = await sync_to_async(_courier_orders)(courier_id)
+    if data is None:
+        return _json_response(
+            {'detail': 'Not found.'}, status.HTTP_404_NOT_FOUND
+        )
+    if wait > 0 and version in (None, data['version']):
+        await watcher.wait(courier_id, data['version'], wait)
+        data = await sync_to_async(_courier_orders)(courier_id)
+    return _json_response(data)
+
+
+class OrderEventsView(generics.GenericAPIView):
+    """
+    Журнал событий заказов: до limit событий (не больше EVENTS_MAX_LIMIT)
+    с id больше курсора after. В ответе cursor - значение after для
+    следующего запроса
+    """
+    serializer_class = OrderEventsSerializer
+    query_serializer_class = OrderEventsQuerySerializer
+
+    def get(self, request):
+        query = self.query_serializer_class(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        after = query.validated_data['after']
+        limit = query.validated_data.get('limit', settings.EVENTS_PAGE_SIZE)
+        items = events.read(after, min(limit, settings.EVENTS_MAX_LIMIT))
+        serializer = self.get_serializer({
+            'events': items,
+            'cursor': items[-1].pk if items else after,
+        })
+        return Response(serializer.data)
+
+
+class SupplyView(generics.GenericAPIView):
+    """
+    Сводка спроса и предложения по районам и интервалам суток. Параметр
+    region - id районов через запятую, без него - все районы
+    """
+    serializer_class = SupplySerializer
+    query_serializer_class = SupplyQuerySerializer
+
+    def get(self, request):
+        query = self.query_serializer_class(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        serializer = self.get_serializer({
+            'slot_minutes': settings.SUPPLY_SLOT_MINUTES,
+            'slots': supply.read(query.validated_data.get('region')),
+        })
+        return Response(serializer.data)
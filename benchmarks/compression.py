@@ -0,0 +1,112 @@
+"""
+Бенчмарк POST /orders с пакетом из 50 000 заказов без сжатия и со сжатием
+тела запроса и ответа (gzip, zstd - если установлен zstandard).
+Полное время = сжатие на клиенте + передача по сети с заданной пропускной
+способностью (оценка по размеру) + обработка запроса встроенным клиентом
+Django на тестовой БД + передача ответа.
+
+Запуск из корня проекта:
+python benchmarks/compression.py [--orders 50000] [--bandwidth 100]
+"""
+import argparse
+import gzip
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.replay import DjangoClientTarget  # noqa: E402
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def make_orders(count, first_id):
+    rnd = random.Random(first_id)
+    return {
+        'data': [
+            {
+                'order_id': first_id + i,
+                'weight': rnd.randint(1, 5000) / 100,
+                'region': rnd.randint(1, 100),
+                'delivery_hours': [
+                    f'{hour:02}:00-{hour + rnd.randint(1, 4):02}:00'
+                    for hour in rnd.sample(range(8, 19), rnd.randint(1, 3))
+                ],
+            }
+            for i in range(count)
+        ]
+    }
+
+
+def compressors():
+    yield 'identity', None
+    yield 'gzip', lambda body: gzip.compress(body, compresslevel=6)
+    if zstandard is not None:
+        yield 'zstd', zstandard.ZstdCompressor(level=3).compress
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=50000)
+    parser.add_argument(
+        '--bandwidth', type=float, default=100,
+        help='Network bandwidth between client and server, Mbit/s'
+    )
+    args = parser.parse_args()
+    bytes_per_second = args.bandwidth * 1000 * 1000 / 8
+
+    target = DjangoClientTarget()
+    from django.test import Client
+    client = Client()
+    results = []
+    try:
+        for number, (encoding, compress) in enumerate(compressors()):
+            body = json.dumps(
+                make_orders(args.orders, number * args.orders + 1)
+            ).encode()
+            start = time.perf_counter()
+            sent = compress(body) if compress else body
+            compress_time = time.perf_counter() - start
+
+            headers = {}
+            if compress:
+                headers['HTTP_CONTENT_ENCODING'] = encoding
+                headers['HTTP_ACCEPT_ENCODING'] = 'gzip'
+            start = time.perf_counter()
+            response = client.post(
+                '/orders', sent, content_type='application/json', **headers
+            )
+            server_time = time.perf_counter() - start
+            assert response.status_code == 201, response.status_code
+            received = len(response.content)
+
+            transfer_time = (len(sent) + received) / bytes_per_second
+            results.append({
+                'encoding': encoding,
+                'request_bytes': len(sent),
+                'response_bytes': received,
+                'response_encoding': response.get('Content-Encoding'),
+                'compress_seconds': round(compress_time, 3),
+                'server_seconds': round(server_time, 3),
+                'transfer_seconds': round(transfer_time, 3),
+                'total_seconds': round(
+                    compress_time + server_time + transfer_time, 3
+                ),
+            })
+    finally:
+        target.close()
+    print(json.dumps({
+        'orders': args.orders,
+        'bandwidth_mbit': args.bandwidth,
+        'results': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
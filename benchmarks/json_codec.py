@@ -0,0 +1,79 @@
+"""
+Микро-бенчмарк разбора и рендеринга JSON на теле POST /orders
+из 10 000 заказов: стандартные JSONParser/JSONRenderer против orjson.
+
+Запуск из корня проекта:
+python benchmarks/json_codec.py [--orders 10000] [--repeat 20]
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import timeit
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'slasty.settings')
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('ALLOWED_HOSTS', '*')
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from api_v1.parsers import ORJSONParser  # noqa: E402
+from api_v1.renderers import ORJSONRenderer  # noqa: E402
+
+
+def make_payload(orders_count):
+    rnd = random.Random(0)
+    return {
+        'data': [
+            {
+                'order_id': i,
+                'weight': Decimal(rnd.randint(1, 5000)) / 100,
+                'region': rnd.randint(1, 100),
+                'delivery_hours': ['09:00-12:00', '16:00-21:30'],
+            }
+            for i in range(1, orders_count + 1)
+        ]
+    }
+
+
+def best_of(func, repeat):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    payload = make_payload(args.orders)
+    body = JSONRenderer().render(payload)
+
+    report = {'orders': args.orders, 'body_bytes': len(body)}
+    codecs = (
+        ('stock', JSONParser(), JSONRenderer()),
+        ('orjson', ORJSONParser(), ORJSONRenderer()),
+    )
+    for name, json_parser, json_renderer in codecs:
+        report[name] = {
+            'parse_ms': round(best_of(
+                lambda: json_parser.parse(io.BytesIO(body)), args.repeat
+            ) * 1000, 2),
+            'render_ms': round(best_of(
+                lambda: json_renderer.render(payload), args.repeat
+            ) * 1000, 2),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Микро-бенчмарк валидации тела POST /orders и POST /couriers:
+сериализаторы DRF против предварительной проверки скомпилированной
+схемой (PREVALIDATION). Проверка уникальности id в БД подменяется
+пустым множеством, чтобы измерять только валидацию.
+
+Запуск из корня проекта:
+python benchmarks/prevalidation.py [--items 50000] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'slasty.settings')
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('ALLOWED_HOSTS', '*')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.test import override_settings  # noqa: E402
+from api_v1 import serializers  # noqa: E402
+
+
+def make_orders(count):
+    rnd = random.Random(0)
+    return [
+        {
+            'order_id': i,
+            'weight': rnd.randint(1, 5000) / 100,
+            'region': rnd.randint(1, 100),
+            'delivery_hours': ['09:00-12:00', '16:00-21:30'],
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def make_couriers(count):
+    rnd = random.Random(0)
+    return [
+        {
+            'courier_id': i,
+            'courier_type': rnd.choice(('foot', 'bike', 'car')),
+            'regions': rnd.sample(range(1, 101), 3),
+            'working_hours': ['09:00-18:00'],
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def validate(serializer_class, data):
+    serializer = serializer_class(data={'data': data})
+    assert serializer.is_valid(), serializer.errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    payloads = (
+        ('orders', serializers.OrderDataSerializer, make_orders(args.items)),
+        ('couriers', serializers.CourierDataSerializer,
+         make_couriers(args.items)),
+    )
+    report = {'items': args.items}
+    with mock.patch.object(serializers, 'existing_pks', return_value=set()):
+        for name, serializer_class, data in payloads:
+            report[name] = {}
+            for mode, enabled in (('drf', 0), ('prevalidation', 1)):
+                with override_settings(PREVALIDATION=enabled):
+                    report[name][f'{mode}_ms'] = round(min(timeit.repeat(
+                        lambda: validate(serializer_class, data),
+                        number=1, repeat=args.repeat
+                    )) * 1000, 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
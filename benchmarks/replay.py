@@ -0,0 +1,281 @@
+"""
+Нагрузочный бенчмарк: воспроизводит записанный трафик API с заданной
+конкурентностью и выводит JSON с пропускной способностью и латентностью
+p50/p95/p99 по каждому endpoint.
+
+Трафик - файл JSONL, по одному запросу в строке:
+{"phase": 0, "method": "POST", "path": "/couriers", "body": {...}}
+Запросы одной фазы выполняются параллельно, фазы - по очереди (например,
+сначала создание, затем назначение и выполнение заказов).
+
+Сгенерировать согласованный трафик (создание курьеров и заказов,
+назначение, выполнение, информация о курьере):
+python benchmarks/replay.py generate traffic.jsonl --couriers 200
+
+Воспроизвести во встроенном тестовом клиенте Django (на тестовой БД):
+python benchmarks/replay.py run traffic.jsonl --concurrency 4
+
+Воспроизвести на запущенном сервере:
+python benchmarks/replay.py run traffic.jsonl --url http://localhost:8080
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Имена endpoint по методу и пути, как в именах url DRF
+ENDPOINTS = (
+    ('POST', re.compile(r'^/couriers$'), 'couriers-create'),
+    ('PATCH', re.compile(r'^/couriers/\d+$'), 'couriers-update'),
+    ('GET', re.compile(r'^/couriers/\d+$'), 'couriers-retrieve'),
+    ('POST', re.compile(r'^/orders$'), 'orders-create'),
+    ('POST', re.compile(r'^/orders/assign$'), 'orders-assign'),
+    ('POST', re.compile(r'^/orders/complete$'), 'orders-complete'),
+)
+
+
+def endpoint_name(method, path):
+    for endpoint_method, pattern, name in ENDPOINTS:
+        if method == endpoint_method and pattern.match(path):
+            return name
+    return f'{method} {path}'
+
+
+def generate(args):
+    """
+    Трафик, в котором каждому курьеру гарантированно назначаются его
+    заказы: у каждого курьера свой район, заказы подходят по весу и времени
+    """
+    batch = args.batch
+    lines = []
+
+    def add(phase, method, path, body=None):
+        lines.append({
+            'phase': phase, 'method': method, 'path': path, 'body': body
+        })
+
+    couriers = [
+        {
+            'courier_id': i,
+            'courier_type': 'car',
+            'regions': [i],
+            'working_hours': ['00:00-23:59'],
+        } for i in range(1, args.couriers + 1)
+    ]
+    for start in range(0, len(couriers), batch):
+        add(0, 'POST', '/couriers', {'data': couriers[start:start + batch]})
+
+    orders = [
+        {
+            'order_id': (courier_id - 1) * args.orders + i,
+            'weight': 1 + i % 40,
+            'region': courier_id,
+            'delivery_hours': ['10:00-18:00'],
+        }
+        for courier_id in range(1, args.couriers + 1)
+        for i in range(1, args.orders + 1)
+    ]
+    for start in range(0, len(orders), batch):
+        add(1, 'POST', '/orders', {'data': orders[start:start + batch]})
+
+    for courier_id in range(1, args.couriers + 1):
+        add(2, 'POST', '/orders/assign', {'courier_id': courier_id})
+    for order in orders[::2]:
+        add(3, 'POST', '/orders/complete', {
+            'courier_id': order['region'],
+            'order_id': order['order_id'],
+            'complete_time': '2100-01-01T10:00:00.00Z',
+        })
+    for courier_id in range(1, args.couriers + 1):
+        add(4, 'GET', f'/couriers/{courier_id}')
+
+    with open(args.traffic, 'w') as traffic_file:
+        for line in lines:
+            traffic_file.write(json.dumps(line) + '\n')
+
+
+class DjangoClientTarget:
+    """
+    Встроенный тестовый клиент Django на отдельной тестовой БД.
+    Для SQLite тестовая БД создается в файле, а не в памяти, чтобы
+    параллельные запросы ждали блокировку, а не падали.
+    """
+    def __init__(self):
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'slasty.settings')
+        os.environ.setdefault('SECRET_KEY', 'benchmark')
+        os.environ.setdefault('ALLOWED_HOSTS', '*')
+        sys.path.insert(0, str(BASE_DIR))
+        import django
+        django.setup()
+        from django.db import connection
+        from django.test.utils import setup_test_environment
+        setup_test_environment()
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = str(
+                BASE_DIR / 'bench_replay.sqlite3'
+            )
+        self.connection = connection
+        self.old_name = connection.creation.create_test_db(verbosity=0)
+        self.local = threading.local()
+
+    def request(self, method, path, body):
+        from django.test import Client
+        if not hasattr(self.local, 'client'):
+            self.local.client = Client(raise_request_exception=False)
+        response = self.local.client.generic(
+            method, path,
+            data=json.dumps(body) if body is not None else '',
+            content_type='application/json'
+        )
+        return response.status_code
+
+    def close(self):
+        self.connection.creation.destroy_test_db(self.old_name, verbosity=0)
+
+
+class LiveServerTarget:
+    """
+    Запущенный сервер, запросы через urllib
+    """
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+
+    def request(self, method, path, body):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(
+            self.url + path, data=data, method=method,
+            headers={'Content-Type': 'application/json'}
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            return error.code
+
+    def close(self):
+        pass
+
+
+def percentile(sorted_values, percent):
+    index = round(percent / 100 * (len(sorted_values) - 1))
+    return sorted_values[index]
+
+
+def run(args):
+    with open(args.traffic) as traffic_file:
+        lines = [json.loads(line) for line in traffic_file if line.strip()]
+
+    if args.url:
+        target = LiveServerTarget(args.url)
+    else:
+        target = DjangoClientTarget()
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    busy_time = defaultdict(float)
+
+    def send(line):
+        name = endpoint_name(line['method'], line['path'])
+        start = time.perf_counter()
+        status = target.request(line['method'], line['path'], line['body'])
+        duration = time.perf_counter() - start
+        return name, status, duration
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for _, phase in groupby(lines, key=lambda x: x.get('phase', 0)):
+                phase_start = time.perf_counter()
+                phase_names = set()
+                for name, status, duration in executor.map(send, phase):
+                    latencies[name].append(duration)
+                    phase_names.add(name)
+                    if status >= 400:
+                        errors[name] += 1
+                phase_time = time.perf_counter() - phase_start
+                for name in phase_names:
+                    busy_time[name] += phase_time
+    finally:
+        target.close()
+    total_time = time.perf_counter() - started
+
+    endpoints = {}
+    for name, values in sorted(latencies.items()):
+        values.sort()
+        endpoints[name] = {
+            'requests': len(values),
+            'errors': errors[name],
+            'throughput_rps': round(len(values) / busy_time[name], 1),
+            'p50_ms': round(percentile(values, 50) * 1000, 2),
+            'p95_ms': round(percentile(values, 95) * 1000, 2),
+            'p99_ms': round(percentile(values, 99) * 1000, 2),
+        }
+    report = {
+        'commit': _git_commit(),
+        'target': args.url or 'django-client',
+        'concurrency': args.concurrency,
+        'total_seconds': round(total_time, 3),
+        'endpoints': endpoints,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + '\n')
+    print(output)
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=BASE_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate_parser = commands.add_parser('generate')
+    generate_parser.add_argument('traffic')
+    generate_parser.add_argument('--couriers', type=int, default=100)
+    generate_parser.add_argument(
+        '--orders', type=int, default=10, help='orders per courier'
+    )
+    generate_parser.add_argument(
+        '--batch', type=int, default=100, help='items per POST'
+    )
+    generate_parser.set_defaults(func=generate)
+
+    run_parser = commands.add_parser('run')
+    run_parser.add_argument('traffic')
+    run_parser.add_argument('--concurrency', type=int, default=1)
+    run_parser.add_argument(
+        '--url', help='live server, e.g. http://localhost:8080'
+    )
+    run_parser.add_argument('--output', help='write JSON report to file')
+    run_parser.set_defaults(func=run)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
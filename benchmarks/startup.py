@@ -0,0 +1,76 @@
+"""
+Сравнение полного профиля настроек и профиля API_ONLY:
+время холодного старта воркера и накладные расходы на запрос.
+
+Запуск из корня проекта:
+python benchmarks/startup.py [--requests 2000] [--runs 5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Код, выполняемый в отдельном процессе: старт Django + прогон запросов,
+# которые не ходят в БД (ошибка валидации), чтобы мерить только стек.
+WORKER = """
+import json, time
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+startup = time.perf_counter() - start
+
+from django.test import Client
+client = Client()
+client.post('/orders/assign', {}, content_type='application/json')
+start = time.perf_counter()
+for _ in range({requests}):
+    client.post('/orders/assign', {{}}, content_type='application/json')
+per_request = (time.perf_counter() - start) / {requests}
+print(json.dumps({{'startup': startup, 'per_request': per_request}}))
+"""
+
+
+def run_worker(api_only, requests):
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE='slasty.settings',
+        API_ONLY=str(int(api_only)),
+    )
+    env.setdefault('SECRET_KEY', 'benchmark')
+    env.setdefault('ALLOWED_HOSTS', '*')
+    code = WORKER.replace('{requests}', str(requests))
+    code = code.replace('{{', '{').replace('}}', '}')
+    output = subprocess.check_output(
+        [sys.executable, '-c', code], cwd=BASE_DIR, env=env
+    )
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    report = {}
+    for name, api_only in (('full', False), ('api_only', True)):
+        runs = [run_worker(api_only, args.requests) for _ in range(args.runs)]
+        report[name] = {
+            'startup_ms': round(
+                min(r['startup'] for r in runs) * 1000, 2
+            ),
+            'per_request_us': round(
+                min(r['per_request'] for r in runs) * 10 ** 6, 1
+            ),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'slasty.settings')
+# Django 3.1 выполняет синхронные view под ASGI в одном общем потоке,
+# поэтому через ASGI отдается только долгий опрос (slasty.longpoll_urls)
+os.environ.setdefault('LONG_POLL_ONLY', '1')
 
 application = get_asgi_application()
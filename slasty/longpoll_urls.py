@@ -0,0 +1,13 @@
+"""
+URL-ы процесса долгого опроса (LONG_POLL_ONLY): только асинхронный
+GET /couriers/{id}/orders, остальное API отдает WSGI-процесс
+"""
+from django.urls import path
+from api_v1 import views
+
+urlpatterns = [
+    path(
+        'couriers/<int:courier_id>/orders', views.courier_orders,
+        name='couriers-orders'
+    ),
+]
@@ -0,0 +1,50 @@
+"""
+Отдача заранее сгенерированной схемы OpenAPI и страницы swagger
+без импорта drf_spectacular. Используется в профиле API_ONLY.
+"""
+from functools import lru_cache
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import reverse
+
+SWAGGER_UI_DIST = 'https://cdn.jsdelivr.net/npm/swagger-ui-dist@3'
+
+SWAGGER_UI_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<title>Swagger</title>
+<link rel="stylesheet" href="{dist}/swagger-ui.css">
+</head>
+<body>
+<div id="swagger-ui"></div>
+<script src="{dist}/swagger-ui-bundle.js"></script>
+<script>
+SwaggerUIBundle({{url: "{schema_url}", dom_id: "#swagger-ui"}});
+</script>
+</body>
+</html>
+"""
+
+
+@lru_cache(maxsize=None)
+def _read_schema():
+    """
+    Файл схемы читается один раз на процесс
+    """
+    with open(settings.SCHEMA_FILE, 'rb') as schema_file:
+        return schema_file.read()
+
+
+def schema_view(request):
+    return HttpResponse(
+        _read_schema(),
+        content_type='application/vnd.oai.openapi; charset=utf-8'
+    )
+
+
+def swagger_view(request):
+    html = SWAGGER_UI_HTML.format(
+        dist=SWAGGER_UI_DIST,
+        schema_url=reverse('schema'),
+    )
+    return HttpResponse(html)
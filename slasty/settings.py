@@ -27,6 +27,14 @@ DEBUG = int(environ.get('DEBUG', default=0))
 
 ALLOWED_HOSTS = environ.get('ALLOWED_HOSTS').split(' ')
 
+# Облегченный профиль только для API: без админки, сессий, CSRF, сообщений,
+# шаблонов и drf_spectacular. Схема отдается из заранее сгенерированного файла.
+API_ONLY = int(environ.get('API_ONLY', default=0))
+
+# Процесс только для долгого опроса GET /couriers/{id}/orders под ASGI
+# (slasty.asgi), остальное API обслуживается через WSGI (slasty.wsgi)
+LONG_POLL_ONLY = int(environ.get('LONG_POLL_ONLY', default=0))
+
 
 # Application definition
 
@@ -44,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api_v1.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,7 +62,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'slasty.urls'
+ROOT_URLCONF = 'slasty.longpoll_urls' if LONG_POLL_ONLY else 'slasty.urls'
 
 TEMPLATES = [
     {
@@ -71,6 +80,22 @@ TEMPLATES = [
     },
 ]
 
+if API_ONLY:
+    INSTALLED_APPS = [
+        'rest_framework',
+        'api_v1',
+    ]
+    MIDDLEWARE = [
+        'api_v1.metrics.MetricsMiddleware',
+        'django.middleware.security.SecurityMiddleware',
+        'django.middleware.common.CommonMiddleware',
+    ]
+    TEMPLATES = []
+
+# Заранее сгенерированная схема, используется в профиле API_ONLY:
+# python manage.py spectacular --file openapi.yaml
+SCHEMA_FILE = BASE_DIR / 'openapi.yaml'
+
 WSGI_APPLICATION = 'slasty.wsgi.application'
 
 
@@ -88,6 +113,158 @@ DATABASES = {
     }
 }
 
+# Хранение интервалов работы и доставки: 'm2m' - связь с TimeInterval,
+# 'inline' - в поле самого курьера/заказа (api_v1.ranges). После смены
+# режима на 'inline' заполнить поля: python manage.py fill_time_ranges
+INTERVAL_STORAGE = environ.get('INTERVAL_STORAGE', 'm2m')
+
+# Число профилей курьеров в кэше процесса (api_v1.profiles), 0 - без кэша
+COURIER_CACHE_SIZE = int(environ.get('COURIER_CACHE_SIZE', 10000))
+
+# Долгий опрос GET /couriers/{id}/orders?wait=N (api_v1.longpoll): предел
+# ожидания и период проверки версий заказов в БД, в секундах.
+# Ожидание не занимает поток только под ASGI (LONG_POLL_ONLY)
+LONG_POLL_MAX_WAIT = float(environ.get('LONG_POLL_MAX_WAIT', 30))
+LONG_POLL_INTERVAL = float(environ.get('LONG_POLL_INTERVAL', 1))
+
+# Заголовок Idempotency-Key (api_v1.idempotency): сколько хранить ответ,
+# Retry-After для повтора во время выполнения первого запроса и через
+# сколько освобождается ключ запроса, процесс которого упал. В секундах
+IDEMPOTENCY_TTL = int(environ.get('IDEMPOTENCY_TTL', 24 * 60 * 60))
+IDEMPOTENCY_RETRY_AFTER = int(environ.get('IDEMPOTENCY_RETRY_AFTER', 1))
+IDEMPOTENCY_LOCK_TIMEOUT = int(environ.get('IDEMPOTENCY_LOCK_TIMEOUT', 300))
+
+# Сжатые тела запросов (api_v1.compression): предел размера после
+# распаковки. GZIP_RESPONSES=0 отключает сжатие ответов
+REQUEST_MAX_DECOMPRESSED_BYTES = int(
+    environ.get('REQUEST_MAX_DECOMPRESSED_BYTES', default=100 * 1024 * 1024)
+)
+GZIP_RESPONSES = int(environ.get('GZIP_RESPONSES', default=1))
+# Пакетные запросы в несколько мегабайт читаются целиком (request.body,
+# например для Idempotency-Key), стандартные 2.5 МБ для них малы
+DATA_UPLOAD_MAX_MEMORY_SIZE = REQUEST_MAX_DECOMPRESSED_BYTES
+
+# Максимальное число элементов в "data" при создании курьеров и заказов,
+# больше - 413 до валидации элементов
+MAX_BATCH_ITEMS = {
+    'couriers': int(environ.get('MAX_BATCH_COURIERS', default=100000)),
+    'orders': int(environ.get('MAX_BATCH_ORDERS', default=100000)),
+}
+
+# Ограничение одновременных запросов на хосте (api_v1.admission): лимиты
+# тяжелых действий, общее число слотов (обычно число рабочих потоков всех
+# процессов, 0 - без общего лимита) и резерв слотов для легких действий.
+# Слоты делят процессы с одним ADMISSION_DIR, по умолчанию - процессы одной
+# копии проекта. ADMISSION=1 включает ограничение
+ADMISSION = int(environ.get('ADMISSION', default=0))
+ADMISSION_LIMITS = {
+    name: int(limit)
+    for name, _, limit in (
+        item.partition('=') for item in environ.get(
+            'ADMISSION_LIMITS',
+            'orders-create=2,couriers-create=2,orders-assign=4'
+        ).split(',') if item
+    )
+}
+ADMISSION_CAPACITY = int(environ.get('ADMISSION_CAPACITY', default=0))
+ADMISSION_RESERVED = int(environ.get('ADMISSION_RESERVED', default=0))
+ADMISSION_RETRY_AFTER = int(environ.get('ADMISSION_RETRY_AFTER', default=1))
+ADMISSION_DIR = environ.get('ADMISSION_DIR', BASE_DIR / 'admission')
+
+if ADMISSION:
+    MIDDLEWARE.insert(1, 'api_v1.admission.AdmissionMiddleware')
+
+if GZIP_RESPONSES:
+    MIDDLEWARE.insert(1, 'django.middleware.gzip.GZipMiddleware')
+
+# Хранение районов курьера: 'array' - массив в строке курьера с GIN-индексом
+# (api_v1.arrays); 'm2m' - связь с Region (по умолчанию).
+# Перед включением 'array' перенести данные: python manage.py fill_region_ids
+REGION_STORAGE = environ.get('REGION_STORAGE', 'm2m')
+
+# Реплики только для чтения, хосты через пробел. Если заданы, GET-запросы
+# читают с реплик (api_v1.db_routers), а клиент после записи закрепляется
+# за основной БД на REPLICA_PIN_SECONDS секунд заголовком X-Primary-Pin.
+DATABASE_REPLICAS = []
+for number, host in enumerate(
+        environ.get('POSTGRES_REPLICA_HOSTS', '').split(), start=1):
+    alias = f'replica_{number}'
+    DATABASES[alias] = dict(
+        DATABASES['default'],
+        HOST=host,
+        TEST={'MIRROR': 'default'},
+    )
+    DATABASE_REPLICAS.append(alias)
+
+REPLICA_PIN_SECONDS = int(environ.get('REPLICA_PIN_SECONDS', default=5))
+
+# Журнал событий заказов GET /events (api_v1.events): размер страницы по
+# умолчанию и наибольший limit
+EVENTS_PAGE_SIZE = int(environ.get('EVENTS_PAGE_SIZE', default=100))
+EVENTS_MAX_LIMIT = int(environ.get('EVENTS_MAX_LIMIT', default=1000))
+
+# Предварительная проверка элементов POST /couriers и POST /orders схемой
+# из SCHEMA_FILE (api_v1.prevalidation), 0 - только сериализаторы DRF
+PREVALIDATION = int(environ.get('PREVALIDATION', default=1))
+
+# Сводка спроса и предложения по районам (api_v1.supply): обновление при
+# изменениях заказов и курьеров (по умолчанию выключено) и длина интервала
+# суток в минутах. После включения или смены длины пересчитать:
+# manage.py rebuild_supply
+SUPPLY_ROLLUP = int(environ.get('SUPPLY_ROLLUP', default=0))
+SUPPLY_SLOT_MINUTES = int(environ.get('SUPPLY_SLOT_MINUTES', default=60))
+
+# Шарды заказов по районам (api_v1.sharding): хосты PostgreSQL через
+# пробел в POSTGRES_SHARD_HOSTS или число файлов в SQLITE_SHARDS. Заказы
+# района region_id хранятся в DATABASE_SHARDS[region_id % числа шардов],
+# поэтому число шардов после заполнения данных не меняется.
+DATABASE_SHARDS = []
+for number, host in enumerate(
+        environ.get('POSTGRES_SHARD_HOSTS', '').split(), start=1):
+    alias = f'shard_{number}'
+    DATABASES[alias] = dict(DATABASES['default'], HOST=host)
+    DATABASE_SHARDS.append(alias)
+for number in range(1, int(environ.get('SQLITE_SHARDS', default=0)) + 1):
+    alias = f'shard_{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db_shard_{number}.sqlite3',
+    }
+    DATABASE_SHARDS.append(alias)
+
+DATABASE_ROUTERS = []
+if DATABASE_SHARDS:
+    DATABASE_ROUTERS.append('api_v1.db_routers.ShardRouter')
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS.append('api_v1.db_routers.ReplicaRouter')
+    MIDDLEWARE.append('api_v1.db_routers.ReplicaRoutingMiddleware')
+
+# Профилирование отдельных запросов (api_v1.profiling): запросы с
+# заголовком X-Profile или случайная доля PROFILING_SAMPLE_RATE.
+PROFILING = int(environ.get('PROFILING', default=0))
+PROFILING_HEADER = environ.get('PROFILING_HEADER', 'X-Profile')
+PROFILING_SAMPLE_RATE = float(environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_DIR = environ.get('PROFILING_DIR', BASE_DIR / 'profiles')
+PROFILING_MAX_BYTES = int(
+    environ.get('PROFILING_MAX_BYTES', default=100 * 1024 * 1024)
+)
+
+if PROFILING:
+    MIDDLEWARE.insert(1, 'api_v1.profiling.ProfilingMiddleware')
+
+# Журнал медленных запросов (api_v1.slow_queries), 0 - выключен.
+# На PostgreSQL для части медленных SELECT снимается EXPLAIN ANALYZE.
+SLOW_QUERY_MS = float(environ.get('SLOW_QUERY_MS', default=0))
+SLOW_QUERY_EXPLAIN_RATE = float(
+    environ.get('SLOW_QUERY_EXPLAIN_RATE', default=0.1)
+)
+SLOW_QUERY_EXPLAIN_PER_MINUTE = int(
+    environ.get('SLOW_QUERY_EXPLAIN_PER_MINUTE', default=10)
+)
+
+if SLOW_QUERY_MS:
+    MIDDLEWARE.insert(1, 'api_v1.slow_queries.SlowQueryLogMiddleware')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -147,8 +324,32 @@ STATIC_URL = '/static/'
 APPEND_SLASH = False
 
 REST_FRAMEWORK = {
+    # orjson, если установлен, иначе стандартный модуль json
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
+        'api_v1.renderers.ORJSONRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api_v1.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ),
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # AutoSchema drf-spectacular с параметрами запроса из сериализатора
+    'DEFAULT_SCHEMA_CLASS': 'api_v1.schema.AutoSchema',
 }
+
+SPECTACULAR_SETTINGS = {
+    'POSTPROCESSING_HOOKS': [
+        'drf_spectacular.hooks.postprocess_schema_enums',
+        # Ограничения полей, которые не выводятся автоматически
+        'api_v1.prevalidation.add_field_constraints',
+    ],
+}
+
+if API_ONLY:
+    # API без аутентификации: не трогаем django.contrib.auth на каждом запросе
+    del REST_FRAMEWORK['DEFAULT_SCHEMA_CLASS']
+    REST_FRAMEWORK.update({
+        'DEFAULT_AUTHENTICATION_CLASSES': [],
+        'DEFAULT_PERMISSION_CLASSES': [],
+        'UNAUTHENTICATED_USER': None,
+    })
@@ -13,13 +13,27 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
-urlpatterns = [
-    # path('admin/', admin.site.urls),
-    path('schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('docs', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
+if settings.API_ONLY:
+    from .schema import schema_view, swagger_view
+
+    urlpatterns = [
+        path('schema/', schema_view, name='schema'),
+        path('docs', swagger_view, name='swagger-ui'),
+    ]
+else:
+    from drf_spectacular.views import (
+        SpectacularAPIView, SpectacularSwaggerView
+    )
+
+    urlpatterns = [
+        # path('admin/', admin.site.urls),
+        path('schema/', SpectacularAPIView.as_view(), name='schema'),
+        path('docs', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
+    ]
+
+urlpatterns += [
     path('', include('api_v1.urls'))
 ]